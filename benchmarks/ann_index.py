@@ -0,0 +1,101 @@
+"""
+Recall/latency/memory trade-off of the embedding index structures (flat, IVF-Flat, HNSW,
+IVF-PQ) on synthetic clustered corpora. Recall@k is measured against exact flat search;
+latency is per single query, as the retriever issues them.
+
+run on CLI using "python -m benchmarks.ann_index --sizes 100000 1000000 --nprobe 4 16 64 --ef-search 32 64 128"
+"""
+import argparse, os, tempfile, time
+import numpy as np
+import faiss
+from src.core.ann_index import INDEX_TYPES, resolve_params, build_index, search_params, index_kind
+
+
+def synthetic_corpus(n: int, centres: np.ndarray, seed: int = 0, chunk: int = 200_000) -> np.ndarray:
+    """Normalized vectors scattered around topic centres, like embeddings of a news feed."""
+    rng = np.random.default_rng(seed)
+    n_topics, dim = centres.shape
+    out = np.empty((n, dim), dtype="float32")
+    for start in range(0, n, chunk):
+        m = min(chunk, n - start)
+        block = centres[rng.integers(0, n_topics, m)] + 0.6 * rng.standard_normal((m, dim)).astype("float32")
+        out[start:start + m] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return out
+
+def index_size_mb(index) -> float:
+    fd, path = tempfile.mkstemp(suffix=".index")
+    os.close(fd)
+    try:
+        faiss.write_index(index, path)
+        return os.path.getsize(path) / 1e6
+    finally:
+        os.remove(path)
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f.tolist()) & set(t.tolist())) / k for f, t in zip(found, truth)]))
+
+def latency_ms(index, queries: np.ndarray, k: int, params) -> tuple:
+    times = []
+    for q in queries:
+        t0 = time.perf_counter()
+        index.search(q[None, :], k, params=params)
+        times.append((time.perf_counter() - t0) * 1000)
+    return float(np.percentile(times, 50)), float(np.percentile(times, 99))
+
+def sweep(kind: str, args):
+    """(label, nprobe, ef_search) settings to measure for one index type."""
+    if kind in ("ivf", "ivfpq"):
+        return [(f"nprobe={p}", p, None) for p in args.nprobe]
+    if kind == "hnsw":
+        return [(f"efSearch={e}", None, e) for e in args.ef_search]
+    return [("exact", None, None)]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 produces 384")
+    parser.add_argument("--types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--topics", type=int, default=1000)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--threads", type=int, default=0, help="FAISS threads (0 = library default)")
+    args = parser.parse_args()
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+
+    print(f"{'vectors':>9} {'type':>6} {'setting':>12} {'build_s':>8} {'size_MB':>8} "
+          f"{'recall@' + str(args.k):>9} {'p50_ms':>7} {'p99_ms':>7}")
+    for n in args.sizes:
+        centres = np.random.default_rng(n).standard_normal((args.topics, args.dim)).astype("float32")
+        corpus = synthetic_corpus(n, centres, seed=1)
+        # queries are fresh points from the same topics, not corpus members
+        queries = synthetic_corpus(args.queries, centres, seed=2)
+        ids = np.arange(n, dtype=np.int64)
+
+        exact = faiss.IndexFlatIP(args.dim)
+        exact.add(corpus)
+        truth = exact.search(queries, args.k)[1]
+        del exact
+
+        for kind in args.types:
+            t0 = time.perf_counter()
+            index, _ = build_index(corpus, ids, resolve_params(kind))
+            build = time.perf_counter() - t0
+            size = index_size_mb(index)
+            if index_kind(index) != kind:
+                print(f"{n:>9} {kind:>6} {'skipped':>12}  (too few vectors to train)")
+                continue
+
+            for label, nprobe, ef in sweep(kind, args):
+                sp = search_params(index, nprobe=nprobe, ef_search=ef)
+                found = index.search(queries, args.k, params=sp)[1]
+                p50, p99 = latency_ms(index, queries, args.k, sp)
+                print(f"{n:>9} {kind:>6} {label:>12} {build:>8.2f} {size:>8.1f} "
+                      f"{recall_at_k(found, truth):>9.3f} {p50:>7.3f} {p99:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
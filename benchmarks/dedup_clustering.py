@@ -0,0 +1,83 @@
+"""
+Compares the legacy k=7 greedy clustering with the range-search + union-find engine
+on synthetic story bursts.
+
+run on CLI using "python -m benchmarks.dedup_clustering --sizes 1000 10000 100000"
+"""
+import argparse, time
+import numpy as np
+from src.utils.clustering import cluster_embeddings
+
+try:
+    import faiss
+except Exception:
+    faiss = None
+
+
+def legacy_cluster(emb: np.ndarray, threshold: float = 0.80, k: int = 7):
+    """The pre-union-find cluster_articles: k-NN self search, greedy grouping with a visited set."""
+    index = faiss.IndexFlatL2(emb.shape[1])
+    index.add(emb)
+    distances, indices = index.search(emb, k=k)
+    clusters, visited = [], set()
+    for i, neighbors in enumerate(indices):
+        if i in visited:
+            continue
+        cluster = []
+        for j, dist in zip(neighbors, distances[i]):
+            if j >= 0 and j not in visited and 1 - dist / 2 > threshold:
+                cluster.append(int(j))
+                visited.add(j)
+        if cluster:
+            clusters.append(cluster)
+    return clusters
+
+def synthetic_corpus(n: int, dim: int, seed: int = 0):
+    """Story bursts of 1-40 near-identical articles; returns (unit vectors, story label per row)."""
+    rng = np.random.default_rng(seed)
+    sizes = []
+    while sum(sizes) < n:
+        sizes.append(int(rng.choice([1, 1, 1, 2, 3, 5, 12, 40])))
+    sizes[-1] -= sum(sizes) - n
+    labels = np.repeat(np.arange(len(sizes)), sizes)
+    centers = rng.normal(size=(len(sizes), dim)).astype("float32")
+    emb = centers[labels] + rng.normal(scale=0.15, size=(n, dim)).astype("float32")
+    emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+    perm = rng.permutation(n)
+    return np.ascontiguousarray(emb[perm]), labels[perm]
+
+def score(clusters, labels):
+    """(clusters formed, true stories split across >1 cluster, clusters mixing stories)"""
+    pred = np.empty(len(labels), dtype=np.int64)
+    for cid, c in enumerate(clusters):
+        pred[c] = cid
+    split = sum(len(np.unique(pred[labels == s])) > 1 for s in np.unique(labels))
+    mixed = sum(len(np.unique(labels[c])) > 1 for c in clusters)
+    return len(clusters), split, mixed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--threshold", type=float, default=0.80)
+    args = parser.parse_args()
+
+    print(f"{'n':>8} {'engine':>14} {'secs':>8} {'clusters':>9} {'stories':>8} {'split':>6} {'mixed':>6}")
+    for n in args.sizes:
+        emb, labels = synthetic_corpus(n, args.dim)
+        stories = len(np.unique(labels))
+        engines = [("union-find", lambda e: cluster_embeddings(e, args.threshold, index_type="flat"))]
+        if faiss is not None:
+            engines.insert(0, ("legacy-k7", lambda e: legacy_cluster(e, args.threshold)))
+            if n >= 10000:
+                engines.append(("union-find-ivf", lambda e: cluster_embeddings(e, args.threshold, index_type="ivf")))
+        for name, fn in engines:
+            t0 = time.perf_counter()
+            clusters = fn(emb)
+            secs = time.perf_counter() - t0
+            formed, split, mixed = score(clusters, labels)
+            print(f"{n:>8} {name:>14} {secs:>8.2f} {formed:>9} {stories:>8} {split:>6} {mixed:>6}")
+
+
+if __name__ == "__main__":
+    main()
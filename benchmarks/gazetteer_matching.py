@@ -0,0 +1,88 @@
+"""
+Compares the legacy per-entity str.find / substring scans with the compiled
+Aho-Corasick matcher as the gazetteer grows.
+
+run on CLI using "python -m benchmarks.gazetteer_matching --sizes 1000 10000 50000"
+"""
+import argparse, random, string, time
+from typing import List
+from src.utils.gazetteer_matcher import GazetteerMatcher
+
+
+def legacy_longest_match(text: str, entity_list: List[str]):
+    """The pre-automaton longest_match_gazetteer: one str.find loop per entity."""
+    text_lower = text.lower()
+    matches = []
+    occupied = [False] * len(text_lower)
+    for entity in sorted(entity_list, key=lambda x: -len(x)):
+        e_low = entity.lower()
+        start_idx = text_lower.find(e_low)
+        while start_idx != -1:
+            end_idx = start_idx + len(e_low)
+            if not any(occupied[start_idx:end_idx]):
+                matches.append(entity)
+                for i in range(start_idx, end_idx):
+                    occupied[i] = True
+            start_idx = text_lower.find(e_low, start_idx + 1)
+    return list(set(matches))
+
+def legacy_match(text: str, gaz: dict):
+    """The pre-automaton match_rules: longest-match for indices, substring scans for the rest."""
+    tl = text.lower()
+    out = {"indices": legacy_longest_match(text, gaz["indices"])}
+    for k, v in gaz.items():
+        if k != "indices":
+            out[k] = [s for s in v if s in tl]
+    return out
+
+def synthetic_gazetteer(n_companies: int, seed: int = 0):
+    rng = random.Random(seed)
+    def word():
+        return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+    companies = {f"{word()} {word()} {rng.choice(['ltd', 'limited', 'industries', 'bank'])}" for _ in range(n_companies)}
+    return {
+        "indices": ["nifty", "nifty 50", "bank nifty", "sensex"],
+        "sectors": ["banking", "pharma", "it services", "fmcg", "auto"],
+        "regulators": ["rbi", "sebi", "irdai"],
+        "financial_terms": ["repo rate", "inflation", "bond yield"],
+        "companies_custom": sorted(companies),
+        "products": ["etf", "mutual fund", "ipo"],
+    }
+
+def synthetic_text(gaz: dict, n_words: int, seed: int = 1):
+    rng = random.Random(seed)
+    filler = ["the", "market", "shares", "rose", "after", "quarterly", "results", "and", "investors", "said"]
+    phrases = [p for v in gaz.values() for p in v]
+    return " ".join(rng.choice(phrases) if rng.random() < 0.05 else rng.choice(filler) for _ in range(n_words))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--words", type=int, default=600, help="words per story")
+    parser.add_argument("--stories", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'entries':>8} {'build_s':>8} {'legacy_ms/story':>16} {'automaton_ms/story':>19} {'speedup':>8}")
+    for n in args.sizes:
+        gaz = synthetic_gazetteer(n)
+        texts = [synthetic_text(gaz, args.words, seed=i) for i in range(args.stories)]
+
+        t0 = time.perf_counter()
+        matcher = GazetteerMatcher(gaz)
+        build = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for t in texts:
+            legacy_match(t, gaz)
+        legacy = (time.perf_counter() - t0) / len(texts) * 1000
+
+        t0 = time.perf_counter()
+        for t in texts:
+            matcher.match(t)
+        fast = (time.perf_counter() - t0) / len(texts) * 1000
+
+        print(f"{sum(len(v) for v in gaz.values()):>8} {build:>8.2f} {legacy:>16.2f} {fast:>19.2f} {legacy / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
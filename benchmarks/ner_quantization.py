@@ -0,0 +1,106 @@
+"""
+Compares the fp32 and dynamic-int8 NER backends on a fixture corpus: throughput,
+model size, F1 against the hand-labelled entities and span agreement with fp32.
+
+run on CLI using "python -m benchmarks.ner_quantization --repeat 8 --threads 4"
+"""
+import argparse, io, json, time
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+from src.utils.model_loader import load_local_or_download, set_torch_threads
+from src.utils.ner_engine import run_batched_ner, NER_BATCH_SIZE
+
+MODEL_NAME = "dslim/bert-base-NER"
+MODEL_LOCAL_DIR = "./data/models/dslim-bert-base-ner"
+FIXTURE = Path(__file__).parent / "fixtures" / "ner_corpus.jsonl"
+
+
+def load_corpus(path: Path) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def model_size_mb(ner) -> float:
+    """Serialized state_dict size; parameter counting misses the packed int8 weights."""
+    import torch
+    buf = io.BytesIO()
+    torch.save(ner.model.state_dict(), buf)
+    return buf.tell() / (1024 * 1024)
+
+def _norm(s: str) -> str:
+    return " ".join((s or "").replace(" ##", "").lower().split())
+
+def entity_set(ents: List[Dict]) -> Set[Tuple[str, str]]:
+    return {(e.get("entity_group"), _norm(e.get("word"))) for e in ents}
+
+def span_set(ents: List[Dict]) -> Set[Tuple[str, int, int]]:
+    return {(e.get("entity_group"), e.get("start"), e.get("end")) for e in ents}
+
+def prf(pred: List[Set], gold: List[Set]) -> Dict[str, float]:
+    tp = sum(len(p & g) for p, g in zip(pred, gold))
+    n_pred = sum(len(p) for p in pred)
+    n_gold = sum(len(g) for g in gold)
+    precision = tp / n_pred if n_pred else 0.0
+    recall = tp / n_gold if n_gold else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+def run_backend(backend: str, texts: List[str], repeat: int, batch_size: int):
+    t0 = time.perf_counter()
+    ner = load_local_or_download(MODEL_NAME, MODEL_LOCAL_DIR, task="ner", backend=backend)
+    load_s = time.perf_counter() - t0
+
+    run_batched_ner(ner, texts[:batch_size], batch_size=batch_size)  # warm-up
+    workload = texts * repeat
+    t0 = time.perf_counter()
+    outputs = run_batched_ner(ner, workload, batch_size=batch_size)
+    elapsed = time.perf_counter() - t0
+    return {
+        "backend": backend,
+        "load_s": load_s,
+        "size_mb": model_size_mb(ner),
+        "stories_per_s": len(workload) / elapsed,
+        "chars_per_s": sum(len(t) for t in workload) / elapsed,
+        "ms_per_story": 1000 * elapsed / len(workload),
+        "outputs": outputs[:len(texts)],
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", type=Path, default=FIXTURE, help="jsonl with 'text' and optional gold 'entities'")
+    parser.add_argument("--backends", nargs="+", default=["fp32", "int8"])
+    parser.add_argument("--repeat", type=int, default=4, help="times the corpus is replayed for the timing run")
+    parser.add_argument("--batch-size", type=int, default=NER_BATCH_SIZE)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = torch default)")
+    args = parser.parse_args()
+
+    set_torch_threads(args.threads)
+    corpus = load_corpus(args.corpus)
+    texts = [doc["text"] for doc in corpus]
+    gold = [{(e["label"], _norm(e["text"])) for e in doc.get("entities", [])} for doc in corpus]
+    has_gold = any(gold)
+    print(f"{len(texts)} stories x{args.repeat}, batch size {args.batch_size}, threads {args.threads or 'default'}")
+
+    results = [run_backend(b, texts, args.repeat, args.batch_size) for b in args.backends]
+    reference = results[0]
+
+    print(f"{'backend':>8} {'load s':>8} {'size MB':>8} {'story/s':>9} {'ms/story':>9} {'speedup':>8} {'gold F1':>8} {'agree F1':>9}")
+    for r in results:
+        speedup = r["stories_per_s"] / reference["stories_per_s"]
+        gold_f1 = prf([entity_set(o) for o in r["outputs"]], gold)["f1"] if has_gold else float("nan")
+        agree_f1 = prf([span_set(o) for o in r["outputs"]], [span_set(o) for o in reference["outputs"]])["f1"]
+        print(f"{r['backend']:>8} {r['load_s']:>8.2f} {r['size_mb']:>8.1f} {r['stories_per_s']:>9.1f} "
+              f"{r['ms_per_story']:>9.1f} {speedup:>7.2f}x {gold_f1:>8.3f} {agree_f1:>9.3f}")
+
+    # the stories where a backend disagrees with the reference are the ones worth reading
+    for r in results[1:]:
+        diffs = [
+            (i, sorted(entity_set(ref) - entity_set(out)), sorted(entity_set(out) - entity_set(ref)))
+            for i, (ref, out) in enumerate(zip(reference["outputs"], r["outputs"]))
+            if entity_set(ref) != entity_set(out)
+        ]
+        print(f"\n{r['backend']} vs {reference['backend']}: {len(diffs)} of {len(texts)} stories differ")
+        for i, lost, gained in diffs[:10]:
+            print(f"  #{i}: missing {lost} extra {gained}")
+
+if __name__ == "__main__":
+    main()
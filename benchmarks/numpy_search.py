@@ -0,0 +1,67 @@
+"""
+Compares the previous no-FAISS query path (cosine similarity over the whole float32
+matrix, full argsort, Python loop) with the blocked MatrixSearcher over float32, float16
+and int8 matrices, per query and in batches.
+
+run on CLI using "python -m benchmarks.numpy_search --sizes 100000 500000 --batch 32"
+"""
+import argparse, time
+import numpy as np
+from src.core.matrix_search import COMPACT_DTYPES, MatrixSearcher, compress
+
+
+def legacy_query(qvec: np.ndarray, mat: np.ndarray, ids: np.ndarray, top_k: int):
+    """The pre-engine fallback: util.cos_sim normalizes both sides, then a full sort."""
+    try:
+        from sentence_transformers import util
+        cos = util.cos_sim(qvec, mat)[0].numpy()
+    except ImportError:
+        cos = (mat / np.linalg.norm(mat, axis=1, keepdims=True)) @ (qvec[0] / np.linalg.norm(qvec[0]))
+    top = np.argsort(-cos)[:top_k]
+    return [{"id": int(ids[ix]), "score": float(cos[ix])} for ix in top]
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vecs = rng.standard_normal((n, dim)).astype("float32")
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--batch", type=int, default=32, help="queries per batched call")
+    args = parser.parse_args()
+
+    print(f"{'vectors':>9} {'engine':>8} {'size_MB':>8} {'ms/query':>9} {'batched_ms/query':>17} "
+          f"{'recall@' + str(args.k):>9} {'speedup':>8}")
+    for n in args.sizes:
+        mat = synthetic_vectors(n, args.dim)
+        ids = np.arange(n, dtype=np.int64)
+        queries = synthetic_vectors(args.queries, args.dim, seed=1)
+
+        t0 = time.perf_counter()
+        truth = [[h["id"] for h in legacy_query(q[None, :], mat, ids, args.k)] for q in queries]
+        legacy = (time.perf_counter() - t0) / len(queries) * 1000
+        print(f"{n:>9} {'legacy':>8} {mat.nbytes / 1e6:>8.1f} {legacy:>9.2f} {'-':>17} {1.0:>9.3f} {1.0:>7.1f}x")
+
+        for dtype in COMPACT_DTYPES:
+            searcher = MatrixSearcher(*compress(mat, dtype))
+
+            t0 = time.perf_counter()
+            found = [searcher.search(q[None, :], args.k)[1][0] for q in queries]
+            single = (time.perf_counter() - t0) / len(queries) * 1000
+
+            t0 = time.perf_counter()
+            for start in range(0, len(queries), args.batch):
+                searcher.search(queries[start:start + args.batch], args.k)
+            batched = (time.perf_counter() - t0) / len(queries) * 1000
+
+            recall = np.mean([len(set(f.tolist()) & set(t)) / args.k for f, t in zip(found, truth)])
+            print(f"{n:>9} {dtype:>8} {searcher.nbytes / 1e6:>8.1f} {single:>9.2f} {batched:>17.2f} "
+                  f"{recall:>9.3f} {legacy / batched:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,110 +1,317 @@
 from typing import TypedDict, List, Dict
 from langgraph.graph import StateGraph, END
-from sentence_transformers import SentenceTransformer
-import faiss, os
+import os, json
 from src.core.database import (
     fetch_raw_articles, 
+    fetch_raw_articles_by_ids,
     create_unique_stories_table, 
-    insert_unique_stories
+    insert_unique_stories,
+    update_unique_story,
+    replace_unique_stories,
+    fetch_unique_stories,
+    fetch_stories_by_ids,
+    max_story_seq,
+    get_watermark,
+    set_watermark
 )
+from src.core.article_embedding_cache import ArticleEmbeddingCache
+from src.core.story_centroids import StoryCentroidIndex
+from src.utils.clustering import cluster_embeddings, parse_published_at
+from src.utils.minhash import lexical_groups
+from src.utils.model_loader import get_sentence_transformer
 import numpy as np
 from IPython.display import display, Image
 
 
 class DeDupState(TypedDict):
     raw_articles: List[Dict]
+    lexical_reps: List[int]
     embeddings: np.ndarray
+    attached: Dict[int, List[int]]
+    unassigned: List[int]
     clusters: List[List[int]]
     unique_stories: List[Dict]
+    full_rebuild: bool
+
+WATERMARK_STAGE = "dedup"
+SIM_THRESHOLD = 0.80
+# estimated Jaccard similarity of character shingles above which articles are treated as reposts
+LEXICAL_THRESHOLD = float(os.getenv("DEDUP_LEXICAL_THRESHOLD", "0.90"))
+# max hours between two articles' published_at for them to be linked; unset = no limit
+_window_hours = os.getenv("DEDUP_TIME_WINDOW_HOURS")
+TIME_WINDOW = float(_window_hours) * 3600 if _window_hours else None
 
 
 def load_articles(state: DeDupState) -> DeDupState:
-    """Fetches raw articles from the database"""
-    rows = fetch_raw_articles()
+    """Fetches raw articles newer than the dedup watermark (all of them on a full rebuild)"""
+    create_unique_stories_table()
+    after_id = 0 if state.get("full_rebuild") else get_watermark(WATERMARK_STAGE)
+    rows = fetch_raw_articles(after_id=after_id)
     state["raw_articles"] = rows
-    print(f"[DeDup Agent] Loaded {len(rows)} raw articles.")
+    print(f"[DeDup Agent] Loaded {len(rows)} raw articles (after id {after_id}).")
+
+    return state
+
+def _article_text(a: Dict) -> str:
+    return f"{a['title']} {a['content']}"
 
+def lexical_prefilter(state: DeDupState) -> DeDupState:
+    """
+    Collapses exact and near-exact reposts (MinHash + LSH over character shingles)
+    so only one representative per lexical group goes through the embedding model.
+    """
+    texts = [_article_text(a) for a in state["raw_articles"]]
+    reps = lexical_groups(texts, threshold=LEXICAL_THRESHOLD)
+    state["lexical_reps"] = reps.tolist()
+    n_reps = len(np.unique(reps))
+    print(f"[DeDup Agent] Lexical prefilter kept {n_reps} of {len(texts)} articles for embedding.")
     return state
 
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+DEDUP_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 def embed_articles(state: DeDupState) -> DeDupState:
-    """Embeds raw articles using sentence-transformer embedding model."""
-    texts = [
-        f"{a['title']} {a['content']}"
-        for a in state["raw_articles"]
-    ]
-    emb = model.encode(texts, show_progress_bar=True)
-    state["embeddings"] = np.array(emb).astype('float32')
+    """
+    Embeds raw articles using sentence-transformer embedding model.
+    Vectors are cached on disk by article id + content hash, so only new or edited articles are encoded.
+    """
+    if not state["raw_articles"]:
+        model = get_sentence_transformer(DEDUP_MODEL_NAME)
+        state["embeddings"] = np.zeros((0, model.get_sentence_embedding_dimension()), dtype="float32")
+        return state
+
+    articles = state["raw_articles"]
+    reps = np.asarray(state.get("lexical_reps") or range(len(articles)), dtype=np.int64)
+    uniq, inverse = np.unique(reps, return_inverse=True)
+
+    # lexical duplicates share their representative's vector
+    emb = _embed_with_cache([articles[i] for i in uniq])
+    state["embeddings"] = np.array(emb).astype('float32')[inverse]
     print(f"[DeDup Agent] Generated Embeddings Successfully.")
 
     return state
 
-def l2_to_cos(d):
-    return 1 - (d / 2)
+def _embed_with_cache(articles: List[Dict]) -> np.ndarray:
+    texts = [_article_text(a) for a in articles]
+    cache = ArticleEmbeddingCache(DEDUP_MODEL_NAME).load()
+    return cache.get_or_encode(
+        articles, texts,
+        lambda batch: get_sentence_transformer(DEDUP_MODEL_NAME).encode(batch, show_progress_bar=True)
+    )
 
-def cluster_articles(state: DeDupState) -> DeDupState:
-    """Finds similar storues and cluster them."""
+def _parse_article_ids(raw) -> List[int]:
+    """unique_news.article_ids is stored as the str() of a list of ints."""
+    if isinstance(raw, list):
+        return [int(x) for x in raw]
+    try:
+        return [int(x) for x in json.loads(raw or "[]")]
+    except Exception:
+        return []
+
+def _refresh_centroids(centroids: StoryCentroidIndex):
+    """
+    Recomputes the centroids of stories written after the centroids were last saved: every
+    story the first time, and after a crash the stories that run wrote before it could save.
+    """
+    stories = fetch_unique_stories(after_seq=centroids.seq)
+    if not stories:
+        return
+
+    members = {st["id"]: _parse_article_ids(st["article_ids"]) for st in stories}
+    raw = fetch_raw_articles_by_ids(sorted({aid for aids in members.values() for aid in aids}))
+    if raw:
+        emb = _embed_with_cache(raw)
+        row_of = {a["id"]: i for i, a in enumerate(raw)}
+        for sid, aids in members.items():
+            idxs = [row_of[aid] for aid in aids if aid in row_of]
+            if idxs:
+                centroids.replace(sid, emb[idxs])
+    centroids.save(seq=max(st["story_seq"] for st in stories))
+    print(f"[DeDup Agent] Recomputed centroids for {len(stories)} stories written since the last save.")
+
+def assign_to_stories(state: DeDupState) -> DeDupState:
+    """
+    Attaches each new article to the nearest existing story whose centroid is above
+    SIM_THRESHOLD. Articles that match nothing are left for cluster_articles.
+    """
     emb = state["embeddings"]
-    dim = emb.shape[1]
-    index = faiss.IndexFlatL2(dim)
-    index.add(emb)
+    n = len(emb)
+    if state.get("full_rebuild"):
+        state["attached"] = {}
+        state["unassigned"] = list(range(n))
+        return state
 
-    distances, indices = index.search(emb, k=7)
+    # also on empty runs: save_stories stamps the centroids with the current story_seq
+    centroids = StoryCentroidIndex().load()
+    _refresh_centroids(centroids)
+    if n == 0:
+        state["attached"] = {}
+        state["unassigned"] = []
+        return state
 
-    clusters = []
-    visited = set()
+    # articles a crashed run already placed go back to their story, which skips them when saving
+    attached = {}
+    rest = []
+    for i, a in enumerate(state["raw_articles"]):
+        if a.get("story_id") is not None:
+            attached.setdefault(int(a["story_id"]), []).append(i)
+        else:
+            rest.append(i)
+    if len(rest) < n:
+        print(f"[DeDup Agent] {n - len(rest)} articles were already placed by an interrupted run.")
 
-    for i, neighbors in enumerate(indices):
-        if i in visited:
-            continue
+    story_ids, sims = centroids.nearest(emb[rest])
+    unassigned = []
+    for i, sid, sim in zip(rest, story_ids, sims):
+        if sid >= 0 and sim >= SIM_THRESHOLD:
+            attached.setdefault(int(sid), []).append(i)
+        else:
+            unassigned.append(i)
+
+    state["attached"] = attached
+    state["unassigned"] = unassigned
+    print(f"[DeDup Agent] Attached {n - len(unassigned)} articles to {len(attached)} existing stories.")
+    return state
+
+def cluster_articles(state: DeDupState) -> DeDupState:
+    """
+    Clusters the articles not attached to an existing story: every pair above SIM_THRESHOLD
+    (optionally published within DEDUP_TIME_WINDOW_HOURS) is linked, and clusters are the
+    connected components, so results are transitive and independent of article order.
+    """
+    unassigned = state.get("unassigned")
+    if unassigned is None:
+        unassigned = list(range(len(state["embeddings"])))
+    if not unassigned:
+        state["clusters"] = []
+        return state
+
+    timestamps = None
+    if TIME_WINDOW is not None:
+        timestamps = [parse_published_at(state["raw_articles"][i].get("published_at")) for i in unassigned]
 
-        cluster = []
-        for j, dist in zip(neighbors, distances[i]):
-            if l2_to_cos(dist) > 0.80:
-                cluster.append(j)
-                visited.add(j)
-        clusters.append((cluster))
+    local = cluster_embeddings(
+        state["embeddings"][unassigned],
+        threshold=SIM_THRESHOLD,
+        timestamps=timestamps,
+        time_window=TIME_WINDOW,
+    )
+    # cluster positions are local to the unassigned subset; map back to raw_articles indices
+    clusters = [[unassigned[j] for j in c] for c in local]
 
     state["clusters"] = clusters
     print(f"[DeDup Agent] Formed {len(clusters)} unique clusters.")
 
     return state
 
+def _story_from_cluster(articles: List[Dict]) -> Dict:
+    return {
+        "article_ids": [a["id"] for a in articles],
+        "article_title": articles[0]["title"],
+        "combined_text": " ".join([a["content"] for a in articles]),
+        "num_articles": len(articles),
+    }
+
+def _replace_all_stories(state: DeDupState) -> DeDupState:
+    """
+    Full rebuild: the clusters of every raw article replace all existing stories in one
+    transaction (see replace_unique_stories), and the centroids are rebuilt from them.
+    """
+    df = state["raw_articles"]
+    emb = state["embeddings"]
+    clusters = state["clusters"]
+
+    # cleared first: if we stop before the final save, the next run recomputes them from
+    # whichever stories the database holds (the old ones until the transaction commits)
+    centroids = StoryCentroidIndex().load()
+    centroids.reset()
+    centroids.save(seq=0)
+
+    stories = [_story_from_cluster([df[i] for i in cluster]) for cluster in clusters]
+    ids = replace_unique_stories(stories)
+    for story, sid, cluster in zip(stories, ids, clusters):
+        story["id"] = sid
+        centroids.replace(sid, emb[cluster])
+    centroids.save(seq=max_story_seq())
+
+    state["unique_stories"] = stories
+    print(f"[DeDup Agent] Rebuilt {len(stories)} unique stories from {len(df)} articles.")
+    if df:
+        set_watermark(WATERMARK_STAGE, max(a["id"] for a in df))
+    return state
+
 def save_stories(state: DeDupState) -> DeDupState:
-    """Saves unique stories in the database"""
+    """Updates the stories new articles were attached to and saves new unique stories in the database"""
     create_unique_stories_table()
-    
+    if state.get("full_rebuild"):
+        return _replace_all_stories(state)
+
     df = state["raw_articles"]
-    clusters = state["clusters"]
+    emb = state["embeddings"]
+    clusters = list(state["clusters"])
+    attached = state.get("attached") or {}
+    centroids = StoryCentroidIndex().load()
     stories = []
+    recovered = []
 
-    for cluster in clusters:
-        articles = [df[i] for i in cluster]
-        # print(articles[:3])
+    existing = {r["id"]: r for r in fetch_stories_by_ids(list(attached))} if attached else {}
+    for sid, idxs in attached.items():
+        row = existing.get(sid)
+        if row is None:
+            # story vanished from the db since its centroid was stored; treat as a new cluster
+            clusters.append(idxs)
+            continue
+        # a rerun after a crash sees articles the story already holds; merge each article once
+        known = set(_parse_article_ids(row["article_ids"]))
+        if any(df[i].get("story_id") == sid for i in idxs):
+            # written by an interrupted run that never handed it on; the index update still needs it
+            recovered.append({k: row[k] for k in ("id", "article_ids", "article_title", "combined_text", "num_articles")})
+        idxs = [i for i in idxs if df[i]["id"] not in known]
+        if not idxs:
+            continue
+        articles = [df[i] for i in idxs]
         story = {
-            "article_ids": [a["id"] for a in articles],
-            "article_title": articles[0]["title"],
-            "combined_text": " ".join([a["content"] for a in articles]),
-            "num_articles": len(articles),
+            "id": sid,
+            "article_ids": _parse_article_ids(row["article_ids"]) + [a["id"] for a in articles],
+            "article_title": row["article_title"],
+            "combined_text": " ".join([row["combined_text"] or ""] + [a["content"] for a in articles]),
         }
+        story["num_articles"] = len(story["article_ids"])
+        update_unique_story(story)
+        centroids.add(sid, emb[idxs])
         stories.append(story)
-        insert_unique_stories(story)
 
-    state["unique_stories"] = stories
-    print(f"[DeDup Agent] Saved {len(stories)} unique stories.")
+    updated = len(stories)
+    for cluster in clusters:
+        story = _story_from_cluster([df[i] for i in cluster])
+        story["id"] = insert_unique_stories(story)
+        centroids.add(story["id"], emb[cluster])
+        stories.append(story)
+
+    # centroids and the story_seq they cover are committed together; the articles' story_id
+    # (written with each story) keeps a crash before this point from duplicating stories
+    centroids.save(seq=max_story_seq())
+    written = {st["id"] for st in stories}
+    state["unique_stories"] = stories + [st for st in recovered if st["id"] not in written]
+    print(f"[DeDup Agent] Saved {len(stories) - updated} new unique stories, updated {updated} existing stories.")
+
+    if df:
+        set_watermark(WATERMARK_STAGE, max(a["id"] for a in df))
     return state
 
 def build_dedup_graph():
     graph = StateGraph(DeDupState)
 
     graph.add_node("load_articles", load_articles)
+    graph.add_node("lexical_prefilter", lexical_prefilter)
     graph.add_node("embed_articles", embed_articles)
+    graph.add_node("assign_to_stories", assign_to_stories)
     graph.add_node("cluster_articles", cluster_articles)
     graph.add_node("save_stories", save_stories)
 
     graph.set_entry_point("load_articles")
-    graph.add_edge("load_articles", "embed_articles")
-    graph.add_edge("embed_articles", "cluster_articles")
+    graph.add_edge("load_articles", "lexical_prefilter")
+    graph.add_edge("lexical_prefilter", "embed_articles")
+    graph.add_edge("embed_articles", "assign_to_stories")
+    graph.add_edge("assign_to_stories", "cluster_articles")
     graph.add_edge("cluster_articles", "save_stories")
     graph.add_edge("save_stories", END)
     
@@ -116,9 +323,13 @@ if __name__ == "__main__":
 
     result = deduplication_app.invoke({
         "raw_articles": [],
+        "lexical_reps": [],
         "embeddings": None,
+        "attached": {},
+        "unassigned": [],
         "clusters": [],
-        "unique_stories": []
+        "unique_stories": [],
+        "full_rebuild": False
     })
 
     print("Deduplication complete!")
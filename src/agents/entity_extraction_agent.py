@@ -1,12 +1,19 @@
 from typing import TypedDict, List, Dict
-import os
+import os, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from langgraph.graph import StateGraph, START, END
 from src.core import (
-    fetch_unique_stories, create_news_entities_table, insert_entities
+    fetch_unique_stories, create_unique_stories_table, create_news_entities_table, insert_entities_bulk,
+    get_watermark, set_watermark
 )
+from src.core.database import ENTITY_TYPES
 from src.utils import (
-    load_local_or_download, match_rules, postprocess_entities
+    get_ner_pipeline, match_rules, postprocess_entities
 )
+from src.utils.ner_engine import run_batched_ner, NER_MAX_TOKENS, NER_CHUNK_OVERLAP
+from src.utils.model_loader import NER_BACKEND, NER_NUM_THREADS
+from src.utils.entity_cache import EntityCache, text_hash
+from src.utils.entity_utils import GAZ_VERSION
 
 
 class EntityExtractionAgent(TypedDict):
@@ -14,37 +21,63 @@ class EntityExtractionAgent(TypedDict):
     ner_results: List[Dict]
     extended_ner: List[Dict]
     saved_count: int
+    full_rebuild: bool
+
+WATERMARK_STAGE = "ner"
 
 
 def fetch_stories(state: EntityExtractionAgent) -> EntityExtractionAgent:
-    """Fetches stories from the database"""
-    stories = fetch_unique_stories(limit=None)
+    """Fetches stories written since the NER watermark, new or extended by dedup (all of them on a full rebuild)"""
+    create_unique_stories_table()
+    after_seq = 0 if state.get("full_rebuild") else get_watermark(WATERMARK_STAGE)
+    stories = fetch_unique_stories(limit=None, after_seq=after_seq)
     state["stories"] = stories
-    print(f"[NER Agent] Loaded {len(stories)} unique stories.")
+    print(f"[NER Agent] Loaded {len(stories)} unique stories (after seq {after_seq}).")
     return state
 
 model_local_dir = "./data/models/dslim-bert-base-ner"
 model_name = "dslim/bert-base-NER"
+# anything that changes NER output must be part of the cache version
+NER_VERSION = f"{model_name}|{NER_BACKEND}|max{NER_MAX_TOKENS}|overlap{NER_CHUNK_OVERLAP}"
+NER_CACHE_SLICE = 256
 
 def run_ner_on_stories(state: EntityExtractionAgent) -> EntityExtractionAgent:
-    ner = load_local_or_download(model_name, model_local_dir, task="ner")
-    results = []
-    for s in state["stories"]:
-        text = s.get("combined_text")
+    if not state["stories"]:
+        state["ner_results"] = []
+        return state
 
-        if len(text) > 3000: # Chunking
-            chunks = [text[i:i+2000] for i in range(0, len(text), 2000)]
-        else:
-            chunks = [text]
-        entities = []
-        for c in chunks:
-            try:
-                chunk_out = ner(c)
-                if chunk_out:
-                    entities.extend(chunk_out)
+    results = _ner_items(state["stories"])
+    state["ner_results"] = results
+    print(f"[NER Agent] Completed NER on {len(results)} stories")
+    return state
 
-            except Exception as e:
-                print(f"[NER Agent] Chunk failed: {e}")
+# -----Helper functions-----
+def _load_ner(num_threads=None):
+    return get_ner_pipeline(model_name, model_local_dir, task="ner", backend=NER_BACKEND, num_threads=num_threads)
+
+def _ner_items(stories: List[Dict]) -> List[Dict]:
+    """
+    NER for each story, served from the entity cache when the text was seen before.
+    The model is only loaded if at least one story misses the cache.
+    """
+    texts = [s.get("combined_text") or "" for s in stories]
+    hashes = [text_hash(t) for t in texts]
+    cache = EntityCache()
+    cached = cache.get_many("ner", NER_VERSION, hashes)
+
+    missing = [i for i, h in enumerate(hashes) if h not in cached]
+    # persist every slice, so a crash mid-run keeps the work already done
+    for start in range(0, len(missing), NER_CACHE_SLICE):
+        part = missing[start:start+NER_CACHE_SLICE]
+        fresh = run_batched_ner(_load_ner(), [texts[i] for i in part])
+        new_items = {hashes[i]: ents for i, ents in zip(part, fresh)}
+        cache.put_many("ner", NER_VERSION, new_items)
+        cached.update(new_items)
+    print(f"[NER Agent] NER cache: {len(stories) - len(missing)} hits, {len(missing)} misses.")
+    entities_per_story = [cached[h] for h in hashes]
+
+    results = []
+    for s, text, entities in zip(stories, texts, entities_per_story):
         results.append({
             "story_id": s["id"],
             "title": s.get("article_title"),
@@ -52,11 +85,8 @@ def run_ner_on_stories(state: EntityExtractionAgent) -> EntityExtractionAgent:
             "ner": entities,
             "text": text
             })
-    state["ner_results"] = results
-    print(f"[NER Agent] Completed NER on {len(results)} stories")
-    return state
+    return results
 
-# -----Helper functions-----
 def _clean_subword_tokens(token_str: str) -> str:
     """
     If NER left merged strings like '##E' or 'Hyun ##dai' this attempts to reconstruct.
@@ -98,77 +128,155 @@ def _normalize_entity_list(lst):
         out.append(cleaned)
     return out
 
-def apply_rules_and_merge(state: EntityExtractionAgent) -> EntityExtractionAgent:
-    extended_ents = []
-    for item in state["ner_results"]:
-        text = item["text"]
-        ner_out = item["ner"]
+def _extend_item(item: Dict, rules: Dict) -> Dict:
+    ner_out = item["ner"]
+
+    cleaned = postprocess_entities(ner_out, rules)
+    if not isinstance(cleaned, dict):
+        cleaned = {}
 
-        rules = match_rules(text)
-        cleaned = postprocess_entities(ner_out, rules)
-        if not isinstance(cleaned, dict):
-            cleaned = {}
+    # inject story metadata so insert_entities gets story_id, article_ids and article_title
+    cleaned["story_id"] = item.get("story_id")
+    cleaned["article_ids"] = item.get("article_ids")
+    cleaned["article_title"] = item.get("title")
 
-        # inject story metadata so insert_entities gets story_id, article_ids and article_title
-        cleaned["story_id"] = item.get("story_id")
-        cleaned["article_ids"] = item.get("article_ids")
-        cleaned["article_title"] = item.get("title")
+    # Normalize lists and clean tokens (remove '##' etc)
+    for k in ["companies", "sectors", "people", "indices", "regulators", "policies", "products", "locations", "kpis", "financial_terms"]:
+        cleaned[k] = _normalize_entity_list(cleaned.get(k, []))
+    return cleaned
 
-        # Normalize lists and clean tokens (remove '##' etc)
-        for k in ["companies", "sectors", "people", "indices", "regulators", "policies", "products", "locations", "kpis", "financial_terms"]:
-            cleaned[k] = _normalize_entity_list(cleaned.get(k, []))
+def _extend_items(items: List[Dict]) -> List[Dict]:
+    """Rule matching (cached per text hash and gazetteer version) merged with the NER output."""
+    hashes = [text_hash(item["text"]) for item in items]
+    cache = EntityCache()
+    cached = cache.get_many("rules", GAZ_VERSION, hashes)
 
-        extended_ents.append(cleaned)
+    new_rules = {}
+    for item, h in zip(items, hashes):
+        if h not in cached and h not in new_rules:
+            new_rules[h] = match_rules(item["text"])
+    cache.put_many("rules", GAZ_VERSION, new_rules)
+    cached.update(new_rules)
+
+    return [_extend_item(item, cached[h]) for item, h in zip(items, hashes)]
+
+def apply_rules_and_merge(state: EntityExtractionAgent) -> EntityExtractionAgent:
+    extended_ents = _extend_items(state["ner_results"])
 
     state["extended_ner"] = extended_ents
     print(f"[NER Agent] Performed NER extension on {len(extended_ents)} stories")
 
     return state
 
+def _entity_payload(rows: List[Dict]) -> List[Dict]:
+    # defensive: ensure keys exist and are lists/strings as expected by insert_entities_bulk
+    return [
+        {
+            "story_id": row.get("story_id"),
+            "article_ids": row.get("article_ids"),
+            "article_title": row.get("article_title"),
+            **{k: row.get(k, []) for k in ENTITY_TYPES},
+        }
+        for row in rows
+    ]
+
+def _advance_watermark(stories: List[Dict], failed_ids: List[int]):
+    """The watermark follows unique_news.story_seq; never move it past a story that failed."""
+    if stories:
+        failed = set(failed_ids)
+        failed_seqs = [s["story_seq"] for s in stories if s["id"] in failed]
+        last_seq = min(failed_seqs) - 1 if failed_seqs else max(s["story_seq"] for s in stories)
+        set_watermark(WATERMARK_STAGE, last_seq)
+
 def save_entities(state: EntityExtractionAgent) -> EntityExtractionAgent:
     create_news_entities_table()
-    count = 0
-    for row in state["extended_ner"]:
-        try:
-            # defensive: ensure keys exist and are lists/strings as expected by insert_entities
-            row_payload = {
-                "story_id": row.get("story_id"),
-                "article_ids": row.get("article_ids"),
-                "article_title": row.get("article_title"),
-                "companies": row.get("companies", []),
-                "sectors": row.get("sectors", []),
-                "people": row.get("people", []),
-                "indices": row.get("indices", []),
-                "regulators": row.get("regulators", []),
-                "policies": row.get("policies", []),
-                "products": row.get("products", []),
-                "locations": row.get("locations", []),
-                "kpis": row.get("kpis", []),
-                "financial_terms": row.get("financial_terms", [])
-            }
-            insert_entities(row_payload)
-            count += 1
-        except Exception as e:
-            print(f"[Ingestion Agent] Failed to insert: {e}")
-    
+    result = insert_entities_bulk(_entity_payload(state["extended_ner"]))
+    count, failed_ids = result["saved"], result["failed_ids"]
+
     state["saved_count"] = count
     print(f"[NER Agent] Saved {count} entity rows.")
+
+    _advance_watermark(state["stories"], failed_ids)
+    return state
+
+
+# -----Multi-process extraction-----
+NER_WORKERS = int(os.getenv("NER_WORKERS", "1"))
+NER_SHARD_SIZE = int(os.getenv("NER_SHARD_SIZE", "64"))
+
+def _worker_init(torch_threads: int):
+    """Runs once per worker process: loads the NER model with its share of the torch threads."""
+    _load_ner(num_threads=torch_threads)
+
+def _extract_shard(stories: List[Dict]) -> List[Dict]:
+    """NER + rules + post-processing for one shard, inside a worker process."""
+    return _extend_items(_ner_items(stories))
+
+def run_parallel_extraction(state: EntityExtractionAgent, num_workers: int) -> EntityExtractionAgent:
+    """
+    Shards stories across `num_workers` processes, each holding its own NER model,
+    and saves each shard's entities as soon as it completes. A shard that fails, in its
+    worker or while saving, is reported and holds the watermark back; the others are kept.
+    """
+    stories = state["stories"]
+    state["extended_ner"] = []
+    if not stories:
+        state["saved_count"] = 0
+        return state
+
+    # strip to what the workers need so less is pickled across the process boundary
+    payload = [{k: s.get(k) for k in ("id", "article_title", "article_ids", "combined_text")} for s in stories]
+    shards = [payload[i:i+NER_SHARD_SIZE] for i in range(0, len(payload), NER_SHARD_SIZE)]
+    torch_threads = max(1, (NER_NUM_THREADS or os.cpu_count() or 1) // num_workers)
+
+    create_news_entities_table()
+    saved, failed_ids = 0, []
+    # spawn, not fork: forking a process that already initialised torch threads can deadlock
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=ctx,
+                             initializer=_worker_init, initargs=(torch_threads,)) as pool:
+        futures = {pool.submit(_extract_shard, shard): shard for shard in shards}
+        for done, fut in enumerate(as_completed(futures), 1):
+            shard_ids = [s["id"] for s in futures[fut]]
+            try:
+                result = insert_entities_bulk(_entity_payload(fut.result()))
+            except Exception as e:
+                failed_ids.extend(shard_ids)
+                print(f"[NER Agent] Shard {done}/{len(shards)} failed ({len(shard_ids)} stories): {e}")
+                continue
+            saved += result["saved"]
+            failed_ids.extend(result["failed_ids"])
+            print(f"[NER Agent] Shard {done}/{len(shards)} saved {result['saved']} stories.")
+
+    state["saved_count"] = saved
+    print(f"[NER Agent] Saved entities for {saved} stories on {num_workers} workers, {len(failed_ids)} failed.")
+    _advance_watermark(stories, failed_ids)
     return state
 
 
-def build_entity_graph():
+def build_entity_graph(num_workers: int = NER_WORKERS):
+    """num_workers > 1 replaces the in-process NER/rules nodes with a process pool."""
     graph = StateGraph(EntityExtractionAgent)
 
     graph.add_node("fetch_stories", fetch_stories)
-    graph.add_node("run_ner", run_ner_on_stories)
-    graph.add_node("extended_ner", apply_rules_and_merge)
-    graph.add_node("save_entities", save_entities)
-
     graph.set_entry_point("fetch_stories")
-    graph.add_edge("fetch_stories", "run_ner")
-    graph.add_edge("run_ner", "extended_ner")
-    graph.add_edge("extended_ner", "save_entities")
-    graph.add_edge("save_entities", END)
+
+    if num_workers > 1:
+        def parallel_extraction(state: EntityExtractionAgent) -> EntityExtractionAgent:
+            return run_parallel_extraction(state, num_workers)
+
+        # shards are saved as they complete, so there is no separate save step
+        graph.add_node("parallel_extraction", parallel_extraction)
+        graph.add_edge("fetch_stories", "parallel_extraction")
+        graph.add_edge("parallel_extraction", END)
+    else:
+        graph.add_node("run_ner", run_ner_on_stories)
+        graph.add_node("extended_ner", apply_rules_and_merge)
+        graph.add_node("save_entities", save_entities)
+        graph.add_edge("fetch_stories", "run_ner")
+        graph.add_edge("run_ner", "extended_ner")
+        graph.add_edge("extended_ner", "save_entities")
+        graph.add_edge("save_entities", END)
 
     return graph.compile()
 
@@ -180,7 +288,8 @@ if __name__ == "__main__":
         "stories": [],
         "ner_results": [],
         "extended_ner": [],
-        "saved_count": 0
+        "saved_count": 0,
+        "full_rebuild": False
     })
 
     img_bytes = ner_app.get_graph().draw_mermaid_png()
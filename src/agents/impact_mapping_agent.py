@@ -1,10 +1,11 @@
 from typing import TypedDict, List, Dict
 from langgraph.graph import StateGraph, START, END
 from src.core import (
-    fetch_unprocessed_entities, create_story_impacts_table, insert_story_impacts
+    fetch_unprocessed_entities, create_news_entities_table, create_story_impacts_table, insert_story_impacts_bulk,
+    get_watermark, set_watermark
 )
 from src.utils import (
-    load_mapping, compute_impacts_for_entities
+    load_mapping, compute_impacts_batch
 )
 import os, json
 
@@ -13,40 +14,50 @@ class ImpactMappingAgent(TypedDict):
     entities: List[Dict]
     computed_impacts: List[Dict]
     saved_count: int
+    full_rebuild: bool
+
+WATERMARK_STAGE = "impact"
+# stories per compute_impacts_batch call; bounds the engine's (stories x symbols) working set
+IMPACT_BATCH_SIZE = int(os.getenv("IMPACT_BATCH_SIZE", "512"))
 
 
 def load_entities(state: ImpactMappingAgent) -> ImpactMappingAgent:
-    """Fetch entity rows to be impact-mapped"""
+    """Fetch entity rows to be impact-mapped, starting after the impact watermark"""
+    # news_entities migrates first: it adds entity_seq and re-keys legacy story_impacts rows
+    create_news_entities_table()
     create_story_impacts_table()
-    items = fetch_unprocessed_entities()
+    full_rebuild = bool(state.get("full_rebuild"))
+    after_seq = 0 if full_rebuild else get_watermark(WATERMARK_STAGE)
+    # a full rebuild recomputes stories that already have impacts; the writer upserts them
+    items = fetch_unprocessed_entities(after_seq=after_seq, include_processed=full_rebuild)
     state["entities"] = items
     print(f"[Impact Mapping Agent] Loaded {len(items)} stories for impact mapping.")
     return state
 
 def compute_impacts(state: ImpactMappingAgent) -> ImpactMappingAgent:
-    """Compute impact mapping for each story using mapping rules"""
-    company_map, symbol_map, regulator_rules, policy_rules, sector_map = load_mapping()
-    computed = []
-
-    for row in state["entities"]:
-        story_id = row["story_id"]
-        entities = row["entities"]
-
-        impacts, summary = compute_impacts_for_entities(
-            entities=entities,
+    """Compute impact mapping for all stories, IMPACT_BATCH_SIZE at a time, using mapping rules"""
+    company_map, symbol_map, regulator_rules, policy_rules, sector_map, _ = load_mapping()
+
+    rows = state["entities"]
+    results = []
+    for i in range(0, len(rows), IMPACT_BATCH_SIZE):
+        results.extend(compute_impacts_batch(
+            [row["entities"] for row in rows[i:i+IMPACT_BATCH_SIZE]],
             company_to_symbol=company_map,
             symbol_to_sector=symbol_map,
             regulator_rules=regulator_rules,
             policy_rules=policy_rules,
             sector_to_symbols=sector_map,
-        )
-
-        computed.append({
-            "story_id": story_id,
+        ))
+    computed = [
+        {
+            "story_id": row["story_id"],
             "impacted_assets": impacts,
             "summary": summary,
-        })
-    
+        }
+        for row, (impacts, summary) in zip(state["entities"], results)
+    ]
+
     state["computed_impacts"] = computed
     print(f"[Impact Mapping Agent] Computed Impacts for {len(computed)} stories.")
     return state
@@ -54,21 +65,17 @@ def compute_impacts(state: ImpactMappingAgent) -> ImpactMappingAgent:
 def save_results(state: ImpactMappingAgent) -> ImpactMappingAgent:
     """Save impact results into the db."""
     create_story_impacts_table()
-    saved = 0
-
-    for item in state["computed_impacts"]:
-        try:
-            insert_story_impacts(
-                story_id=item["story_id"],
-                impacts=item["impacted_assets"],
-                summary=item["summary"]
-            )
-            saved += 1
-        except Exception as e:
-            print(f"[Impact Mapping Agent] Failed to save story.")
+    result = insert_story_impacts_bulk(state["computed_impacts"])
+    saved, failed_ids = result["saved"], set(result["failed_ids"])
 
     state["saved_count"] = saved
     print(f"[Impact Mapping Agent] Saved {saved} results to the DB")
+
+    # the watermark follows news_entities.entity_seq; never move it past a row that failed to save
+    if state["entities"]:
+        failed_rows = [e["entity_seq"] for e in state["entities"] if e["story_id"] in failed_ids]
+        last_seq = min(failed_rows) - 1 if failed_rows else max(e["entity_seq"] for e in state["entities"])
+        set_watermark(WATERMARK_STAGE, last_seq)
     return state
 
 
@@ -92,9 +99,10 @@ if __name__ == "__main__":
     impact_app = build_impact_mapping_graph()
 
     result = impact_app.invoke({
-        "pending_entities": [],
+        "entities": [],
         "computed_impacts": [],
-        "saved_count": 0
+        "saved_count": 0,
+        "full_rebuild": False
     })
     
     img_bytes = impact_app.get_graph().draw_mermaid_png()
@@ -1,7 +1,8 @@
 from typing import TypedDict, List, Dict
-import feedparser, re, os
+import re, os
 from langgraph.graph import StateGraph, START, END
-from src.core.database import insert_raw_articles
+from src.core.database import insert_raw_articles_bulk
+from src.utils.rss_fetcher import fetch_feeds, load_feed_state, save_feed_state
 from IPython.display import display, Image
 
 
@@ -10,24 +11,43 @@ class IngestionState(TypedDict):
     raw_articles: List[Dict]
     standardized_articles: List[Dict]
     saved_count: str
+    feed_state: Dict[str, Dict]
 
 
 def fetch_rss(state: IngestionState) -> IngestionState:
-    """This fetches raw articles from a list of different rss feeds."""
+    """
+    This fetches raw articles from a list of different rss feeds.
+    Feeds are fetched concurrently with conditional GETs, so feeds that
+    answer 304 Not Modified are skipped without parsing.
+    """
+    feed_state = load_feed_state()
     articles = []
-    for feed in state["rss_feeds"]:
-        parsed = feedparser.parse(feed)
-        for entry in parsed.entries:
+    not_modified = 0
+    for res in fetch_feeds(state["rss_feeds"], feed_state):
+        feed = res["url"]
+        if res["error"]:
+            print(f"[Ingestion Agent] Failed to fetch {feed}: {res['error']}")
+            continue
+        if res["status"] == 304:
+            not_modified += 1
+            continue
+
+        for entry in res["entries"]:
+            if not entry.get("link"):
+                continue
             articles.append({
                 "source": feed,
                 "url": entry.link,
-                "title": entry.title,
+                "title": entry.get("title", ""),
                 "content": getattr(entry, "summary", ""),
                 "published_at": getattr(entry, "published", None)
             })
+        feed_state[feed] = {"etag": res["etag"], "modified": res["modified"]}
 
+    # validators are only persisted by save_to_db, once the articles are stored
+    state["feed_state"] = feed_state
     state["raw_articles"] = articles
-    print(f"[Ingestion Agent] Fetched {len(articles)} raw articles from RSS feeds.")
+    print(f"[Ingestion Agent] Fetched {len(articles)} raw articles from RSS feeds ({not_modified} feeds not modified).")
     return state
 
 def clean_text(text):
@@ -51,18 +71,19 @@ def standardize_article(state: IngestionState) -> IngestionState:
     return state
 
 def save_to_db(state: IngestionState) -> IngestionState:
-    """Saves all the standardized articles to the Postgres database."""
-    count = 0
-    for article in state["standardized_articles"]:
-        try:
-            insert_raw_articles(article)
-            count += 1
-        except Exception as e:
-            print(f"[Ingestion Agent] Failed to insert article {article['url']}: {e}")
-            break
-
-    state["saved_count"] = count
-    print(f"[Ingestion Agent] Saved {count} articles to the database.")
+    """Saves all the standardized articles to the Postgres database in batches."""
+    try:
+        counts = insert_raw_articles_bulk(state["standardized_articles"])
+    except Exception as e:
+        print(f"[Ingestion Agent] Failed to insert articles: {e}")
+        raise
+
+    state["saved_count"] = counts["inserted"]
+    print(f"[Ingestion Agent] Saved {counts['inserted']} articles to the database "
+          f"({counts['skipped']} already present).")
+
+    if state.get("feed_state"):
+        save_feed_state(state["feed_state"])
 
     return state
 
@@ -96,7 +117,8 @@ if __name__ == "__main__":
         "rss_feeds": rss_feeds,
         "raw_articles": [],
         "standardized_articles": [],
-        "saved_count": 0
+        "saved_count": 0,
+        "feed_state": {}
     })
 
     img_bytes = ingestion_app.get_graph().draw_mermaid_png()
@@ -1,3 +1,4 @@
+import os
 from flask import Flask
 from .routes.index_routes import index_bp
 from .routes.pipeline_routes import pipeline_bp
@@ -19,5 +20,10 @@ def create_app():
 
     app.register_error_handler(404, errors.page_not_found)
     app.register_error_handler(500, errors.server_error)
+
+    # optionally load the query models in the background so the first /query is not slow
+    if os.getenv("MODEL_WARMUP", "").lower() in ("1", "true", "yes"):
+        from src.utils.model_loader import MODELS
+        MODELS.warm_up(["query_processor", "retriever"])
     
     return app
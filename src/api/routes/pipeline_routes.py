@@ -1,5 +1,5 @@
 from flask import (
-    Blueprint, render_template, 
+    Blueprint, render_template, request,
     Response, jsonify, stream_with_context
 )
 from src.pipelines import build_end_to_end_pipeline
@@ -22,7 +22,7 @@ def pipeline_page():
 
 
 # ------Run Pipeline -------
-def run_pipeline_stream():
+def run_pipeline_stream(full_rebuild: bool = False):
     yield "event: message\ndata: Starting pipeline...\n\n"
 
     pipeline = build_end_to_end_pipeline()
@@ -35,7 +35,8 @@ def run_pipeline_stream():
 
         init_state = {
             "rss_feeds": rss_feeds,
-            "info": {}
+            "info": {},
+            "full_rebuild": full_rebuild
         }
         yield "event: message\ndata: RSS feeds loaded. Starting Ingestion...\n\n"
     
@@ -65,8 +66,9 @@ def run_pipeline_stream():
 
 @pipeline_bp.route("/pipeline/run/stream", methods=["GET"])
 def pipeline_stream():
+    full_rebuild = request.args.get("full_rebuild", "").lower() in ("1", "true", "yes")
     response = Response(
-        stream_with_context(run_pipeline_stream()),
+        stream_with_context(run_pipeline_stream(full_rebuild)),
         mimetype="text/event-stream"
     )
 
@@ -1,6 +1,8 @@
 from flask import Blueprint, jsonify
 from datetime import datetime
 from src.api.routes.pipeline_routes import PIPELINE_STATE
+from src.core.database import get_pool_stats
+from src.utils.model_loader import MODELS
 
 system_bp = Blueprint("system", __name__)
 
@@ -23,6 +25,16 @@ def version():
 def pipeline_status():
     return jsonify(PIPELINE_STATE), 200
 
+# ----- db connection pool metrics -----
+@system_bp.route("/system/db-pool", methods=["GET"])
+def db_pool_stats():
+    return jsonify(get_pool_stats()), 200
+
+# ----- loaded models -----
+@system_bp.route("/system/models", methods=["GET"])
+def model_stats():
+    return jsonify(MODELS.stats()), 200
+
 # ----- current server time -----
 @system_bp.route("/system/time", methods=["GET"])
 def server_time():
@@ -1,19 +1,35 @@
 from .database import (
-    insert_raw_articles, fetch_raw_articles, 
-    create_unique_stories_table, insert_unique_stories,
-    fetch_unique_stories, create_news_entities_table, insert_entities,
-    fetch_unprocessed_entities, create_story_impacts_table, insert_story_impacts
+    insert_raw_articles, insert_raw_articles_bulk, fetch_raw_articles, 
+    create_unique_stories_table, insert_unique_stories, update_unique_story,
+    fetch_unique_stories, create_news_entities_table, insert_entities, insert_entities_bulk,
+    create_story_entities_table, backfill_story_entities, fetch_stories_by_entities,
+    fetch_story_entity_values,
+    fetch_unprocessed_entities, create_story_impacts_table, insert_story_impacts,
+    insert_story_impacts_bulk,
+    get_pool_stats, close_pool, get_watermark, set_watermark
 )
 
 __all__ = [
     "insert_raw_articles",
+    "insert_raw_articles_bulk",
     "fetch_raw_articles", 
     "create_unique_stories_table", 
     "insert_unique_stories",
+    "update_unique_story",
     "fetch_unique_stories", 
     "create_news_entities_table", 
-    "insert_entities"
+    "insert_entities",
+    "insert_entities_bulk",
+    "create_story_entities_table",
+    "backfill_story_entities",
+    "fetch_stories_by_entities",
+    "fetch_story_entity_values",
     "fetch_unprocessed_entities",
     "create_story_impacts_table", 
-    "insert_story_impacts"
+    "insert_story_impacts",
+    "insert_story_impacts_bulk",
+    "get_pool_stats",
+    "close_pool",
+    "get_watermark",
+    "set_watermark"
 ]
\ No newline at end of file
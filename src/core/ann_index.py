@@ -0,0 +1,141 @@
+"""
+FAISS index factory for the story embedding index: exact flat search or one of the
+approximate structures (IVF-Flat, HNSW, IVF-PQ), all on inner product over normalized
+vectors and all keyed by story id.
+"""
+import os
+import numpy as np
+from typing import Dict, Optional
+
+try:
+    import faiss
+    _HAS_FAISS = True
+except Exception:
+    faiss = None
+    _HAS_FAISS = False
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+
+ANN_CONFIG = {
+    "index_type": os.getenv("EMBED_INDEX_TYPE", "flat").lower(),
+    # IVF lists; 0 picks ~4*sqrt(n) at build time
+    "nlist": int(os.getenv("ANN_NLIST", "0")),
+    "nprobe": int(os.getenv("ANN_NPROBE", "16")),
+    "hnsw_m": int(os.getenv("ANN_HNSW_M", "32")),
+    "ef_construction": int(os.getenv("ANN_EF_CONSTRUCTION", "200")),
+    "ef_search": int(os.getenv("ANN_EF_SEARCH", "64")),
+    # PQ sub-quantizers; 0 picks the largest of 64/48/32/... dividing the dimension
+    "pq_m": int(os.getenv("ANN_PQ_M", "0")),
+    "pq_bits": int(os.getenv("ANN_PQ_BITS", "8")),
+}
+# k-means wants ~39 points per centroid; below that an IVF index is not worth training
+_MIN_POINTS_PER_LIST = 39
+_MAX_TRAIN_POINTS_PER_LIST = 256
+
+
+def resolve_params(index_type: Optional[str] = None, **overrides) -> Dict:
+    params = {**ANN_CONFIG, **{k: v for k, v in overrides.items() if v is not None}}
+    params["index_type"] = (index_type or params["index_type"]).lower()
+    if params["index_type"] not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{params['index_type']}', expected one of {INDEX_TYPES}")
+    return params
+
+def _auto_nlist(n: int) -> int:
+    return int(max(1, min(4 * np.sqrt(max(n, 1)), n // _MIN_POINTS_PER_LIST)))
+
+def _auto_pq_m(dim: int) -> int:
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if dim % m == 0:
+            return m
+    return 1
+
+def min_train_size(params: Dict) -> int:
+    """Vectors needed before the configured type can be trained (0 for flat and HNSW)."""
+    kind = params["index_type"]
+    if kind not in ("ivf", "ivfpq"):
+        return 0
+    # PQ also runs k-means per sub-quantizer, over 2**pq_bits centroids
+    centroids = max(params["nlist"] or 2, 2 ** params["pq_bits"] if kind == "ivfpq" else 0)
+    return centroids * _MIN_POINTS_PER_LIST
+
+def make_index(dim: int, n: int, params: Dict):
+    """
+    Untrained index for `n` vectors of size `dim`. IVF types fall back to a flat index while
+    n is too small to train their lists; params keep the configured type either way, so the
+    caller can compare it with index_kind() and rebuild later. Returns (index, params).
+    """
+    kind = params["index_type"]
+    params = dict(params)
+    if kind in ("ivf", "ivfpq"):
+        nlist = params["nlist"] or _auto_nlist(n)
+        if n < min_train_size({**params, "nlist": nlist}) or nlist < 2:
+            print(f"[ANN Index] {n} vectors are too few to train {kind} "
+                  f"(needs {min_train_size({**params, 'nlist': nlist})}); using flat for now.")
+            kind = "flat"
+        else:
+            params["nlist"] = nlist
+
+    if kind == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dim)), params
+    if kind == "hnsw":
+        inner = faiss.IndexHNSWFlat(dim, params["hnsw_m"], faiss.METRIC_INNER_PRODUCT)
+        inner.hnsw.efConstruction = params["ef_construction"]
+        return faiss.IndexIDMap2(inner), params
+
+    quantizer = faiss.IndexFlatIP(dim)
+    if kind == "ivf":
+        index = faiss.IndexIVFFlat(quantizer, dim, params["nlist"], faiss.METRIC_INNER_PRODUCT)
+    else:
+        params["pq_m"] = params["pq_m"] or _auto_pq_m(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, params["nlist"], params["pq_m"], params["pq_bits"], faiss.METRIC_INNER_PRODUCT)
+    # IVF indexes carry their own ids, so they are not wrapped in an IDMap
+    return index, params
+
+def train_index(index, vectors: np.ndarray, seed: int = 1234):
+    """Trains IVF centroids / PQ codebooks on (a sample of) `vectors`; no-op for flat and HNSW."""
+    if index.is_trained:
+        return
+    centroids = max(getattr(index, "nlist", 1), index.pq.ksub if hasattr(index, "pq") else 0)
+    cap = centroids * _MAX_TRAIN_POINTS_PER_LIST
+    sample = vectors
+    if len(vectors) > cap:
+        rows = np.random.default_rng(seed).choice(len(vectors), cap, replace=False)
+        sample = vectors[np.sort(rows)]
+    index.train(np.ascontiguousarray(sample, dtype="float32"))
+
+def build_index(vectors: np.ndarray, ids: np.ndarray, params: Dict):
+    """Creates, trains and fills an index. Returns (index, params with resolved nlist / pq_m)."""
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    index, params = make_index(vectors.shape[1], len(vectors), params)
+    train_index(index, vectors)
+    if len(vectors):
+        index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+    return index, params
+
+def _inner(index):
+    return faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+
+def supports_remove(index) -> bool:
+    """HNSW graphs cannot delete nodes; removing from them means rebuilding."""
+    return not isinstance(_inner(index), faiss.IndexHNSW)
+
+def search_params(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None, sel=None):
+    """Per-call SearchParameters for this index type (None when nothing needs setting)."""
+    inner = _inner(index)
+    if isinstance(inner, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=sel, nprobe=nprobe or ANN_CONFIG["nprobe"])
+    if isinstance(inner, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=sel, efSearch=ef_search or ANN_CONFIG["ef_search"])
+    if sel is not None:
+        return faiss.SearchParameters(sel=sel)
+    return None
+
+def index_kind(index) -> str:
+    inner = _inner(index)
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf"
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
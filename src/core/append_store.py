@@ -0,0 +1,143 @@
+"""
+Append-only array store: named arrays in one directory, each a raw binary file of
+fixed-width rows, plus meta.json recording every array's committed length.
+
+append() writes past the committed length and commit() flushes the files before it
+replaces meta.json, so meta.json is the single commit point: a crash leaves at most an
+uncommitted tail, which load() ignores and the next append() truncates. rewrite()
+compacts into a new generation of files and switches to it with the same replace.
+"""
+import os, json, tempfile
+import numpy as np
+from pathlib import Path
+from typing import Dict, Optional
+
+META_NAME = "meta.json"
+
+
+class AppendStore:
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.meta: Dict = {}
+        self._arrays: Dict[str, Dict] = {}
+        self._generation = 0
+        self._views: Dict[str, np.ndarray] = {}
+        self._dirty = set()
+
+    def _file(self, name: str, generation: Optional[int] = None) -> Path:
+        return self.directory / f"{name}.{self._generation if generation is None else generation}.bin"
+
+    @staticmethod
+    def _row_bytes(spec: Dict) -> int:
+        return np.dtype(spec["dtype"]).itemsize * int(np.prod(spec["shape"], dtype=np.int64))
+
+    def load(self) -> bool:
+        """Opens the last committed state; False (and an empty store) when there is none or it is damaged."""
+        path = self.directory / META_NAME
+        if not path.exists():
+            return False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[Append Store] Could not read {path}: {e}")
+            return False
+        arrays, generation = meta.get("arrays", {}), int(meta.get("generation", 0))
+        for name, spec in arrays.items():
+            file = self.directory / f"{name}.{generation}.bin"
+            size = file.stat().st_size if file.exists() else -1
+            if size < spec["len"] * self._row_bytes(spec):
+                print(f"[Append Store] {file} holds fewer than its {spec['len']} committed rows; ignoring {self.directory}.")
+                return False
+        self._arrays, self._generation = arrays, generation
+        self.meta = meta.get("user", {})
+        self._views, self._dirty = {}, set()
+        return True
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._arrays
+
+    def length(self, name: str) -> int:
+        spec = self._arrays.get(name)
+        return spec["len"] if spec else 0
+
+    def array(self, name: str) -> np.ndarray:
+        """Read-only memory map of every row of `name`, including rows appended since the last commit."""
+        if name not in self._views:
+            spec = self._arrays[name]
+            shape = (spec["len"],) + tuple(spec["shape"])
+            if spec["len"] == 0:
+                self._views[name] = np.zeros(shape, dtype=spec["dtype"])
+            else:
+                self._views[name] = np.memmap(self._file(name), dtype=spec["dtype"], mode="r", shape=shape)
+        return self._views[name]
+
+    def append(self, name: str, rows: np.ndarray, dtype=None):
+        """Writes `rows` after the array's current rows; they become durable at the next commit()."""
+        spec = self._arrays.get(name)
+        rows = np.ascontiguousarray(rows, dtype=dtype if spec is None else spec["dtype"])
+        if spec is None:
+            spec = self._arrays[name] = {"dtype": rows.dtype.str, "shape": list(rows.shape[1:]), "len": 0}
+        elif list(rows.shape[1:]) != spec["shape"]:
+            raise ValueError(f"Rows of shape {rows.shape[1:]} do not fit array '{name}' of shape {tuple(spec['shape'])}")
+        if not len(rows):
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._file(name)
+        offset = spec["len"] * self._row_bytes(spec)
+        with open(path, "r+b" if path.exists() else "wb") as f:
+            # anything past the committed rows is a tail left by a crashed writer
+            f.truncate(offset)
+            f.seek(offset)
+            f.write(rows.tobytes())
+        spec["len"] += len(rows)
+        self._views.pop(name, None)
+        self._dirty.add(name)
+
+    def commit(self, **meta):
+        """Makes appended rows and `meta` durable together."""
+        for name in self._dirty:
+            with open(self._file(name), "r+b") as f:
+                os.fsync(f.fileno())
+        self.meta.update(meta)
+        self._write_meta()
+        self._dirty.clear()
+
+    def rewrite(self, arrays: Dict[str, np.ndarray], **meta):
+        """
+        Replaces the whole store with `arrays` (e.g. only the live rows when compacting).
+        The new generation's files are written first, meta.json then switches to them.
+        """
+        generation = self._generation + 1
+        specs = {}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for name, arr in arrays.items():
+            arr = np.asarray(arr)
+            specs[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape[1:]), "len": len(arr)}
+            with open(self._file(name, generation), "wb") as f:
+                for start in range(0, len(arr), 65536):
+                    f.write(np.ascontiguousarray(arr[start:start + 65536]).tobytes())
+                os.fsync(f.fileno())
+        old = [self._file(name) for name in self._arrays]
+        self._arrays, self._generation = specs, generation
+        self._views, self._dirty = {}, set()
+        self.meta = dict(meta)
+        self._write_meta()
+        for path in old:
+            # open memory maps of the old generation stay valid after the unlink
+            if path.exists():
+                path.unlink()
+
+    def _write_meta(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".json.tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"generation": self._generation, "arrays": self._arrays, "user": self.meta}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.directory / META_NAME)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
@@ -0,0 +1,154 @@
+import os, hashlib
+import numpy as np
+from pathlib import Path
+from typing import Callable, List, Dict, Tuple
+from .append_store import AppendStore
+
+ARTICLE_CACHE_DIR = Path(os.environ.get("ARTICLE_CACHE_DIR", "embeddings/article_cache"))
+ARTICLE_CACHE_DTYPE = os.environ.get("ARTICLE_CACHE_DTYPE", "float16")
+# superseded (re-encoded) rows tolerated, as a fraction of the store, before it is compacted
+CACHE_COMPACT_FRACTION = float(os.environ.get("ARTICLE_CACHE_COMPACT_FRACTION", "0.25"))
+
+
+def content_hash(text: str) -> int:
+    """64-bit content hash used to detect edited articles."""
+    return int.from_bytes(hashlib.blake2b((text or "").encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class ArticleEmbeddingCache:
+    """
+    Persistent raw-article embedding store for the dedup agent, on an AppendStore
+    (ids, content hashes, vectors). New and re-encoded articles are appended, so an
+    upsert writes only its own rows; the latest row of an id wins and superseded rows
+    are dropped by an occasional compaction.
+    """
+    def __init__(self, model_name: str, cache_dir: Path = ARTICLE_CACHE_DIR, dtype: str = ARTICLE_CACHE_DTYPE):
+        self.model_name = model_name
+        self.cache_dir = Path(cache_dir)
+        self.dtype = np.dtype(dtype)
+        self.store = AppendStore(self.cache_dir)
+        self.vectors = None
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self._order = None
+        self._valid = False
+
+    def load(self) -> "ArticleEmbeddingCache":
+        if not self.store.load() or "ids" not in self.store:
+            self._migrate()
+            return self
+        meta = self.store.meta
+        if meta.get("model") != self.model_name or meta.get("dtype") != self.dtype.name:
+            print(f"[Embedding Cache] Model/dtype changed, ignoring cache at {self.cache_dir}")
+            return self
+        lengths = {self.store.length(name) for name in ("ids", "hashes", "vectors")}
+        if len(lengths) != 1 or meta.get("count") not in lengths:
+            print(f"[Embedding Cache] Arrays at {self.cache_dir} disagree on their length; discarding the cache.")
+            return self
+        self._valid = True
+        self._refresh()
+        return self
+
+    def _refresh(self):
+        self.ids = self.store.array("ids")
+        self.hashes = self.store.array("hashes")
+        self.vectors = self.store.array("vectors")
+        self._order = None
+
+    def _migrate(self):
+        """Moves a cache written as vectors/ids/hashes .npy files into the store, once."""
+        files = [self.cache_dir / f"{name}.npy" for name in ("vectors", "ids", "hashes")]
+        if not all(f.exists() for f in files):
+            return
+        try:
+            vectors, ids, hashes = (np.load(f, mmap_mode="r") for f in files)
+            if vectors.dtype == self.dtype and len(vectors) == len(ids) == len(hashes):
+                self._rewrite(ids, hashes, vectors)
+                print(f"[Embedding Cache] Migrated {len(ids)} cached vectors into the append-only store.")
+        except (OSError, ValueError) as e:
+            print(f"[Embedding Cache] Could not migrate the old cache at {self.cache_dir}: {e}")
+        for f in files:
+            if f.exists():
+                f.unlink()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lookup(self, ids: np.ndarray, hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (row positions, hit mask). A hit needs both the id and the content hash to match."""
+        pos, found = self._latest_rows(ids)
+        hit = found & (np.asarray(self.hashes)[pos] == hashes) if len(self.ids) else found
+        return pos, hit
+
+    def _latest_rows(self, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(row of each id's latest version, found mask)."""
+        if len(self.ids) == 0:
+            return np.zeros(len(ids), dtype=np.int64), np.zeros(len(ids), dtype=bool)
+        if self._order is None:
+            # stable, so the last of several rows for one id sorts last
+            self._order = np.argsort(self.ids, kind="stable")
+        sorted_ids = np.asarray(self.ids)[self._order]
+        at = np.searchsorted(sorted_ids, ids, side="right") - 1
+        found = (at >= 0) & (sorted_ids[np.maximum(at, 0)] == ids)
+        return self._order[np.maximum(at, 0)], found
+
+    def upsert(self, ids: np.ndarray, hashes: np.ndarray, vectors: np.ndarray):
+        """Appends new/changed rows; compacts once superseded rows outnumber CACHE_COMPACT_FRACTION of the store."""
+        if len(ids) == 0:
+            return
+        vectors = np.asarray(vectors, dtype=self.dtype)
+        if not self._valid:
+            self._rewrite(ids, hashes, vectors)
+            return
+        superseded = int(self.store.meta.get("superseded", 0)) + int(self._latest_rows(ids)[1].sum())
+        count = len(self.ids) + len(ids)
+        if superseded > CACHE_COMPACT_FRACTION * count:
+            all_ids = np.concatenate([np.asarray(self.ids), ids])
+            all_hashes = np.concatenate([np.asarray(self.hashes), hashes])
+            all_vecs = np.concatenate([np.asarray(self.vectors), vectors])
+            # keep the last row of every id
+            last = len(all_ids) - 1 - np.unique(all_ids[::-1], return_index=True)[1]
+            self._rewrite(all_ids[last], all_hashes[last], all_vecs[last])
+            print(f"[Embedding Cache] Compacted the cache to {len(last)} vectors.")
+            return
+        self.store.append("ids", ids, dtype=np.int64)
+        self.store.append("hashes", hashes, dtype=np.uint64)
+        self.store.append("vectors", vectors)
+        self.store.commit(count=count, superseded=superseded)
+        self._refresh()
+
+    def _rewrite(self, ids, hashes, vectors):
+        self.store.rewrite(
+            {"ids": np.asarray(ids, dtype=np.int64), "hashes": np.asarray(hashes, dtype=np.uint64),
+             "vectors": np.asarray(vectors, dtype=self.dtype)},
+            model=self.model_name, dtype=self.dtype.name, dim=int(vectors.shape[1]), count=int(len(ids)), superseded=0,
+        )
+        self._valid = True
+        self._refresh()
+
+    def get_or_encode(self, articles: List[Dict], texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Returns float32 embeddings for `articles` (aligned with `texts`),
+        calling `encode_fn` only for articles that are new or whose text changed.
+        """
+        if not articles:
+            return np.zeros((0, 0), dtype="float32")
+
+        ids = np.array([a["id"] for a in articles], dtype=np.int64)
+        hashes = np.array([content_hash(t) for t in texts], dtype=np.uint64)
+        pos, hit = self.lookup(ids, hashes)
+
+        miss = np.flatnonzero(~hit)
+        print(f"[Embedding Cache] {int(hit.sum())} cached, {len(miss)} to encode.")
+        new_vecs = None
+        if len(miss):
+            new_vecs = np.asarray(encode_fn([texts[i] for i in miss]), dtype="float32")
+
+        dim = new_vecs.shape[1] if new_vecs is not None else self.vectors.shape[1]
+        out = np.empty((len(ids), dim), dtype="float32")
+        if hit.any():
+            out[hit] = self.vectors[pos[hit]]
+        if new_vecs is not None:
+            out[miss] = new_vecs
+            self.upsert(ids[miss], hashes[miss], new_vecs)
+        return out
@@ -1,19 +1,96 @@
+import argparse
+from typing import Dict, List, Optional
 from .embedding_index import EmbeddingIndex
-from src.core.database import fetch_unique_stories
+from .ann_index import INDEX_TYPES
+from src.core.database import fetch_unique_stories, fetch_story_entity_values
+from src.utils.company_matcher import get_company_matcher
+from src.utils.impact_mapping import load_mapping_bundle
 
-if __name__ == "__main__":
-    # run on CLI using "python -m src.core.build_embeddings"
 
-    print("Fetching all unique stories from DB...")
+def with_entities(stories: List[Dict]) -> List[Dict]:
+    """
+    Attaches each story's extracted sectors and the symbols of the companies it mentions,
+    which the index keeps as packed metadata for filtered search.
+    """
+    try:
+        ents = fetch_story_entity_values([s["id"] for s in stories], ["sectors", "companies"])
+    except Exception as e:
+        print(f"[Embedding Index] Could not read story entities: {e}")
+        ents = {}
+    matcher = get_company_matcher(load_mapping_bundle()["company_to_symbol"])
+    out = []
+    for s in stories:
+        story_ents = ents.get(s["id"], {})
+        symbols = [matcher.resolve(c) for c in story_ents.get("companies", [])]
+        out.append({**s, "sectors": story_ents.get("sectors", []), "symbols": [sym for sym in symbols if sym]})
+    return out
+
+def update_embedding_index(stories: List[Dict], full_rebuild: bool = False, index_type: Optional[str] = None) -> EmbeddingIndex:
+    """
+    Brings the saved index up to date with `stories` (new or changed unique stories).
+    Builds it from every story in the DB instead when there is no index yet or on a full rebuild.
+    """
+    idx = EmbeddingIndex(index_type=index_type)
+    if not full_rebuild:
+        try:
+            idx.load()
+        except FileNotFoundError:
+            full_rebuild = True
+
+    if full_rebuild:
+        all_stories = fetch_unique_stories()
+        if not all_stories:
+            print("[Embedding Index] No stories found, nothing to index.")
+            return idx
+        idx.build_from_stories(with_entities(all_stories), text_key="combined_text", id_key="id", batch_size=64, save=True)
+        print(f"[Embedding Index] Built index over {len(idx)} stories.")
+        return idx
+
+    written = idx.update(with_entities(stories)) if stories else 0
+    if written:
+        idx.save()
+    print(f"[Embedding Index] Re-embedded {written} new or changed stories ({len(idx)} indexed).")
+    return idx
+
+def sync_with_db(idx: EmbeddingIndex) -> EmbeddingIndex:
+    """Adds stories missing from the index and drops ids no longer in the DB."""
     stories = fetch_unique_stories()
+    db_ids = {s["id"] for s in stories}
+    removed = idx.remove([sid for sid in idx.ids if sid not in db_ids])
+    added = idx.add(with_entities([s for s in stories if s["id"] not in idx]))
+    if added or removed:
+        idx.save()
+    print(f"[Embedding Index] Added {added}, removed {removed} stories ({len(idx)} indexed).")
+    return idx
+
+
+if __name__ == "__main__":
+    # run on CLI using "python -m src.core.build_embeddings [--incremental] [--index-type hnsw]"
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--incremental", action="store_true",
+                        help="only embed stories missing from the saved index")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=None,
+                        help="FAISS structure for a full build (default: EMBED_INDEX_TYPE or flat)")
+    args = parser.parse_args()
+
+    if args.incremental:
+        idx = EmbeddingIndex()
+        try:
+            idx.load()
+        except FileNotFoundError:
+            raise RuntimeError("No saved index to update; run without --incremental first.")
+        sync_with_db(idx)
+    else:
+        print("Fetching all unique stories from DB...")
+        stories = fetch_unique_stories()
 
-    print(f"Loaded {len(stories)} stories.")
-    if len(stories) == 0:
-        raise RuntimeError("No stories found! Cannot build embeddings.")
+        print(f"Loaded {len(stories)} stories.")
+        if len(stories) == 0:
+            raise RuntimeError("No stories found! Cannot build embeddings.")
 
-    print("Building embeddings...")
-    idx = EmbeddingIndex()
-    idx.build_from_stories(stories, text_key="combined_text", id_key="id", batch_size=64, save=True)
+        print("Building embeddings...")
+        idx = EmbeddingIndex(index_type=args.index_type)
+        idx.build_from_stories(with_entities(stories), text_key="combined_text", id_key="id", batch_size=64, save=True)
 
     print("Embedding index built successfully!")
     print("Files generated in ./embeddings/")
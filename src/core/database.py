@@ -1,5 +1,7 @@
-import psycopg2, os, json
-from psycopg2.extras import RealDictCursor
+import psycopg2, os, re, json, time, threading
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
 from contextlib import contextmanager
 from typing import Dict, List, Any, Optional
 from dotenv import load_dotenv
@@ -14,20 +16,204 @@ DB_CONFIG = {
     "port": os.getenv("DB_PORT"),
 }
 
+POOL_CONFIG = {
+    "minconn": int(os.getenv("DB_POOL_MIN", "1")),
+    "maxconn": int(os.getenv("DB_POOL_MAX", "10")),
+    # idle seconds after which a pooled connection is pinged before reuse
+    "ping_after": float(os.getenv("DB_POOL_PING_AFTER", "30")),
+}
 
-@contextmanager
-def get_db_connection():
-    conn = psycopg2.connect(
+
+def _connect():
+    return psycopg2.connect(
         dbname=DB_CONFIG["dbname"],
         user=DB_CONFIG["dbuser"],
         password=DB_CONFIG["password"],
         host=DB_CONFIG["host"],
         port=DB_CONFIG["port"],
     )
+
+
+class ConnectionPool:
+    """
+    Process-wide, thread-safe wrapper around psycopg2's ThreadedConnectionPool.
+    Connections are health-checked on checkout, and when the pool is exhausted a
+    temporary overflow connection is opened instead of failing the caller.
+    """
+    def __init__(self, minconn: int, maxconn: int, ping_after: float = 30.0):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.ping_after = ping_after
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self.stats = {
+            "checkouts": 0,
+            "in_use": 0,
+            "peak_in_use": 0,
+            "overflow": 0,
+            "overflow_in_use": 0,
+            "discarded": 0,
+        }
+
+    def _get_pool(self) -> ThreadedConnectionPool:
+        # rebuild after fork: libpq connections must not be shared across processes
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    self._pool = ThreadedConnectionPool(
+                        self.minconn, self.maxconn,
+                        dbname=DB_CONFIG["dbname"],
+                        user=DB_CONFIG["dbuser"],
+                        password=DB_CONFIG["password"],
+                        host=DB_CONFIG["host"],
+                        port=DB_CONFIG["port"],
+                    )
+                    self._pid = os.getpid()
+                    self._last_used = {}
+        return self._pool
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        last = self._last_used.get(id(conn))
+        if last is None or time.monotonic() - last < self.ping_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _bump(self, key: str, delta: int = 1):
+        with self._lock:
+            self.stats[key] += delta
+            if key == "in_use":
+                self.stats["peak_in_use"] = max(self.stats["peak_in_use"], self.stats["in_use"])
+
+    def getconn(self):
+        pool = self._get_pool()
+        # bounded retries: every unhealthy connection is discarded, so this terminates
+        for _ in range(self.maxconn + 1):
+            try:
+                conn = pool.getconn()
+            except PoolError:
+                self._bump("overflow")
+                self._bump("overflow_in_use")
+                self._bump("checkouts")
+                return _connect(), True
+            if self._is_healthy(conn):
+                self._bump("in_use")
+                self._bump("checkouts")
+                return conn, False
+            pool.putconn(conn, close=True)
+            self._last_used.pop(id(conn), None)
+            self._bump("discarded")
+        raise PoolError("could not obtain a healthy connection from the pool")
+
+    def putconn(self, conn, overflow: bool = False):
+        if overflow:
+            self._bump("overflow_in_use", -1)
+            conn.close()
+            return
+
+        self._bump("in_use", -1)
+        broken = bool(conn.closed)
+        if not broken and conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            # callers commit their own writes; anything left open is discarded
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+
+        pool = self._get_pool()
+        if broken:
+            self._last_used.pop(id(conn), None)
+            self._bump("discarded")
+        else:
+            self._last_used[id(conn)] = time.monotonic()
+        pool.putconn(conn, close=broken)
+
+    def closeall(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.closeall()
+            self._pool = None
+            self._last_used = {}
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.stats, "minconn": self.minconn, "maxconn": self.maxconn}
+
+
+_POOL = ConnectionPool(**POOL_CONFIG)
+
+def get_pool_stats() -> Dict[str, int]:
+    """Checkout, in-use, overflow and discard counters for the shared pool."""
+    return _POOL.get_stats()
+
+def close_pool():
+    _POOL.closeall()
+
+@contextmanager
+def get_db_connection():
+    conn, overflow = _POOL.getconn()
     try:
         yield conn
     finally:
-        conn.close()
+        _POOL.putconn(conn, overflow=overflow)
+
+
+# ==========================================
+# Pipeline Watermarks
+# ==========================================
+
+def create_watermarks_table():
+    """Creates the table holding the last processed id of each pipeline stage."""
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pipeline_watermarks (
+                stage TEXT PRIMARY KEY,
+                last_id INT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+        conn.commit()
+        cur.close()
+
+def get_watermark(stage: str) -> int:
+    """Returns the last processed id for a stage, 0 if the stage never ran."""
+    create_watermarks_table()
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT last_id FROM pipeline_watermarks WHERE stage = %s;", (stage,))
+        row = cur.fetchone()
+        cur.close()
+    return row[0] if row else 0
+
+def set_watermark(stage: str, last_id: int):
+    """Persists the last processed id for a stage."""
+    create_watermarks_table()
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO pipeline_watermarks (stage, last_id, updated_at)
+            VALUES (%s, %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (stage) DO UPDATE
+                SET last_id = EXCLUDED.last_id, updated_at = EXCLUDED.updated_at;
+            """,
+            (stage, last_id)
+        )
+        conn.commit()
+        cur.close()
 
 
 # ==========================================
@@ -76,19 +262,67 @@ def insert_raw_articles(article: Dict):
         conn.commit()
         cur.close()
 
+def insert_raw_articles_bulk(articles: List[Dict], batch_size: int = 500) -> Dict[str, int]:
+    """
+    Inserts articles in multi-row batches, one transaction per batch.
+    Articles whose url already exists are skipped instead of aborting the batch.
+    Returns {"inserted": int, "skipped": int}.
+    """
+    if not articles:
+        return {"inserted": 0, "skipped": 0}
+
+    create_table()
+    inserted = 0
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        for i in range(0, len(articles), batch_size):
+            batch = articles[i:i+batch_size]
+            rows = execute_values(
+                cur,
+                """
+                INSERT INTO raw_news (source, url, title, content, published_at)
+                VALUES %s
+                ON CONFLICT (url) DO NOTHING
+                RETURNING id
+                """,
+                [(a["source"], a["url"], a["title"], a["content"], a["published_at"]) for a in batch],
+                page_size=batch_size,
+                fetch=True,
+            )
+            conn.commit()
+            inserted += len(rows)
+        cur.close()
+
+    return {"inserted": inserted, "skipped": len(articles) - inserted}
+
 
 # ==========================================
 # DeDuplication Agent Utilities
 # ==========================================
 
-def fetch_raw_articles():
-    """Fetches raw articles from the raw_news table for deduplication"""
+def fetch_raw_articles(after_id: int = 0):
+    """Fetches raw articles with id > after_id from the raw_news table for deduplication"""
     with get_db_connection() as conn:
         cur = conn.cursor(cursor_factory=RealDictCursor)
         cur.execute(
             """
-            SELECT id, title, content from raw_news ORDER BY id;
-            """
+            SELECT id, title, content, published_at, story_id from raw_news WHERE id > %s ORDER BY id;
+            """,
+            (after_id,)
+        )
+        rows = cur.fetchall()
+        cur.close()
+    return rows
+
+def fetch_raw_articles_by_ids(ids: List[int]):
+    """Fetches the given raw articles (e.g. the members of a story), in id order"""
+    if not ids:
+        return []
+    with get_db_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(
+            "SELECT id, title, content, published_at, story_id FROM raw_news WHERE id = ANY(%s) ORDER BY id;",
+            (list(ids),)
         )
         rows = cur.fetchall()
         cur.close()
@@ -96,6 +330,7 @@ def fetch_raw_articles():
 
 def create_unique_stories_table():
     """Creates a new table to store dedupicated news stories"""
+    create_table()
     with get_db_connection() as conn:
         cur = conn.cursor()
 
@@ -109,8 +344,27 @@ def create_unique_stories_table():
                 num_articles INT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 );
+            CREATE INDEX IF NOT EXISTS idx_unique_news_created_at ON unique_news (created_at DESC);
             """
         )
+        cur.execute("SELECT to_regclass('unique_news_seq') IS NOT NULL;")
+        if not cur.fetchone()[0]:
+            # story_seq is bumped whenever a story is written, so stories that dedup extends in
+            # place move past the NER watermark. Existing rows take their id, which keeps a saved
+            # watermark valid.
+            cur.execute(
+                """
+                CREATE SEQUENCE unique_news_seq;
+                ALTER TABLE unique_news ADD COLUMN IF NOT EXISTS story_seq BIGINT;
+                UPDATE unique_news SET story_seq = id WHERE story_seq IS NULL;
+                SELECT setval('unique_news_seq', GREATEST((SELECT MAX(story_seq) FROM unique_news), 1));
+                ALTER TABLE unique_news ALTER COLUMN story_seq SET DEFAULT nextval('unique_news_seq');
+                CREATE INDEX IF NOT EXISTS idx_unique_news_story_seq ON unique_news (story_seq);
+                """
+            )
+        # story each raw article was placed in, written in the same transaction as the story, so a
+        # rerun after a crash finds its articles already placed instead of clustering them again
+        cur.execute("ALTER TABLE raw_news ADD COLUMN IF NOT EXISTS story_id INT;")
 
         conn.commit()
         cur.close()
@@ -130,6 +384,7 @@ def insert_unique_stories(story: Dict):
             """
             INSERT INTO unique_news (article_ids, article_title, combined_text, num_articles)
             VALUES (%s, %s, %s, %s)
+            RETURNING id
             """, 
             (
                 str(story["article_ids"]),
@@ -138,29 +393,244 @@ def insert_unique_stories(story: Dict):
                 story["num_articles"],
             ),
         )
+        story_id = cur.fetchone()[0]
+        cur.execute("UPDATE raw_news SET story_id = %s WHERE id = ANY(%s);", (story_id, list(story["article_ids"])))
         
         conn.commit()
         cur.close()
+    return story_id
+
+def update_unique_story(story: Dict):
+    """
+    Rewrites the article list and text of an existing story in place.
+    story = {'id': int, 'article_ids': [...], 'combined_text': str, 'num_articles': int}
+    """
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            UPDATE unique_news
+            SET article_ids = %s, combined_text = %s, num_articles = %s,
+                story_seq = nextval('unique_news_seq')
+            WHERE id = %s
+            """,
+            (
+                str(story["article_ids"]),
+                story["combined_text"],
+                story["num_articles"],
+                story["id"],
+            ),
+        )
+        cur.execute("UPDATE raw_news SET story_id = %s WHERE id = ANY(%s);", (story["id"], list(story["article_ids"])))
+        conn.commit()
+        cur.close()
+
+
+# tables keyed by unique_news.id, emptied when the stories are rebuilt from scratch
+_STORY_TABLES = ("unique_news", "news_entities", "story_entities", "story_impacts")
+# stages whose watermarks point into those tables
+_STORY_STAGES = ("ner", "impact")
+
+def replace_unique_stories(stories: List[Dict], batch_size: int = 500) -> List[int]:
+    """
+    Full rebuild: replaces every story in one transaction. Empties unique_news and the
+    tables keyed by its ids, restarts the id and story_seq sequences and the NER / impact
+    watermarks, inserts `stories` and records each article's story. Returns the new ids
+    in the order of `stories`; on any error the old stories stay as they were.
+    """
+    create_unique_stories_table()
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "SELECT t FROM unnest(%s::text[]) AS t WHERE to_regclass(t) IS NOT NULL;",
+                (list(_STORY_TABLES),)
+            )
+            tables = [r[0] for r in cur.fetchall()]
+            cur.execute(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY;")
+            cur.execute("ALTER SEQUENCE unique_news_seq RESTART WITH 1;")
+            cur.execute("SELECT to_regclass('news_entities_seq') IS NOT NULL;")
+            if cur.fetchone()[0]:
+                cur.execute("ALTER SEQUENCE news_entities_seq RESTART WITH 1;")
+            cur.execute("UPDATE raw_news SET story_id = NULL WHERE story_id IS NOT NULL;")
+            cur.execute("SELECT to_regclass('pipeline_watermarks') IS NOT NULL;")
+            if cur.fetchone()[0]:
+                cur.execute("DELETE FROM pipeline_watermarks WHERE stage = ANY(%s);", (list(_STORY_STAGES),))
+
+            ids = []
+            for i in range(0, len(stories), batch_size):
+                batch = stories[i:i+batch_size]
+                rows = execute_values(
+                    cur,
+                    """
+                    INSERT INTO unique_news (article_ids, article_title, combined_text, num_articles)
+                    VALUES %s
+                    RETURNING id
+                    """,
+                    [(str(st["article_ids"]), st["article_title"], st["combined_text"], st["num_articles"]) for st in batch],
+                    page_size=batch_size,
+                    fetch=True,
+                )
+                batch_ids = [r[0] for r in rows]
+                execute_values(
+                    cur,
+                    "UPDATE raw_news SET story_id = v.story_id FROM (VALUES %s) AS v(article_id, story_id) WHERE raw_news.id = v.article_id",
+                    [(aid, sid) for st, sid in zip(batch, batch_ids) for aid in st["article_ids"]],
+                    page_size=5000,
+                )
+                ids.extend(batch_ids)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    return ids
+
+def max_story_seq() -> int:
+    """story_seq of the most recently written story, 0 when there is none"""
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COALESCE(MAX(story_seq), 0) FROM unique_news;")
+        seq = cur.fetchone()[0]
+        cur.close()
+    return int(seq)
 
 
 # ==========================================
 # NER Agent Utilities
 # ==========================================
 
-def fetch_unique_stories(limit: int = None):
-    """Fetch deduplicated stories from unique_news"""
+def fetch_unique_stories(limit: int = None, after_id: int = 0, after_seq: Optional[int] = None):
+    """
+    Fetch deduplicated stories with id > after_id from unique_news, or with after_seq,
+    the stories written (inserted or extended in place) since that story_seq
+    """
     with get_db_connection() as conn:
         cur = conn.cursor(cursor_factory=RealDictCursor)
-        sql = "SELECT id, article_ids, article_title, combined_text, num_articles FROM unique_news ORDER BY id;"
+        column, after = ("story_seq", after_seq) if after_seq is not None else ("id", after_id)
+        sql = f"SELECT id, article_ids, article_title, combined_text, num_articles, created_at, story_seq FROM unique_news WHERE {column} > %s ORDER BY {column}"
         if limit:
-            sql += f" LIMIT {limit}"
-        cur.execute(sql)
+            sql += f" LIMIT {int(limit)}"
+        cur.execute(sql, (after,))
         rows = cur.fetchall()
         cur.close()
     return rows
 
+ENTITY_TYPES = (
+    "companies", "sectors", "people", "indices", "regulators",
+    "policies", "products", "locations", "kpis", "financial_terms"
+)
+_KEY_PUNCT_RE = re.compile(r"[^\w&\s]")
+_COMPANY_SUFFIXES = ("limited", "ltd", "pvt", "private", "inc", "plc")
+
+def entity_key(entity_type: str, value: str) -> str:
+    """
+    Normalized lookup key for story_entities: lower-cased, punctuation and extra
+    whitespace removed, and legal suffixes ("Ltd", "Limited", ...) dropped from
+    company names so "HDFC Bank Limited" and "HDFC Bank" share a key.
+    """
+    key = " ".join(_KEY_PUNCT_RE.sub(" ", (value or "").lower()).split())
+    if entity_type == "companies":
+        tokens = key.split()
+        while len(tokens) > 1 and tokens[-1] in _COMPANY_SUFFIXES:
+            tokens.pop()
+        key = " ".join(tokens)
+    return key
+
+def _story_entity_rows(entity_row: dict) -> List[tuple]:
+    """(story_id, entity_type, entity_key, entity_value) rows for one story, one per distinct key."""
+    story_id = entity_row.get("story_id")
+    rows = {}
+    for etype in ENTITY_TYPES:
+        for value in entity_row.get(etype) or []:
+            if not isinstance(value, str):
+                continue
+            key = entity_key(etype, value)
+            if key and (etype, key) not in rows:
+                rows[(etype, key)] = (story_id, etype, key, value.strip())
+    return list(rows.values())
+
+def create_story_entities_table():
+    """
+    Creates the normalized story_entities table: one row per (story, entity type, entity key).
+    The primary key serves per-story reads; the (entity_type, entity_key) index turns
+    sector / company lookups into index seeks. Backfills from news_entities on creation.
+    """
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT to_regclass('story_entities') IS NOT NULL;")
+        existed = cur.fetchone()[0]
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS story_entities (
+                story_id INT NOT NULL,
+                entity_type TEXT NOT NULL,
+                entity_key TEXT NOT NULL,
+                entity_value TEXT,
+                PRIMARY KEY (story_id, entity_type, entity_key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_story_entities_type_key
+                ON story_entities (entity_type, entity_key, story_id);
+            """
+        )
+        conn.commit()
+        cur.close()
+    if not existed:
+        backfill_story_entities()
+
+def backfill_story_entities(batch_size: int = 1000) -> int:
+    """Fills story_entities from the JSON columns of existing news_entities rows."""
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT to_regclass('news_entities') IS NOT NULL;")
+        if not cur.fetchone()[0]:
+            cur.close()
+            return 0
+
+        # server-side cursor, so the JSON columns are streamed rather than loaded at once
+        read_cur = conn.cursor(name="story_entities_backfill", cursor_factory=RealDictCursor)
+        read_cur.itersize = batch_size
+        read_cur.execute(f"SELECT story_id, {', '.join(ENTITY_TYPES)} FROM news_entities ORDER BY id;")
+
+        def parse_json(x):
+            try:
+                return json.loads(x) if x else []
+            except (TypeError, ValueError):
+                return []
+
+        written = 0
+        batch = []
+        for r in read_cur:
+            batch.extend(_story_entity_rows({"story_id": r["story_id"], **{k: parse_json(r[k]) for k in ENTITY_TYPES}}))
+            if len(batch) >= batch_size:
+                written += _write_story_entity_rows(cur, batch)
+                batch = []
+        written += _write_story_entity_rows(cur, batch)
+        read_cur.close()
+        conn.commit()
+        cur.close()
+    print(f"[DB] Backfilled {written} story_entities rows from news_entities.")
+    return written
+
+def _write_story_entity_rows(cur, rows: List[tuple]) -> int:
+    if not rows:
+        return 0
+    execute_values(
+        cur,
+        """
+        INSERT INTO story_entities (story_id, entity_type, entity_key, entity_value)
+        VALUES %s
+        ON CONFLICT DO NOTHING
+        """,
+        rows,
+        page_size=len(rows)
+    )
+    return cur.rowcount
+
 def create_news_entities_table():
-    """Creates table to store extracted entities."""
+    """Creates table to store extracted entities, plus the normalized story_entities table."""
+    create_story_entities_table()
     with get_db_connection() as conn:
         cur = conn.cursor()
         cur.execute(
@@ -184,10 +654,94 @@ def create_news_entities_table():
             );
             """
         )
+        cur.execute("SELECT to_regclass('news_entities_seq') IS NOT NULL;")
+        if not cur.fetchone()[0]:
+            # entity_seq is bumped on every write, so re-extracted stories move past the impact
+            # watermark. Existing rows take their id, which keeps a saved watermark valid.
+            cur.execute(
+                """
+                CREATE SEQUENCE news_entities_seq;
+                ALTER TABLE news_entities ADD COLUMN IF NOT EXISTS entity_seq BIGINT;
+                UPDATE news_entities SET entity_seq = id WHERE entity_seq IS NULL;
+                SELECT setval('news_entities_seq', GREATEST((SELECT MAX(entity_seq) FROM news_entities), 1));
+                ALTER TABLE news_entities ALTER COLUMN entity_seq SET DEFAULT nextval('news_entities_seq');
+                CREATE INDEX IF NOT EXISTS idx_news_entities_entity_seq ON news_entities (entity_seq);
+                """
+            )
+        cur.execute("SELECT to_regclass('uq_news_entities_story_id') IS NOT NULL;")
+        if not cur.fetchone()[0]:
+            # story_impacts rows from before this migration point at news_entities ids; re-key
+            # them while every such id still exists, before duplicate rows are deleted below
+            cur.execute("SELECT to_regclass('story_impacts') IS NOT NULL;")
+            if cur.fetchone()[0]:
+                _migrate_story_impacts(cur, rekey=True)
+            # one-time migration to one row per story: keep the newest row of earlier reruns
+            cur.execute(
+                """
+                DELETE FROM news_entities a
+                USING news_entities b
+                WHERE a.story_id = b.story_id AND a.id < b.id;
+                CREATE UNIQUE INDEX IF NOT EXISTS uq_news_entities_story_id ON news_entities (story_id);
+                """
+            )
 
         conn.commit()
         cur.close()
 
+_ENTITY_COLUMNS = ("story_id", "article_ids", "article_title") + ENTITY_TYPES
+
+def _entity_values(entity_row: dict) -> tuple:
+    return (
+        entity_row.get("story_id"),
+        json.dumps(entity_row.get("article_ids")),
+        entity_row.get("article_title"),
+        *(json.dumps(entity_row.get(k, [])) for k in ENTITY_TYPES),
+    )
+
+def insert_entities_bulk(entity_rows: List[dict], batch_size: int = 500) -> Dict[str, Any]:
+    """
+    Upserts entity rows (keyed on story_id) in multi-row batches, one transaction per
+    batch, together with their normalized story_entities rows. Re-running a story
+    replaces its previous entities. A batch that fails is rolled back and reported.
+    Returns {"saved": int, "failed_ids": [story_id, ...]}.
+    """
+    saved, failed_ids = 0, []
+    if not entity_rows:
+        return {"saved": saved, "failed_ids": failed_ids}
+
+    columns = ", ".join(_ENTITY_COLUMNS)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in _ENTITY_COLUMNS[1:])
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        for i in range(0, len(entity_rows), batch_size):
+            # the last row of a story wins, as it would with one insert per row
+            batch = list({r.get("story_id"): r for r in entity_rows[i:i+batch_size]}.values())
+            story_ids = [r.get("story_id") for r in batch]
+            try:
+                execute_values(
+                    cur,
+                    f"""
+                    INSERT INTO news_entities ({columns})
+                    VALUES %s
+                    ON CONFLICT (story_id) DO UPDATE
+                        SET {updates}, created_at = CURRENT_TIMESTAMP,
+                            entity_seq = nextval('news_entities_seq')
+                    """,
+                    [_entity_values(r) for r in batch],
+                    page_size=batch_size,
+                )
+                cur.execute("DELETE FROM story_entities WHERE story_id = ANY(%s);", (story_ids,))
+                _write_story_entity_rows(cur, [row for r in batch for row in _story_entity_rows(r)])
+                conn.commit()
+                saved += len(batch)
+            except psycopg2.Error as e:
+                conn.rollback()
+                failed_ids.extend(story_ids)
+                print(f"[DB] Failed to save entities for {len(batch)} stories: {e}")
+        cur.close()
+
+    return {"saved": saved, "failed_ids": failed_ids}
+
 def insert_entities(entity_row: dict):
     """
     entity_row:
@@ -200,38 +754,41 @@ def insert_entities(entity_row: dict):
       ...
     }
     """
-    with get_db_connection() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO news_entities 
-            (story_id, article_ids, article_title, companies, sectors, people, indices, regulators, policies, products, locations, kpis, financial_terms)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                entity_row.get("story_id"),
-                json.dumps(entity_row.get("article_ids")),
-                entity_row.get("article_title"),
-                json.dumps(entity_row.get("companies", [])),
-                json.dumps(entity_row.get("sectors", [])),
-                json.dumps(entity_row.get("people", [])),
-                json.dumps(entity_row.get("indices", [])),
-                json.dumps(entity_row.get("regulators", [])),
-                json.dumps(entity_row.get("policies", [])),
-                json.dumps(entity_row.get("products", [])),
-                json.dumps(entity_row.get("locations", [])),
-                json.dumps(entity_row.get("kpis", [])),
-                json.dumps(entity_row.get("financial_terms", [])),
-            )
-        )
-        conn.commit()
-        cur.close()
+    result = insert_entities_bulk([entity_row])
+    if result["failed_ids"]:
+        raise RuntimeError(f"Failed to save entities for story {entity_row.get('story_id')}")
 
 # ==========================================
 # Impact Mapping Agent Utilities
 # ==========================================
 
+def _migrate_story_impacts(cur, rekey: bool):
+    """
+    One-time move of story_impacts to one row per unique_news story. Rows used to be keyed on
+    news_entities.id: with `rekey` they are mapped through news_entities.story_id, and rows
+    that cannot be mapped are dropped rather than read as story ids. Runs in the caller's transaction.
+    """
+    if rekey:
+        cur.execute("""
+            WITH moved AS (
+                UPDATE story_impacts si
+                SET story_id = ne.story_id
+                FROM news_entities ne
+                WHERE si.story_id = ne.id AND ne.story_id IS NOT NULL
+                RETURNING si.id
+            )
+            DELETE FROM story_impacts
+            WHERE id NOT IN (SELECT id FROM moved);
+        """)
+    cur.execute("""
+        DELETE FROM story_impacts a
+        USING story_impacts b
+        WHERE a.story_id = b.story_id AND a.id < b.id;
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_story_impacts_story_id ON story_impacts (story_id);
+    """)
+
 def create_story_impacts_table():
-    """Create the story_impacts table if not exists."""
+    """Create the story_impacts table (one row per story) if not exists."""
     with get_db_connection() as conn:
         cur = conn.cursor()
         cur.execute("""
@@ -243,28 +800,64 @@ def create_story_impacts_table():
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
         """)
+        cur.execute("SELECT to_regclass('uq_story_impacts_story_id') IS NOT NULL, to_regclass('uq_news_entities_story_id') IS NOT NULL;")
+        migrated, entities_migrated = cur.fetchone()
+        if not migrated:
+            # news_entities is normally migrated first and re-keys these rows itself; only
+            # re-key here while its rows are still intact
+            cur.execute("SELECT to_regclass('news_entities') IS NOT NULL;")
+            _migrate_story_impacts(cur, rekey=cur.fetchone()[0] and not entities_migrated)
         conn.commit()
+        cur.close()
 
-import json
-
-def insert_story_impacts(story_id: int, impacts: list, summary: str = None):
+def insert_story_impacts_bulk(items: List[Dict], batch_size: int = 500) -> Dict[str, Any]:
     """
-    Insert computed impact mapping results into story_impacts table.
+    Upserts impact results keyed on story_id in multi-row batches, one transaction per batch.
+    items = [{'story_id': int, 'impacted_assets': list, 'summary': str}, ...]
+    Returns {"saved": int, "failed_ids": [story_id, ...]}.
     """
+    saved, failed_ids = 0, []
     with get_db_connection() as conn:
         cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO story_impacts (story_id, impacted_assets, summary)
-            VALUES (%s, %s, %s);
-            """,
-            (story_id, json.dumps(impacts), summary)
-        )
-        conn.commit()
+        for i in range(0, len(items), batch_size):
+            batch = list({it["story_id"]: it for it in items[i:i+batch_size]}.values())
+            try:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO story_impacts (story_id, impacted_assets, summary)
+                    VALUES %s
+                    ON CONFLICT (story_id) DO UPDATE
+                        SET impacted_assets = EXCLUDED.impacted_assets,
+                            summary = EXCLUDED.summary,
+                            created_at = CURRENT_TIMESTAMP
+                    """,
+                    [(it["story_id"], json.dumps(it.get("impacted_assets", [])), it.get("summary")) for it in batch],
+                    page_size=batch_size,
+                )
+                conn.commit()
+                saved += len(batch)
+            except psycopg2.Error as e:
+                conn.rollback()
+                failed_ids.extend(it["story_id"] for it in batch)
+                print(f"[DB] Failed to save impacts for {len(batch)} stories: {e}")
+        cur.close()
+
+    return {"saved": saved, "failed_ids": failed_ids}
 
-def fetch_unprocessed_entities():
+def insert_story_impacts(story_id: int, impacts: list, summary: str = None):
     """
-    Fetch stories from news_entities that do NOT exist in story_impacts.
+    Insert (or replace) the computed impact mapping result of one story.
+    """
+    result = insert_story_impacts_bulk([{"story_id": story_id, "impacted_assets": impacts, "summary": summary}])
+    if result["failed_ids"]:
+        raise RuntimeError(f"Failed to save impacts for story {story_id}")
+
+def fetch_unprocessed_entities(after_seq: int = 0, include_processed: bool = False):
+    """
+    Fetch stories from news_entities written after `after_seq` (their entity_seq) whose
+    impacts are missing or older than their entities (all of them with include_processed,
+    for a full rebuild; the writer upserts).
     Convert DB rows into clean dictionaries for the agent.
     """
     with get_db_connection() as conn:
@@ -273,9 +866,10 @@ def fetch_unprocessed_entities():
             SELECT ne.*
             FROM news_entities ne
             LEFT JOIN story_impacts si
-                ON ne.id = si.story_id
-            WHERE si.story_id IS NULL;
-        """)
+                ON ne.story_id = si.story_id
+            WHERE (si.story_id IS NULL OR si.created_at < ne.created_at OR %s) AND ne.entity_seq > %s
+            ORDER BY ne.entity_seq;
+        """, (include_processed, after_seq))
         rows = cur.fetchall()
 
     # Normalize output for agent
@@ -292,7 +886,8 @@ def fetch_unprocessed_entities():
                     return []
 
             output.append({
-                "story_id": r["id"],   # THIS is the link
+                "story_id": r["story_id"],
+                "entity_seq": r["entity_seq"],   # last write to this row, for the watermark
                 "entities": {
                     "companies": parse_json(r["companies"]),
                     "sectors": parse_json(r["sectors"]),
@@ -358,8 +953,35 @@ def fetch_stories_by_ids(ids: List[int]) -> List[Dict[str, Any]]:
         ordered = [id_to_row.get(i) for i in ids if id_to_row.get(i) is not None]
         return ordered
 
-def fetch_stories_by_sector(sector_name: str, limit: Optional[int] = 100) -> List[Dict[str, Any]]:
-    sector_norm = sector_name.lower().strip()
+def fetch_story_entity_values(story_ids: List[int], entity_types: List[str]) -> Dict[int, Dict[str, List[str]]]:
+    """{story_id: {entity_type: [entity_key, ...]}} for the given stories, read from story_entities."""
+    out: Dict[int, Dict[str, List[str]]] = {}
+    if not story_ids:
+        return out
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT story_id, entity_type, entity_key
+            FROM story_entities
+            WHERE story_id = ANY(%s) AND entity_type = ANY(%s)
+            """,
+            (list(story_ids), list(entity_types))
+        )
+        for sid, etype, key in cur.fetchall():
+            out.setdefault(sid, {}).setdefault(etype, []).append(key)
+        cur.close()
+    return out
+
+def fetch_stories_by_entities(entity_type: str, values: List[str], limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+    """
+    Newest stories tagged with any of `values` (of one entity type), via the
+    (entity_type, entity_key) index on story_entities. Values are matched on their
+    normalized key, so there are no substring false positives.
+    """
+    keys = list(dict.fromkeys(k for k in (entity_key(entity_type, v) for v in values or []) if k))
+    if not keys:
+        return []
 
     with get_db_connection() as conn:
         cur = conn.cursor(cursor_factory=RealDictCursor)
@@ -367,36 +989,33 @@ def fetch_stories_by_sector(sector_name: str, limit: Optional[int] = 100) -> Lis
         sql = """
             SELECT un.*
             FROM unique_news un
-            JOIN news_entities ne ON ne.story_id = un.id
-            WHERE LOWER(ne.sectors::text) LIKE %s
+            WHERE un.id IN (
+                SELECT se.story_id
+                FROM story_entities se
+                WHERE se.entity_type = %s AND se.entity_key = ANY(%s)
+            )
             ORDER BY un.created_at DESC
             LIMIT %s
         """
 
-        cur.execute(sql, (f"%{sector_norm}%", limit))
+        cur.execute(sql, (entity_type, keys, limit))
         rows = cur.fetchall()
         cur.close()
         return rows
 
+def fetch_stories_by_sector(sector_name: str, limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+    return fetch_stories_by_entities("sectors", [sector_name], limit=limit)
+
 def fetch_all_unique_comp_stories(limit: Optional[int] = None, company_like: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-    Return all unique stories used for embedding indexing.
+    Return the unique stories mentioning `company_like` (all stories when it is None).
     """
-    company_norm = company_like.lower().strip()
+    if company_like is not None:
+        return fetch_stories_by_entities("companies", [company_like], limit=limit)
 
     with get_db_connection() as conn:
         cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        sql = """
-            SELECT un.*
-            FROM unique_news un
-            JOIN news_entities ne ON ne.story_id = un.id
-            WHERE LOWER(ne.companies::text) LIKE %s
-            ORDER BY un.created_at DESC
-            LIMIT %s
-        """
-
-        cur.execute(sql, (f"%{company_norm}%", limit))
+        cur.execute("SELECT * FROM unique_news ORDER BY created_at DESC LIMIT %s", (limit,))
         rows = cur.fetchall()
         cur.close()
-        return rows
\ No newline at end of file
+        return rows
@@ -1,9 +1,17 @@
 import os
 import json
+import time
 import numpy as np
+from datetime import datetime
 from pathlib import Path
-from sentence_transformers import SentenceTransformer, util
+from typing import Dict, Iterable, List, Optional, Union
 from tqdm import tqdm
+from src.utils.model_loader import get_sentence_transformer
+from src.utils.clustering import parse_published_at
+from src.utils.impact_mapping import canonical_sector
+from .ann_index import resolve_params, build_index, min_train_size, search_params, index_kind
+from .append_store import AppendStore
+from .matrix_search import MatrixSearcher, compress
 
 try:
     import faiss
@@ -15,93 +23,586 @@ except Exception:
 MODEL_NAME = os.environ.get("EMBED_MODEL", "all-MiniLM-L6-v2")
 EMBED_DIR = Path("embeddings")
 EMBED_DIR.mkdir(parents=True, exist_ok=True)
+# vectors and row-aligned story metadata, append-only (see append_store), plus faiss.<version>.index
+STORE_DIR = EMBED_DIR / "store"
+STORE_FORMAT = 2
+# reduced-precision copy of the vectors searched when FAISS is not installed (+ row scales for int8)
+COMPACT_DTYPE = os.environ.get("EMBED_COMPACT_DTYPE", "float16").lower()
+# tombstoned rows tolerated, as a fraction of all rows, before save() compacts the store
+COMPACT_FRACTION = float(os.environ.get("EMBED_COMPACT_FRACTION", "0.2"))
+# layout written by earlier versions; migrated into STORE_DIR on first load
 EMBED_FILE = EMBED_DIR / "story_embeddings.npy"
-META_FILE = EMBED_DIR / "story_metadata.json"
+COMPACT_FILE = EMBED_DIR / "story_embeddings_compact.npy"
+SCALES_FILE = EMBED_DIR / "story_embeddings_scales.npy"
 INDEX_FILE = EMBED_DIR / "faiss.index"
+IDS_FILE = EMBED_DIR / "story_ids.npy"
+TIMES_FILE = EMBED_DIR / "story_times.npy"
+SECTORS_FILE = EMBED_DIR / "story_sectors.npy"
+SYMBOLS_FILE = EMBED_DIR / "story_symbols.npy"
+SYMBOL_PTR_FILE = EMBED_DIR / "story_symbols_ptr.npy"
+HEADER_FILE = EMBED_DIR / "index_header.json"
+META_FILE = EMBED_DIR / "story_metadata.json"
+LEGACY_FILES = (EMBED_FILE, COMPACT_FILE, SCALES_FILE, INDEX_FILE, IDS_FILE, TIMES_FILE, SECTORS_FILE,
+                SYMBOLS_FILE, SYMBOL_PTR_FILE, HEADER_FILE)
+
+NO_TIME = -1
+MAX_SECTORS = 64  # sector codes are bits of a uint64
+# filtered queries with at most this many matching stories (or, on an approximate index, under this
+# fraction of the corpus) are scored exactly over the subset instead of searched with an id selector
+FILTER_EXACT_MAX = int(os.environ.get("EMBED_FILTER_EXACT_MAX", "50000"))
+FILTER_MIN_FRACTION = float(os.environ.get("EMBED_FILTER_MIN_FRACTION", "0.05"))
+
+
+def _story_time(story: Dict) -> int:
+    """Epoch seconds of a story: published_at, else created_at, else now (it was just created)."""
+    for key in ("published_at", "created_at"):
+        ts = parse_published_at(story.get(key))
+        if not np.isnan(ts):
+            return int(ts)
+    return int(time.time())
+
+def _epoch(value: Union[datetime, int, float, str]) -> int:
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return int(value)
+    ts = parse_published_at(value)
+    if np.isnan(ts):
+        raise ValueError(f"Unparseable time filter: {value!r}")
+    return int(ts)
+
+def _csr_ptr(counts) -> np.ndarray:
+    return np.concatenate([[0], np.cumsum(counts, dtype=np.int64)]).astype(np.int64)
+
+def _normalize_symbol(symbol: str) -> str:
+    return (symbol or "").strip().upper()
+
 
 class EmbeddingIndex:
-    def __init__(self, model_name: str = MODEL_NAME):
-        self.model = SentenceTransformer(model_name)
+    """
+    Story embedding index. Rows of the vector matrix line up with `ids`, `times`,
+    `sector_bits` and the story -> symbol CSR arrays, which also back filtered queries
+    (time window, sectors, symbols). All of them live in an append-only store: adding
+    stories appends rows, and removing or re-embedding a story tombstones its old row, so
+    save() writes only the appended tail, the tombstones and the FAISS index. Once
+    tombstones pass EMBED_COMPACT_FRACTION of the rows, save() compacts the store and
+    rebuilds the index. Arrays are memory-mapped, so opening the index costs the same at
+    any size and processes share the pages.
+
+    FAISS labels are row numbers. The structure (flat, ivf, hnsw or ivfpq) is chosen at
+    build time, see ann_index; its parameters are kept in the store's metadata, and
+    tombstoned rows are skipped with an id selector until the next compaction.
+    """
+    def __init__(self, model_name: str = MODEL_NAME, index_type: Optional[str] = None):
+        self.model_name = model_name
+        self.params = resolve_params(index_type)
+        self.store = AppendStore(STORE_DIR)
         self.index = None
-        self.ids = []  
-        self.vectors = None
+        self.sector_vocab: List[str] = []
+        self.symbol_vocab: List[str] = []
+        self._symbol_ids: Optional[Dict[str, int]] = None
+        self._pos: Optional[Dict[int, int]] = None
+        self._live: Optional[np.ndarray] = None
+        self._matrix: Optional[MatrixSearcher] = None
+        self._compact_ok = True
 
-    def build_from_stories(self, stories: list, text_key="combined_text", id_key="id", batch_size=64, save=True):
-        """
-        stories: list of dicts {id, combined_text, article_title, published_at, ...}
-        will compute embeddings and build index
-        """
-        texts = [s.get(text_key, "") or "" for s in stories]
-        ids = [s[id_key] for s in stories]
+    @property
+    def model(self):
+        """Shared encoder from the model registry, loaded on first encode rather than at construction."""
+        return get_sentence_transformer(self.model_name)
+
+    # ---------- rows ----------
+    def _array(self, name: str, dtype) -> np.ndarray:
+        return self.store.array(name) if name in self.store else np.zeros(0, dtype=dtype)
+
+    @property
+    def vectors(self) -> Optional[np.ndarray]:
+        return self.store.array("vectors") if "vectors" in self.store else None
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Story id of every row, tombstoned rows included."""
+        return self._array("ids", np.int64)
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._array("times", np.int64)
+
+    @property
+    def sector_bits(self) -> np.ndarray:
+        return self._array("sector_bits", np.uint64)
+
+    @property
+    def symbol_ptr(self) -> np.ndarray:
+        return self.store.array("symbol_ptr") if "symbol_ptr" in self.store else np.zeros(1, dtype=np.int64)
+
+    @property
+    def symbol_codes(self) -> np.ndarray:
+        return self._array("symbol_codes", np.int32)
 
+    @property
+    def dead(self) -> np.ndarray:
+        """Tombstoned row numbers."""
+        return self._array("dead", np.int64)
+
+    def __len__(self):
+        return len(self.ids) - len(self.dead)
+
+    def __contains__(self, story_id) -> bool:
+        return int(story_id) in self._positions()
+
+    def _live_mask(self) -> np.ndarray:
+        if self._live is None:
+            self._live = np.ones(len(self.ids), dtype=bool)
+            self._live[np.asarray(self.dead)] = False
+        return self._live
+
+    def _positions(self) -> Dict[int, int]:
+        """story id -> live row; built on first use since only edits need it."""
+        if self._pos is None:
+            rows = np.flatnonzero(self._live_mask())
+            self._pos = dict(zip(np.asarray(self.ids)[rows].tolist(), rows.tolist()))
+        return self._pos
+
+    def _encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
         all_vecs = []
-        for i in tqdm(range(0, len(texts), batch_size), desc="Embedding"):
+        for i in tqdm(range(0, len(texts), batch_size), desc="Embedding", disable=len(texts) <= batch_size):
             batch = texts[i:i+batch_size]
             vecs = self.model.encode(batch, show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True)
             all_vecs.append(vecs)
-        all_vecs = np.vstack(all_vecs).astype("float32")
+        return np.vstack(all_vecs).astype("float32")
 
-        self.vectors = all_vecs
-        self.ids = ids
+    # ---------- packed metadata ----------
+    def sector_code(self, sector: str) -> Optional[int]:
+        """
+        Bit position of a sector's sector_to_symbols key (see canonical_sector), assigned on
+        first sight; None for sectors outside that vocabulary.
+        """
+        key = canonical_sector(sector)
+        if key is None:
+            return None
+        if key not in self.sector_vocab:
+            if len(self.sector_vocab) >= MAX_SECTORS:
+                raise ValueError(f"sector_to_symbols has more than {MAX_SECTORS} sectors; the index packs them into a uint64.")
+            self.sector_vocab.append(key)
+        return self.sector_vocab.index(key)
 
-        if _HAS_FAISS:
-            dim = all_vecs.shape[1]
-            idx = faiss.IndexFlatIP(dim)
-            idx.add(all_vecs)
-            self.index = idx
-            if save:
-                faiss.write_index(idx, str(INDEX_FILE))
-        else:
-            self.index = None
-            if save:
-                np.save(EMBED_FILE, all_vecs)
+    def sector_mask(self, sectors: Iterable[str], unknown: Optional[set] = None) -> np.uint64:
+        """Bits of `sectors`; names outside the vocabulary are collected into `unknown`."""
+        mask = 0
+        for sec in sectors or []:
+            code = self.sector_code(sec)
+            if code is not None:
+                mask |= 1 << code
+            elif unknown is not None and sec:
+                unknown.add(sec)
+        return np.uint64(mask)
+
+    def _symbol_index(self) -> Dict[str, int]:
+        if self._symbol_ids is None:
+            self._symbol_ids = {sym: i for i, sym in enumerate(self.symbol_vocab)}
+        return self._symbol_ids
 
+    def symbol_code(self, symbol: str) -> Optional[int]:
+        """Code of a ticker symbol, assigned on first sight."""
+        key = _normalize_symbol(symbol)
+        if not key:
+            return None
+        ids = self._symbol_index()
+        if key not in ids:
+            ids[key] = len(self.symbol_vocab)
+            self.symbol_vocab.append(key)
+        return ids[key]
+
+    def _story_meta(self, stories: List[Dict]):
+        """(times, sector bits, symbol counts, symbol codes) of `stories`, symbols flattened CSR-style."""
+        times = np.array([_story_time(s) for s in stories], dtype=np.int64)
+        unknown = set()
+        bits = np.array([self.sector_mask(s.get("sectors"), unknown) for s in stories], dtype=np.uint64)
+        if unknown:
+            print(f"[Embedding Index] Not indexing sectors missing from sector_to_symbols and sector_aliases: {sorted(unknown)}")
+        per_story = [
+            [c for c in dict.fromkeys(self.symbol_code(sym) for sym in s.get("symbols") or []) if c is not None]
+            for s in stories
+        ]
+        counts = np.array([len(c) for c in per_story], dtype=np.int64)
+        codes = np.array([c for story in per_story for c in story], dtype=np.int32)
+        return times, bits, counts, codes
+
+    def _header(self, index_version: int) -> Dict:
+        return {"format": STORE_FORMAT, "sector_vocab": self.sector_vocab, "symbol_vocab": self.symbol_vocab,
+                "ann": self.params, "index_version": index_version, "compact_dtype": COMPACT_DTYPE}
+
+    def _index_file(self, version: int) -> Path:
+        return STORE_DIR / f"faiss.{version}.index"
+
+    def _rewrite(self, vectors: np.ndarray, ids: np.ndarray, times: np.ndarray, bits: np.ndarray,
+                 ptr: np.ndarray, codes: np.ndarray, save: bool = True):
+        """Replaces the store with these rows and builds a fresh FAISS index over them."""
+        if _HAS_FAISS:
+            self.index, self.params = build_index(vectors, np.arange(len(ids), dtype=np.int64), self.params)
+        arrays = {"vectors": np.asarray(vectors, dtype=np.float32), "ids": np.asarray(ids, dtype=np.int64),
+                  "times": np.asarray(times, dtype=np.int64), "sector_bits": np.asarray(bits, dtype=np.uint64),
+                  "symbol_ptr": np.asarray(ptr, dtype=np.int64), "symbol_codes": np.asarray(codes, dtype=np.int32)}
+        if COMPACT_DTYPE != "float32":
+            arrays["compact"], scales = compress(arrays["vectors"], COMPACT_DTYPE)
+            if scales is not None:
+                arrays["scales"] = scales
+        version = int(self.store.meta.get("index_version", 0)) + 1
         if save:
-            with open(META_FILE, "w", encoding="utf-8") as f:
-                json.dump([{"id": int(i), "title": s.get("article_title"), "published_at": str(s.get("published_at"))} for i, s in zip(ids, stories)], f, indent=2)
+            self._write_index(version)
+        self.store.rewrite(arrays, **self._header(version if save and self.index is not None else -1))
+        self._pos, self._live, self._matrix = None, None, None
+        self._compact_ok = True
+        self._drop_old_index_files(version)
 
-    def save(self):
-        if self.vectors is not None:
-            np.save(EMBED_FILE, self.vectors)
-            with open(META_FILE, "w", encoding="utf-8") as f:
-                json.dump([{"id": int(i)} for i in self.ids], f, indent=2)
+    def _write_index(self, version: int):
         if _HAS_FAISS and self.index is not None:
-            faiss.write_index(self.index, str(INDEX_FILE))
+            STORE_DIR.mkdir(parents=True, exist_ok=True)
+            faiss.write_index(self.index, str(self._index_file(version)))
+
+    def _drop_old_index_files(self, keep: int):
+        for path in STORE_DIR.glob("faiss.*.index"):
+            if path != self._index_file(keep):
+                path.unlink()
+
+    def build_from_stories(self, stories: list, text_key="combined_text", id_key="id", batch_size=64, save=True,
+                           index_type: Optional[str] = None):
+        """
+        stories: list of dicts {id, combined_text, article_title, published_at, ...}
+        will compute embeddings and build index (of `index_type`, default EMBED_INDEX_TYPE).
+        The rows are stored as they are built; `save` also writes the FAISS index.
+        """
+        texts = [s.get(text_key, "") or "" for s in stories]
+        all_vecs = self._encode(texts, batch_size)
+
+        self.sector_vocab = []
+        self.symbol_vocab, self._symbol_ids = [], None
+        times, bits, counts, codes = self._story_meta(stories)
+        if index_type:
+            self.params = resolve_params(index_type)
+        ids = np.array([int(s[id_key]) for s in stories], dtype=np.int64)
+        self._rewrite(all_vecs, ids, times, bits, _csr_ptr(counts), codes, save=save)
+        if self.index is not None:
+            print(f"[Embedding Index] Built {index_kind(self.index)} index over {len(self)} vectors.")
+
+    # ---------- incremental maintenance ----------
+    def _append_rows(self, vecs: np.ndarray, ids: np.ndarray, times: np.ndarray, bits: np.ndarray,
+                     counts: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Appends rows to the store (durable at the next save); returns their row numbers."""
+        start = len(self.ids)
+        if "symbol_ptr" not in self.store:
+            self.store.append("symbol_ptr", np.zeros(1, dtype=np.int64))
+        base = int(self.symbol_ptr[-1])
+        self.store.append("vectors", vecs, dtype=np.float32)
+        if COMPACT_DTYPE != "float32" and self._compact_ok:
+            matrix, scales = compress(vecs, COMPACT_DTYPE)
+            self.store.append("compact", matrix)
+            if scales is not None:
+                self.store.append("scales", scales)
+        self.store.append("ids", ids, dtype=np.int64)
+        self.store.append("times", times, dtype=np.int64)
+        self.store.append("sector_bits", bits, dtype=np.uint64)
+        self.store.append("symbol_ptr", base + _csr_ptr(counts)[1:], dtype=np.int64)
+        self.store.append("symbol_codes", codes, dtype=np.int32)
+
+        rows = np.arange(start, start + len(ids), dtype=np.int64)
+        if self._pos is not None:
+            self._pos.update(zip(ids.tolist(), rows.tolist()))
+        if self._live is not None:
+            self._live = np.concatenate([self._live, np.ones(len(ids), dtype=bool)])
+        self._matrix = None
+        return rows
+
+    def add(self, stories: list, text_key="combined_text", id_key="id", batch_size=64) -> int:
+        """Embeds and appends stories not yet in the index; returns how many were added."""
+        pos = self._positions()
+        seen = set()
+        new = []
+        for s in stories:
+            sid = int(s[id_key])
+            if sid not in pos and sid not in seen:
+                seen.add(sid)
+                new.append(s)
+        if not new:
+            return 0
+
+        ids = np.array([int(s[id_key]) for s in new], dtype=np.int64)
+        vecs = self._encode([s.get(text_key, "") or "" for s in new], batch_size)
+        times, bits, counts, codes = self._story_meta(new)
+        rows = self._append_rows(vecs, ids, times, bits, counts, codes)
+
+        if _HAS_FAISS:
+            if self.index is None:
+                live = np.flatnonzero(self._live_mask())
+                self.index, self.params = build_index(np.asarray(self.vectors)[live], live, self.params)
+            else:
+                self.index.add_with_ids(vecs, rows)
+            self._upgrade_index()
+        return len(new)
+
+    def _upgrade_index(self):
+        """
+        An IVF index started from too few vectors is built flat; once the corpus reaches the
+        training minimum it is rebuilt as the configured type.
+        """
+        built, configured = index_kind(self.index), self.params["index_type"]
+        if built == configured or len(self) < min_train_size(self.params):
+            return
+        live = np.flatnonzero(self._live_mask())
+        self.index, self.params = build_index(np.asarray(self.vectors)[live], live, self.params)
+        print(f"[Embedding Index] Rebuilt the {built} index as {index_kind(self.index)} over {len(self)} vectors.")
+
+    def remove(self, ids: Iterable[int]) -> int:
+        """
+        Tombstones the rows of the given story ids; unknown ids are ignored. Returns how many
+        were removed. The FAISS index keeps their vectors and searches skip them until the
+        next compaction, so no index type has to delete or be rebuilt here.
+        """
+        pos = self._positions()
+        rows = np.array(sorted(pos.pop(sid) for sid in {int(i) for i in ids} if sid in pos), dtype=np.int64)
+        if not len(rows):
+            return 0
+        self.store.append("dead", rows, dtype=np.int64)
+        if self._live is not None:
+            self._live[rows] = False
+        return len(rows)
+
+    def update(self, stories: list, text_key="combined_text", id_key="id", batch_size=64) -> int:
+        """Re-embeds stories whose text changed (and adds unknown ones); returns how many were written."""
+        self.remove([s[id_key] for s in stories])
+        return self.add(stories, text_key=text_key, id_key=id_key, batch_size=batch_size)
+
+    def _compact(self, sector_bits: Optional[np.ndarray] = None):
+        """Rewrites only the live rows (renumbered) and rebuilds the FAISS index over them."""
+        live = np.flatnonzero(self._live_mask())
+        counts = np.diff(np.asarray(self.symbol_ptr))
+        codes = np.asarray(self.symbol_codes)[np.repeat(self._live_mask(), counts)]
+        bits = np.asarray(self.sector_bits if sector_bits is None else sector_bits)[live]
+        dropped = len(self.ids) - len(live)
+        self._rewrite(np.asarray(self.vectors)[live], np.asarray(self.ids)[live], np.asarray(self.times)[live],
+                      bits, _csr_ptr(counts[live]), codes)
+        print(f"[Embedding Index] Compacted the store: dropped {dropped} tombstoned rows, {len(live)} remain.")
+
+    def _rekey_sectors(self, old_bits: np.ndarray) -> np.ndarray:
+        """
+        Moves sector bits recorded under raw sector names (indexes built before sectors were
+        canonicalized) onto their sector_to_symbols keys; names outside the vocabulary are dropped.
+        """
+        old, old_bits = self.sector_vocab, np.asarray(old_bits, dtype=np.uint64)
+        self.sector_vocab = []
+        bits = np.zeros(len(old_bits), dtype=np.uint64)
+        for i, name in enumerate(old):
+            code = self.sector_code(name)
+            if code is not None:
+                bits |= ((old_bits >> np.uint64(i)) & np.uint64(1)) << np.uint64(code)
+        dropped = sorted(name for name in old if canonical_sector(name) is None)
+        print(f"[Embedding Index] Re-keyed {len(old)} sector names onto {len(self.sector_vocab)} sectors"
+              + (f"; dropped {dropped}." if dropped else "."))
+        return bits
+
+    # ---------- persistence ----------
+    def save(self):
+        """Commits the rows appended and tombstoned since the last save, with the FAISS index."""
+        rows = len(self.ids)
+        if rows and (len(self.dead) > COMPACT_FRACTION * rows or not self._compact_ok):
+            self._compact()
+            return
+        version = int(self.store.meta.get("index_version", 0)) + 1
+        self._write_index(version)
+        self.store.commit(**self._header(version if self.index is not None else -1))
+        self._drop_old_index_files(version)
 
     def load(self):
-        if _HAS_FAISS and INDEX_FILE.exists():
-            idx = faiss.read_index(str(INDEX_FILE))
-            self.index = idx
-            if META_FILE.exists():
-                with open(META_FILE, "r", encoding="utf-8") as f:
-                    meta = json.load(f)
-                self.ids = [m["id"] for m in meta]
-        elif EMBED_FILE.exists():
-            self.vectors = np.load(str(EMBED_FILE))
-
-            if META_FILE.exists():
-                with open(META_FILE, "r", encoding="utf-8") as f:
-                    meta = json.load(f)
-                self.ids = [m["id"] for m in meta]
+        if not (self.store.load() and self.store.meta.get("format") == STORE_FORMAT):
+            if not self._migrate_legacy():
+                raise FileNotFoundError("No index or embeddings found. Build index first.")
+            return
+        header = self.store.meta
+        self.sector_vocab = header.get("sector_vocab", [])
+        self.symbol_vocab = header.get("symbol_vocab", [])
+        self._symbol_ids, self._pos, self._live, self._matrix = None, None, None, None
+        self.params = {**self.params, **header.get("ann", {})}
+        self._compact_ok = header.get("compact_dtype") == COMPACT_DTYPE
+        if any(canonical_sector(sec) != sec for sec in self.sector_vocab):
+            self._compact(sector_bits=self._rekey_sectors(self.sector_bits))
+            header = self.store.meta
+        if not _HAS_FAISS:
+            return
+
+        path = self._index_file(int(header.get("index_version", -1)))
+        if path.exists():
+            self.index = faiss.read_index(str(path))
+        elif len(self):
+            # the rows were committed without their index (e.g. built with save=False)
+            live = np.flatnonzero(self._live_mask())
+            self.index, self.params = build_index(np.asarray(self.vectors)[live], live, self.params)
+            print(f"[Embedding Index] Rebuilt the missing {index_kind(self.index)} index over {len(self)} vectors.")
+        if self.index is not None and index_kind(self.index) != self.params["index_type"]:
+            # the type configured at build time wins over EMBED_INDEX_TYPE; switching takes a rebuild
+            print(f"[Embedding Index] Index is {index_kind(self.index)} but {self.params['index_type']} is configured; "
+                  f"it is rebuilt on the next update once it holds {min_train_size(self.params)} stories "
+                  f"(now {len(self)}).")
+
+    def _migrate_legacy(self) -> bool:
+        """Moves an index saved by earlier versions (separate .npy files, story-id keyed faiss.index) into the store."""
+        if not (EMBED_FILE.exists() or (_HAS_FAISS and INDEX_FILE.exists())):
+            return False
+        header = {}
+        if HEADER_FILE.exists():
+            with open(HEADER_FILE, "r", encoding="utf-8") as f:
+                header = json.load(f)
+        self.sector_vocab = header.get("sector_vocab", [])
+        self.symbol_vocab, self._symbol_ids = header.get("symbol_vocab", []), None
+        if IDS_FILE.exists():
+            ids = np.load(str(IDS_FILE))
+            times, bits = np.load(str(TIMES_FILE)), np.load(str(SECTORS_FILE))
+            if SYMBOL_PTR_FILE.exists() and len(np.load(str(SYMBOL_PTR_FILE), mmap_mode="r")) == len(ids) + 1:
+                ptr, codes = np.load(str(SYMBOL_PTR_FILE)), np.load(str(SYMBOLS_FILE))
+            else:
+                ptr, codes = np.zeros(len(ids) + 1, dtype=np.int64), np.zeros(0, dtype=np.int32)
+        elif META_FILE.exists():
+            with open(META_FILE, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            ids = np.array([int(m["id"]) for m in meta], dtype=np.int64)
+            times, bits, counts, codes = self._story_meta(meta)
+            ptr = _csr_ptr(counts)
         else:
-            raise FileNotFoundError("No index or embeddings found. Build index first.")
+            return False
+
+        vectors = np.load(str(EMBED_FILE)) if EMBED_FILE.exists() else None
+        if (vectors is None or len(vectors) != len(ids)) and _HAS_FAISS and INDEX_FILE.exists():
+            old = faiss.read_index(str(INDEX_FILE))
+            if index_kind(old) != "flat":
+                raise FileNotFoundError(f"{EMBED_FILE} is missing and a {index_kind(old)} index cannot restore it. Rebuild the index.")
+            inner = faiss.downcast_index(old.index) if hasattr(old, "id_map") else old
+            vectors = inner.reconstruct_n(0, old.ntotal)
+            if hasattr(old, "id_map"):
+                pos = {int(sid): i for i, sid in enumerate(faiss.vector_to_array(old.id_map))}
+                vectors = vectors[[pos[sid] for sid in ids.tolist()]]
+        if vectors is None or len(vectors) != len(ids):
+            raise FileNotFoundError("Saved embeddings do not match the saved story ids. Rebuild the index.")
+
+        if header.get("ann"):
+            self.params = {**self.params, **header["ann"]}
+        if any(canonical_sector(sec) != sec for sec in self.sector_vocab):
+            bits = self._rekey_sectors(bits)
+        self._rewrite(vectors, ids, times, bits, ptr, codes)
+        for path in LEGACY_FILES:
+            if path.exists():
+                path.unlink()
+        print(f"[Embedding Index] Migrated {len(ids)} stories into the append-only store at {STORE_DIR}.")
+        return True
+
+    # ---------- search ----------
+    def filter_mask(self, since=None, until=None, sectors: Optional[Iterable[str]] = None,
+                    symbols: Optional[Iterable[str]] = None) -> Optional[np.ndarray]:
+        """
+        Live rows matching every given filter: published in [since, until] (datetimes, epoch
+        seconds or date strings), tagged with any of `sectors` (any spelling canonical_sector
+        resolves), mentioning any of `symbols`. None when no filter is given; unknown sectors
+        or symbols match nothing.
+        """
+        if since is None and until is None and not sectors and not symbols:
+            return None
+        mask = self._live_mask().copy()
+        if since is not None:
+            mask &= np.asarray(self.times) >= _epoch(since)
+        if until is not None:
+            mask &= np.asarray(self.times) <= _epoch(until)
+        if sectors:
+            bits = 0
+            for key in (canonical_sector(sec) for sec in sectors):
+                if key in self.sector_vocab:
+                    bits |= 1 << self.sector_vocab.index(key)
+            mask &= (np.asarray(self.sector_bits) & np.uint64(bits)) != 0
+        if symbols:
+            ids = self._symbol_index()
+            codes = [ids[k] for k in (_normalize_symbol(sym) for sym in symbols) if k in ids]
+            has_symbol = np.zeros(len(self.ids), dtype=bool)
+            if codes:
+                hit = np.isin(self.symbol_codes, codes)
+                rows = np.repeat(np.arange(len(self.ids)), np.diff(self.symbol_ptr))
+                has_symbol[rows[hit]] = True
+            mask &= has_symbol
+        return mask
+
+    def _searcher(self) -> MatrixSearcher:
+        """
+        Exact NumPy scorer. Next to FAISS it only scores filtered subsets, over the float32
+        vectors; without FAISS it serves every query, from the compact matrix.
+        """
+        if self._matrix is None:
+            if _HAS_FAISS or COMPACT_DTYPE == "float32":
+                self._matrix = MatrixSearcher(self.vectors)
+            elif self._compact_ok and "compact" in self.store:
+                self._matrix = MatrixSearcher(self.store.array("compact"),
+                                              self.store.array("scales") if "scales" in self.store else None)
+            else:
+                print(f"[Embedding Index] No {COMPACT_DTYPE} matrix saved for this index; converting in memory.")
+                self._matrix = MatrixSearcher(*compress(self.vectors, COMPACT_DTYPE))
+        return self._matrix
+
+    def _hits(self, D: np.ndarray, I: np.ndarray) -> List[List[Dict]]:
+        # labels are row numbers; -1 pads results when fewer than top_k stories match
+        ids = np.asarray(self.ids)
+        return [[{"id": int(ids[row]), "score": float(sc)} for sc, row in zip(d, i) if row >= 0]
+                for d, i in zip(D.tolist(), I.tolist())]
+
+    def _exact_search(self, qvecs: np.ndarray, top_k: int, rows: Optional[np.ndarray] = None) -> List[List[Dict]]:
+        if rows is None and len(self.dead):
+            rows = np.flatnonzero(self._live_mask())
+        scores, found = self._searcher().search(qvecs, top_k, rows=rows)
+        return self._hits(scores, found)
+
+    def _tombstone_selector(self):
+        """Selector skipping tombstoned rows, which the FAISS index still holds; None when there are none."""
+        if not len(self.dead):
+            return None
+        dead = faiss.IDSelectorBatch(np.ascontiguousarray(self.dead, dtype=np.int64))
+        sel = faiss.IDSelectorNot(dead)
+        sel.referenced = dead  # keep the wrapped selector alive as long as this one
+        return sel
 
-    def query(self, query_text: str, top_k: int = 10):
-        qvec = self.model.encode([query_text], convert_to_numpy=True, normalize_embeddings=True).astype("float32")
+    def _filtered_search(self, qvecs: np.ndarray, rows: np.ndarray, top_k: int, nprobe, ef_search) -> List[List[Dict]]:
+        if not len(rows):
+            return [[] for _ in range(len(qvecs))]
+        approximate = self.index is not None and index_kind(self.index) != "flat"
+        if _HAS_FAISS and self.index is not None and len(rows) > FILTER_EXACT_MAX \
+                and not (approximate and len(rows) < FILTER_MIN_FRACTION * len(self)):
+            # broad filter: let the index skip non-matching rows while it searches
+            sel = faiss.IDSelectorBatch(np.ascontiguousarray(rows, dtype=np.int64))
+            params = search_params(self.index, nprobe or self.params.get("nprobe"),
+                                   ef_search or self.params.get("ef_search"), sel=sel)
+            hits = self._hits(*self.index.search(qvecs, top_k, params=params))
+            # probed lists / graph neighbourhoods can hold too few matches; then score the subset exactly
+            if all(len(h) >= min(top_k, len(rows)) for h in hits):
+                return hits
+        return self._exact_search(qvecs, top_k, rows=rows)
+
+    def query(self, query_text: str, top_k: int = 10, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+              since=None, until=None, sectors: Optional[Iterable[str]] = None, symbols: Optional[Iterable[str]] = None):
+        """
+        Top-k stories for the query. nprobe (IVF lists scanned) and ef_search (HNSW beam width)
+        trade recall for latency per call and default to the values the index was built with.
+        since/until, sectors and symbols restrict the search to matching stories (see filter_mask);
+        the result is the top-k among those, not a filtered global top-k.
+        """
+        return self.query_batch([query_text], top_k=top_k, nprobe=nprobe, ef_search=ef_search,
+                                since=since, until=until, sectors=sectors, symbols=symbols)[0]
+
+    def query_batch(self, query_texts: List[str], top_k: int = 10, nprobe: Optional[int] = None,
+                    ef_search: Optional[int] = None, since=None, until=None,
+                    sectors: Optional[Iterable[str]] = None, symbols: Optional[Iterable[str]] = None) -> List[List[Dict]]:
+        """query() for several texts at once (same filters): one encode and one scan for the batch."""
+        if not query_texts:
+            return []
+        qvecs = self.model.encode(list(query_texts), convert_to_numpy=True, normalize_embeddings=True).astype("float32")
+        mask = self.filter_mask(since=since, until=until, sectors=sectors, symbols=symbols)
+        if mask is not None:
+            return self._filtered_search(qvecs, np.flatnonzero(mask), top_k, nprobe, ef_search)
         if _HAS_FAISS and self.index is not None:
-            D, I = self.index.search(qvec, top_k)
-            scores = D[0].tolist()
-            idxs = I[0].tolist()
-            results = []
-            for sc, ix in zip(scores, idxs):
-                sid = self.ids[ix]
-                results.append({"id": sid, "score": float(sc)})
-            return results
-        else:
-            mat = self.vectors  # shape (N, d)
-            cos = util.cos_sim(qvec, mat)[0]  # shape (N,)
-            top = np.argsort(-cos)[:top_k]
-            results = []
-            for ix in top:
-                results.append({"id": int(self.ids[ix]), "score": float(cos[ix])})
-            return results
+            params = search_params(self.index, nprobe or self.params.get("nprobe"),
+                                   ef_search or self.params.get("ef_search"), sel=self._tombstone_selector())
+            return self._hits(*self.index.search(qvecs, top_k, params=params))
+        return self._exact_search(qvecs, top_k)
@@ -0,0 +1,86 @@
+"""
+Exact inner-product search in plain NumPy, for deployments without FAISS and for scoring
+filtered subsets. Normalized vectors can be stored as float16, or as int8 with one scale
+per row; scores come from blocked matrix products over the (memory-mapped) matrix, so
+memory stays bounded by the block size, and top-k is selected with argpartition.
+"""
+import os
+import numpy as np
+from typing import Optional, Tuple
+
+COMPACT_DTYPES = ("float32", "float16", "int8")
+# rows scored per matrix product; bounds the float32 working set to block x dim
+BLOCK_ROWS = int(os.getenv("EMBED_SEARCH_BLOCK", "16384"))
+
+
+def compress(vectors: np.ndarray, dtype: str = "float16", block_rows: int = BLOCK_ROWS) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """(matrix, per-row scales or None) storing `vectors` as float32, float16 or scaled int8."""
+    if dtype not in COMPACT_DTYPES:
+        raise ValueError(f"Unknown vector dtype '{dtype}', expected one of {COMPACT_DTYPES}")
+    if dtype == "float32":
+        return np.asarray(vectors, dtype=np.float32), None
+    out = np.empty(vectors.shape, dtype=np.float16 if dtype == "float16" else np.int8)
+    scales = np.ones(len(vectors), dtype=np.float32) if dtype == "int8" else None
+    for start in range(0, len(vectors), block_rows):
+        block = np.asarray(vectors[start:start + block_rows], dtype=np.float32)
+        if scales is None:
+            out[start:start + len(block)] = block
+            continue
+        # symmetric per-row scale: the row's largest component maps to +-127
+        scale = np.abs(block).max(axis=1) / 127.0
+        scale[scale == 0] = 1.0
+        out[start:start + len(block)] = np.clip(np.rint(block / scale[:, None]), -127, 127)
+        scales[start:start + len(block)] = scale
+    return out, scales
+
+
+class MatrixSearcher:
+    """Top-k by inner product over a (rows x dim) matrix, for a batch of queries at once."""
+    def __init__(self, matrix: np.ndarray, scales: Optional[np.ndarray] = None, block_rows: int = BLOCK_ROWS):
+        self.matrix = matrix
+        self.scales = scales
+        self.block_rows = block_rows
+
+    def __len__(self):
+        return len(self.matrix)
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def search(self, queries: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        queries: (nq, dim). rows: optional subset of row numbers to score.
+        Returns (scores, row numbers), both (nq, min(k, candidates)) and best first.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        qt = np.ascontiguousarray(queries.T)
+        n = len(self.matrix) if rows is None else len(rows)
+        k = min(k, n)
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        if k <= 0:
+            return best_scores, best_rows
+
+        for start in range(0, n, self.block_rows):
+            if rows is None:
+                block_rows = np.arange(start, min(start + self.block_rows, n), dtype=np.int64)
+                block = self.matrix[start:start + self.block_rows]
+            else:
+                block_rows = np.asarray(rows[start:start + self.block_rows], dtype=np.int64)
+                block = self.matrix[block_rows]
+            scores = np.asarray(block, dtype=np.float32) @ qt  # (block, nq)
+            if self.scales is not None:
+                scores *= np.asarray(self.scales[block_rows])[:, None]
+            scores = scores.T
+
+            cand_scores = np.concatenate([best_scores, scores], axis=1)
+            cand_rows = np.concatenate([best_rows, np.broadcast_to(block_rows, scores.shape)], axis=1)
+            if cand_scores.shape[1] > k:
+                keep = np.argpartition(-cand_scores, k - 1, axis=1)[:, :k]
+                cand_scores = np.take_along_axis(cand_scores, keep, axis=1)
+                cand_rows = np.take_along_axis(cand_rows, keep, axis=1)
+            best_scores, best_rows = cand_scores, cand_rows
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_scores, order, axis=1), np.take_along_axis(best_rows, order, axis=1)
@@ -0,0 +1,258 @@
+import os
+import numpy as np
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from .append_store import AppendStore
+from .ann_index import resolve_params, build_index, min_train_size, search_params, index_kind
+
+try:
+    import faiss
+    _HAS_FAISS = True
+except Exception:
+    faiss = None
+    _HAS_FAISS = False
+
+STORY_CENTROID_DIR = Path(os.environ.get("STORY_CENTROID_DIR", "embeddings/story_centroids"))
+# ANN structure over the normalized centroids (see ann_index). Centroids move as stories grow,
+# so only types that can replace a vector (flat, ivf, ivfpq) are accepted.
+CENTROID_INDEX_TYPE = os.environ.get("STORY_CENTROID_INDEX_TYPE", "ivf").lower()
+# superseded rows tolerated, as a fraction of the store, before it is compacted
+CENTROID_COMPACT_FRACTION = float(os.environ.get("STORY_CENTROID_COMPACT_FRACTION", "0.5"))
+
+
+def _normalize(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+class StoryCentroidIndex:
+    """
+    Running centroid of the article embeddings in each unique_news story.
+    Stores the per-story vector sum and article count, so attaching an article
+    is an O(d) update, plus the normalized centroid, which is kept in a FAISS index
+    keyed by story id: the nearest story is a top-1 search, not a scan of every story.
+
+    Rows live in an AppendStore. A story whose centroid moves gets a new row (the latest
+    row of an id wins) and superseded rows are compacted away once in a while, so a save
+    writes only the stories touched since the last one. `seq` is the unique_news.story_seq
+    the stored centroids reflect and is committed with them.
+    """
+    def __init__(self, cache_dir: Path = STORY_CENTROID_DIR, index_type: Optional[str] = None):
+        self.cache_dir = Path(cache_dir)
+        self.params = resolve_params(index_type or CENTROID_INDEX_TYPE)
+        if self.params["index_type"] == "hnsw":
+            raise ValueError("HNSW cannot replace a moved centroid; use flat, ivf or ivfpq for story centroids.")
+        self.store = AppendStore(self.cache_dir)
+        self.index = None
+        self.seq = 0
+        self._pending: Dict[int, Tuple[np.ndarray, int]] = {}
+        self._new = set()
+        self._indexed = set()
+        self._live = None
+        self._cleared = False
+        self._rebuild = False
+
+    def _index_file(self, version: int) -> Path:
+        return self.cache_dir / f"centroids.{version}.index"
+
+    def __len__(self):
+        stored = 0 if self._cleared else int(self.store.meta.get("stories", 0))
+        return stored + len(self._new)
+
+    def load(self) -> "StoryCentroidIndex":
+        if not self.store.load() or "story_ids" not in self.store:
+            legacy = [self.cache_dir / f"{name}.npy" for name in ("story_ids", "sums", "counts")]
+            if any(f.exists() for f in legacy):
+                # written before story_seq was tracked; the dedup agent rebuilds them from the stories
+                print(f"[Story Centroids] Dropping centroids in the old layout at {self.cache_dir}.")
+                for f in legacy:
+                    if f.exists():
+                        f.unlink()
+            return self
+        self.seq = int(self.store.meta.get("seq", 0))
+        if _HAS_FAISS:
+            path = self._index_file(int(self.store.meta.get("index_version", 0)))
+            if path.exists():
+                self.index = faiss.read_index(str(path))
+            else:
+                self._rebuild = True
+        return self
+
+    def reset(self):
+        """Forgets every centroid; the next save() replaces the store with what was added since."""
+        self._cleared = True
+        self._pending, self._new, self._indexed = {}, set(), set()
+        self._live = None
+        self.index = None
+        self._rebuild = True
+        self.seq = 0
+
+    # ---------- rows ----------
+    def _stored(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(story ids sorted, row of each id's latest centroid) over the committed store."""
+        if self._live is None:
+            if self._cleared or "story_ids" not in self.store:
+                self._live = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+            else:
+                ids = np.asarray(self.store.array("story_ids"))
+                uniq, first = np.unique(ids[::-1], return_index=True)
+                self._live = (uniq, len(ids) - 1 - first)
+        return self._live
+
+    def _row_of(self, story_id: int) -> Optional[int]:
+        uniq, rows = self._stored()
+        at = np.searchsorted(uniq, story_id)
+        if at < len(uniq) and uniq[at] == story_id:
+            return int(rows[at])
+        return None
+
+    def _current(self, story_id: int) -> Optional[Tuple[np.ndarray, int]]:
+        if story_id in self._pending:
+            return self._pending[story_id]
+        row = self._row_of(story_id)
+        if row is None:
+            return None
+        return np.array(self.store.array("sums")[row], dtype="float32"), int(self.store.array("counts")[row])
+
+    def _set(self, story_id: int, total: np.ndarray, count: int):
+        if story_id not in self._pending and self._row_of(story_id) is None:
+            self._new.add(story_id)
+        self._pending[story_id] = (np.asarray(total, dtype="float32"), int(count))
+        self._indexed.discard(story_id)
+
+    def add(self, story_id: int, vectors: np.ndarray):
+        """Adds article vectors to a story, creating its centroid if it is new."""
+        vectors = np.asarray(vectors, dtype="float32").reshape(-1, vectors.shape[-1])
+        sid = int(story_id)
+        current = self._current(sid)
+        if current is None:
+            self._set(sid, vectors.sum(axis=0), len(vectors))
+        else:
+            self._set(sid, current[0] + vectors.sum(axis=0), current[1] + len(vectors))
+
+    def replace(self, story_id: int, vectors: np.ndarray):
+        """Sets a story's centroid from all of its article vectors."""
+        vectors = np.asarray(vectors, dtype="float32").reshape(-1, vectors.shape[-1])
+        self._set(int(story_id), vectors.sum(axis=0), len(vectors))
+
+    def _all_units(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(story ids, normalized centroids) of every story, this run's changes included."""
+        uniq, rows = self._stored()
+        keep = ~np.isin(uniq, np.fromiter(self._pending, dtype=np.int64, count=len(self._pending)))
+        ids, units = [uniq[keep]], []
+        if keep.any():
+            units.append(np.asarray(self.store.array("units"))[rows[keep]])
+        if self._pending:
+            ids.append(np.fromiter(self._pending, dtype=np.int64, count=len(self._pending)))
+            units.append(_normalize(np.stack([t for t, _ in self._pending.values()])))
+        ids = np.concatenate(ids)
+        return ids, (np.concatenate(units).astype("float32") if units else None)
+
+    # ---------- ANN index ----------
+    def _sync_index(self):
+        """Brings the FAISS index up to date with this run's centroid changes (one remove + add)."""
+        if not _HAS_FAISS:
+            return
+        if self.index is None or self._rebuild:
+            ids, units = self._all_units()
+            if units is None:
+                self.index = None
+                return
+            self.index, self.params = build_index(units, ids, self.params)
+            self._indexed = set(self._pending)
+            self._rebuild = False
+            return
+        todo = np.array([sid for sid in self._pending if sid not in self._indexed], dtype=np.int64)
+        if not len(todo):
+            return
+        units = _normalize(np.stack([self._pending[int(sid)][0] for sid in todo])).astype("float32")
+        self.index.remove_ids(todo)
+        self.index.add_with_ids(units, todo)
+        self._indexed.update(todo.tolist())
+
+    def nearest(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (story_id, cosine similarity) of the closest centroid for each vector.
+        story_id is -1 when the index is empty (or an IVF probe finds no story).
+        """
+        n = len(vectors)
+        none = np.full(n, -1, dtype=np.int64), np.full(n, -1.0, dtype="float32")
+        if len(self) == 0 or n == 0:
+            return none
+
+        q = _normalize(np.asarray(vectors, dtype="float32"))
+        if _HAS_FAISS:
+            self._sync_index()
+            if self.index is None:
+                return none
+            D, I = self.index.search(q, 1, params=search_params(self.index, self.params.get("nprobe")))
+            return I[:, 0].astype(np.int64), D[:, 0].astype("float32")
+
+        # without FAISS: exact top-1 over the stored unit rows, without recomputing them
+        ids, units = self._all_units()
+        if units is None:
+            return none
+        sims = q @ units.T
+        best = sims.argmax(axis=1)
+        return ids[best], sims[np.arange(n), best]
+
+    # ---------- persistence ----------
+    def save(self, seq: Optional[int] = None):
+        """Commits this run's centroid changes (and the story_seq they reflect) in one store commit."""
+        if seq is not None:
+            self.seq = int(seq)
+        if _HAS_FAISS and self.index is not None and index_kind(self.index) != self.params["index_type"] \
+                and len(self) >= min_train_size(self.params):
+            print(f"[Story Centroids] Rebuilding the {index_kind(self.index)} index as {self.params['index_type']} over {len(self)} stories.")
+            self._rebuild = True
+        if not self._pending and not self._cleared and not self._rebuild and seq is None:
+            return
+        self._sync_index()
+
+        meta = dict(self.store.meta) if not self._cleared else {}
+        version = int(meta.get("index_version", 0)) + 1
+        if _HAS_FAISS and self.index is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            faiss.write_index(self.index, str(self._index_file(version)))
+
+        ids = np.fromiter(self._pending, dtype=np.int64, count=len(self._pending))
+        sums = np.stack([t for t, _ in self._pending.values()]) if self._pending else None
+        counts = np.array([c for _, c in self._pending.values()], dtype=np.int32)
+        superseded = int(meta.get("superseded", 0)) + len(self._pending) - len(self._new)
+        rows = self.store.length("story_ids") + len(ids)
+        meta.update(seq=self.seq, stories=len(self), index_version=version, superseded=superseded)
+
+        if self._cleared or superseded > CENTROID_COMPACT_FRACTION * rows:
+            uniq, last = self._stored()
+            keep = ~np.isin(uniq, ids)
+            old = lambda name: np.asarray(self.store.array(name))[last[keep]] if keep.any() else None
+            parts = {
+                "story_ids": [uniq[keep], ids],
+                "sums": [old("sums"), sums],
+                "counts": [old("counts"), counts],
+                "units": [old("units"), _normalize(sums) if sums is not None else None],
+            }
+            arrays = {name: np.concatenate([p for p in ps if p is not None]) for name, ps in parts.items()
+                      if any(p is not None for p in ps)}
+            if "sums" in arrays:
+                arrays["story_ids"] = arrays["story_ids"].astype(np.int64)
+            else:
+                arrays = {}
+            meta["superseded"] = 0
+            self.store.rewrite(arrays, **meta)
+        elif len(ids):
+            self.store.append("story_ids", ids, dtype=np.int64)
+            self.store.append("sums", sums, dtype=np.float32)
+            self.store.append("counts", counts, dtype=np.int32)
+            self.store.append("units", _normalize(sums), dtype=np.float32)
+            self.store.commit(**meta)
+        else:
+            self.store.commit(**meta)
+
+        for path in self.cache_dir.glob("centroids.*.index"):
+            if path != self._index_file(version):
+                path.unlink()
+        self._pending, self._new, self._indexed = {}, set(), set()
+        self._live = None
+        self._cleared = False
@@ -2,15 +2,19 @@ from src.agents import (
     build_ingestion_graph, build_dedup_graph, 
     build_entity_graph, build_impact_mapping_graph
 )
+from src.agents.entity_extraction_agent import NER_WORKERS
+from src.core.build_embeddings import update_embedding_index
 from langgraph.graph import StateGraph, END
 from typing import TypedDict, Dict, Any, List
 from IPython.display import Image, display
-import os, time
+import os, time, argparse
 
 
 class PipelineState(TypedDict):
     rss_feeds: List
     info: Dict[str, Any]
+    full_rebuild: bool
+    ner_workers: int
 
 def retry(times=3):
     def decorator(fn):
@@ -33,7 +37,8 @@ def run_ingestion(state: PipelineState) -> PipelineState:
         "rss_feeds": state["rss_feeds"],
         "raw_articles": [],
         "standardized_articles": [],
-        "saved_count": 0
+        "saved_count": 0,
+        "feed_state": {}
     })
     state["info"]["ingestion"] = result
     # print(result["raw_articles"][:3])
@@ -45,22 +50,38 @@ def run_deduplication(state: PipelineState) -> PipelineState:
     dedup_app = build_dedup_graph()
     result = dedup_app.invoke({
         "raw_articles": [],
+        "lexical_reps": [],
         "embeddings": None,
+        "attached": {},
+        "unassigned": [],
         "clusters": [],
-        "unique_stories": []
+        "unique_stories": [],
+        "full_rebuild": state.get("full_rebuild", False)
     })
     state["info"]["dedup"] = result
     return state
 
+@retry(times=3)
+def run_index_update(state: PipelineState) -> PipelineState:
+    """
+    Adds the stories created or changed by deduplication to the semantic search index.
+    Runs after entity extraction so their sectors are stored with them.
+    """
+    stories = state["info"].get("dedup", {}).get("unique_stories", [])
+    idx = update_embedding_index(stories, full_rebuild=state.get("full_rebuild", False))
+    state["info"]["index"] = {"indexed": len(idx)}
+    return state
+
 @retry(times=3)
 def run_entity_extraction(state: PipelineState) -> PipelineState:
     """Run entity extraction agent"""
-    ner_app = build_entity_graph()
+    ner_app = build_entity_graph(num_workers=state.get("ner_workers") or NER_WORKERS)
     result = ner_app.invoke({
         "stories": [],
-        "ner_result": [],
+        "ner_results": [],
         "extended_ner": [],
-        "saved_count": 0
+        "saved_count": 0,
+        "full_rebuild": state.get("full_rebuild", False)
     })
     state["info"]["ner"] = result
     return state
@@ -72,7 +93,8 @@ def run_impact_mapping(state: PipelineState) -> PipelineState:
     result = impact_app.invoke({
         "entities": [],
         "computed_impacts": [],
-        "saved_count": 0
+        "saved_count": 0,
+        "full_rebuild": state.get("full_rebuild", False)
     })
     state["info"]["impact"] = result
     return state
@@ -82,6 +104,7 @@ def build_end_to_end_pipeline():
 
     graph.add_node("ingestion", run_ingestion)
     graph.add_node("deduplication", run_deduplication)
+    graph.add_node("index_update", run_index_update)
     graph.add_node("entity_extraction", run_entity_extraction)
     graph.add_node("impact_mapping", run_impact_mapping)
 
@@ -89,12 +112,19 @@ def build_end_to_end_pipeline():
     graph.add_edge("ingestion", "deduplication")
     graph.add_edge("deduplication", "entity_extraction")
     graph.add_edge("entity_extraction", "impact_mapping")
-    graph.add_edge("impact_mapping", END)
+    graph.add_edge("impact_mapping", "index_update")
+    graph.add_edge("index_update", END)
 
     return graph.compile()
 
 if __name__ == "__main__":
-    # run on CLI using "python -m src.pipelines.linear_pipeline"
+    # run on CLI using "python -m src.pipelines.linear_pipeline [--full-rebuild]"
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--full-rebuild", action="store_true",
+                        help="ignore stage watermarks and reprocess every row")
+    parser.add_argument("--ner-workers", type=int, default=NER_WORKERS,
+                        help="processes used for entity extraction")
+    args = parser.parse_args()
 
     pipeline = build_end_to_end_pipeline()
 
@@ -113,7 +143,9 @@ if __name__ == "__main__":
             "https://www.etnownews.com/feeds/gns-etn-companies.xml",
             "https://www.cnbctv18.com/commonfeeds/v1/cne/rss/business.xml"
         ],
-        "info": {}
+        "info": {},
+        "full_rebuild": args.full_rebuild,
+        "ner_workers": args.ner_workers
     })
 
     print("Pipeline Completed")
\ No newline at end of file
@@ -1,11 +1,12 @@
 from .rewriter import LocalLLM
+from src.utils.model_loader import MODELS
 from src.utils.entity_utils import match_rules, postprocess_entities
 from src.utils.impact_mapping import load_mapping, compute_impacts_for_entities
 
 class QueryProcessor:
     def __init__(self):
         self.model_path = "C:/Users/aktkr/financial-news-intelligence/models"
-        self.llm = LocalLLM(model_path=self.model_path)
+        self.llm = MODELS.get("llm:phi-2.Q4_0", lambda: LocalLLM(model_path=self.model_path))
 
     def process(self, user_query: str) -> dict:
         """
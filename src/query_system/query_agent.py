@@ -2,6 +2,7 @@ from typing import TypedDict, List, Dict
 from langgraph.graph import StateGraph, START, END
 from .llm.processor import QueryProcessor
 from .search.retriever import Retriever
+from src.utils.model_loader import MODELS
 
 class QueryState(TypedDict):
     user_query: str
@@ -11,7 +12,9 @@ class QueryState(TypedDict):
     context: str
     response: str
 
-processor = QueryProcessor()
+MODELS.register("query_processor", QueryProcessor)
+MODELS.register("retriever", Retriever)
+
 def understand_query(state: QueryState) -> QueryState:
     """
     Takes raw  user query and extracts
@@ -22,14 +25,14 @@ def understand_query(state: QueryState) -> QueryState:
         - sector/industry
     """
     user_q = state["user_query"]
-    structured = processor.process(user_q)
+    structured = MODELS.get("query_processor").process(user_q)
     state["restruc_query"] = structured
     print(f"[Query Agent] Query restructured successfully!")
     return state
 
-retriever = Retriever()
 def context_retriever(state: QueryState) -> QueryState:
     """Fetch relevant data from the restructured query"""
+    retriever = MODELS.get("retriever")
     restructured_q = state["restruc_query"]
     mapped_assets = retriever.map_query_to_assets(restructured_q)
 
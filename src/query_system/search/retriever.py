@@ -1,17 +1,22 @@
 # src/search/retriever.py
 import json
+import time
 from psycopg2.extras import RealDictCursor
 from typing import List, Dict, Any, Optional
 from ...core.embedding_index import EmbeddingIndex
 from src.core.database import (
     fetch_stories_by_sector,
+    fetch_stories_by_entities,
     fetch_stories_by_ids,
     fetch_all_unique_comp_stories
 )
-from src.utils.impact_mapping import load_mapping
+from src.utils.impact_mapping import load_mapping, load_mapping_bundle
 
 company_to_symbol, symbol_to_sector, regulator_rules, policy_rules, sector_to_symbols, symbol_to_company = load_mapping()
 
+# how far back semantic search looks for each extracted time horizon (None: no limit)
+TIME_HORIZON_DAYS = {"short": 30, "medium": 180, "long": None}
+
 class Retriever:
     def __init__(self, model_name=None):
         self.idx = EmbeddingIndex()
@@ -49,18 +54,8 @@ class Retriever:
 
         ents = [e.lower().strip() for e in ents]
 
-        # Build fuzzy lookup
-        company_fuzzy = {}
-        for full_name, symbol in company_to_symbol.items():
-            key = full_name.lower().strip()
-            company_fuzzy[key] = symbol
-            
-            # Also support versions without "limited", "ltd"
-            short = key.replace("limited", "").replace("ltd", "").strip()
-            company_fuzzy[short] = symbol
-            
-            tokens = short.split()
-            company_fuzzy[" ".join(tokens[:2])] = symbol
+        # lower-case / "limited"-less / two-token aliases, precompiled with the mappings
+        company_fuzzy = load_mapping_bundle()["company_aliases"]
 
 
         if qtype == "company":
@@ -117,21 +112,8 @@ class Retriever:
         if not rule:
             return []
 
-        sectors = rule.get("sectors", [])
-        combined = []
-
-        for sec in sectors:
-            rows = fetch_stories_by_sector(sec, limit=limit)
-            combined.extend(rows)
-
-        # dedupe by id
-        seen = set()
-        out = []
-        for r in combined:
-            if r["id"] not in seen:
-                seen.add(r["id"])
-                out.append(r)
-        return out
+        # one index lookup over all the regulator's sectors; a story is returned once
+        return fetch_stories_by_entities("sectors", rule.get("sectors", []), limit=limit)
     
     def stories_for_company_symbol(self, company_symbol: str):
         comp = symbol_to_company.get(company_symbol)
@@ -152,12 +134,29 @@ class Retriever:
         return rows
 
 
+    def semantic_filters(self, structured: Dict[str, Any], mapped: Dict[str, List[str]]) -> Dict[str, Any]:
+        """Index filters implied by the query: a time window from time_horizon plus its sectors or companies."""
+        filters: Dict[str, Any] = {}
+        days = TIME_HORIZON_DAYS.get(structured.get("time_horizon"))
+        if days:
+            filters["since"] = int(time.time()) - days * 86400
+        qtype = structured.get("query_type")
+        if qtype == "company" and mapped.get("symbols"):
+            filters["symbols"] = mapped["symbols"]
+        elif qtype in ("sector", "regulator", "policy") and mapped.get("sectors"):
+            # the index resolves each name to its sector_to_symbols key; a rule covering "All"
+            # sectors does not narrow the search
+            if not any(sec.strip().lower() == "all" for sec in mapped["sectors"]):
+                filters["sectors"] = mapped["sectors"]
+        return filters
+
     # semantic retrieval using embeddings: returns stories with scores
-    def semantic_search(self, query_text: str, top_k: int = 10) -> List[Dict]:
+    def semantic_search(self, query_text: str, top_k: int = 10, filters: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """filters: since/until/sectors/symbols, applied inside the index search (see EmbeddingIndex.query)."""
         if self.idx is None:
             raise RuntimeError("Embedding index not built. Call ensure_index(...) first.")
 
-        hits = self.idx.query(query_text, top_k=top_k)
+        hits = self.idx.query(query_text, top_k=top_k, **(filters or {}))
         ids = [h["id"] for h in hits]
 
         rows = fetch_stories_by_ids(ids)
@@ -191,7 +190,12 @@ class Retriever:
         semantic_hits = []
         semantic_score_map = {}
         if use_semantic:
-            semantic_hits = self.semantic_search(structured["rewritten"], top_k=top_k)
+            filters = self.semantic_filters(structured, mapped)
+            semantic_hits = self.semantic_search(structured["rewritten"], top_k=top_k, filters=filters)
+            if not semantic_hits and filters:
+                # no indexed story matches (e.g. none recent, or a sector outside the vocabulary);
+                # an unfiltered top-k would answer a different question
+                print(f"[Query Agent] No indexed stories match the filters {sorted(filters)}; no semantic results.")
             semantic_score_map = {item["id"]: item["score"] for item in semantic_hits}
             results.extend(semantic_hits)
 
@@ -1,11 +1,29 @@
-from .model_loader import load_local_or_download
+from .model_loader import load_local_or_download, get_ner_pipeline, get_sentence_transformer, MODELS
 from .entity_utils import match_rules, postprocess_entities
-from .impact_mapping import load_mapping, compute_impacts_for_entities
+from .impact_mapping import load_mapping, canonical_sector, compute_impacts_for_entities, compute_impacts_batch
+from .company_matcher import CompanyMatcher, get_company_matcher
+from .clustering import cluster_embeddings
+from .ner_engine import run_batched_ner
+from .minhash import lexical_groups
+from .rss_fetcher import fetch_feeds, load_feed_state, save_feed_state
 
 __all__ = [
     "load_local_or_download",
+    "get_ner_pipeline",
+    "get_sentence_transformer",
+    "MODELS",
     "match_rules", 
     "postprocess_entities",
     "load_mapping", 
-    "compute_impacts_for_entities"
+    "canonical_sector",
+    "compute_impacts_for_entities",
+    "compute_impacts_batch",
+    "CompanyMatcher",
+    "get_company_matcher",
+    "cluster_embeddings",
+    "run_batched_ner",
+    "lexical_groups",
+    "fetch_feeds",
+    "load_feed_state",
+    "save_feed_state"
 ]
\ No newline at end of file
@@ -0,0 +1,137 @@
+import os
+import numpy as np
+from email.utils import parsedate_to_datetime
+from datetime import datetime
+from typing import List, Optional
+from src.core.ann_index import resolve_params, build_index, search_params
+
+try:
+    import faiss
+    _HAS_FAISS = True
+except Exception:
+    faiss = None
+    _HAS_FAISS = False
+
+# above this many vectors the exact flat range search is replaced by IVF
+IVF_MIN_VECTORS = int(os.getenv("DEDUP_IVF_MIN_VECTORS", "50000"))
+IVF_NPROBE = int(os.getenv("DEDUP_IVF_NPROBE", "16"))
+SEARCH_BLOCK = 4096
+
+
+def parse_published_at(value) -> float:
+    """Best-effort epoch seconds for an RSS published_at string; NaN when unparseable."""
+    if value is None:
+        return np.nan
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return parsedate_to_datetime(str(value)).timestamp()
+    except Exception:
+        pass
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except Exception:
+        return np.nan
+
+def _normalize(emb: np.ndarray) -> np.ndarray:
+    emb = np.ascontiguousarray(emb, dtype="float32")
+    norms = np.linalg.norm(emb, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return emb / norms
+
+def _build_index(emb: np.ndarray, index_type: str):
+    """
+    Range-searchable index over `emb` (labels are row numbers) from the shared ann_index
+    factory, which keeps a flat index until there are enough vectors to train IVF lists.
+    Returns (index, search params).
+    """
+    if index_type == "auto":
+        index_type = "ivf" if len(emb) >= IVF_MIN_VECTORS else "flat"
+    if index_type not in ("flat", "ivf"):
+        raise ValueError(f"Unknown index_type: {index_type}")
+    index, _ = build_index(emb, np.arange(len(emb), dtype=np.int64), resolve_params(index_type, nlist=0, nprobe=IVF_NPROBE))
+    return index, search_params(index, nprobe=IVF_NPROBE)
+
+def similar_pairs(emb: np.ndarray, threshold: float, index_type: str = "auto"):
+    """
+    All (i, j) pairs with i < j and cosine similarity > threshold.
+    Uses FAISS range search in blocks (tiled numpy matmul when FAISS is unavailable).
+    """
+    emb = _normalize(emb)
+    n = len(emb)
+    src_parts, dst_parts = [], []
+
+    if _HAS_FAISS:
+        index, params = _build_index(emb, index_type)
+        for start in range(0, n, SEARCH_BLOCK):
+            lims, _, I = index.range_search(emb[start:start+SEARCH_BLOCK], threshold, params=params)
+            rows = np.repeat(np.arange(start, start + len(lims) - 1), np.diff(lims).astype(np.int64))
+            src_parts.append(rows)
+            dst_parts.append(I.astype(np.int64))
+    else:
+        # square tiles over the upper triangle only: memory stays at SEARCH_BLOCK^2
+        # whatever n is, and each tile keeps just its above-threshold pairs
+        for start in range(0, n, SEARCH_BLOCK):
+            rows = emb[start:start+SEARCH_BLOCK]
+            for col in range(start, n, SEARCH_BLOCK):
+                r, c = np.nonzero(rows @ emb[col:col+SEARCH_BLOCK].T > threshold)
+                src_parts.append(r + start)
+                dst_parts.append(c + col)
+
+    if not src_parts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    src = np.concatenate(src_parts).astype(np.int64)
+    dst = np.concatenate(dst_parts).astype(np.int64)
+    keep = src < dst
+    return src[keep], dst[keep]
+
+def connected_components(n: int, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """
+    Vectorized union-find: hooks the larger root under the smaller one for every edge,
+    then compresses paths until all edges agree. Returns the root (smallest member) of each node.
+    """
+    parent = np.arange(n, dtype=np.int64)
+    if len(src) == 0:
+        return parent
+
+    while True:
+        rs, rd = parent[src], parent[dst]
+        differ = rs != rd
+        if not differ.any():
+            return parent
+        lo = np.minimum(rs[differ], rd[differ])
+        hi = np.maximum(rs[differ], rd[differ])
+        np.minimum.at(parent, hi, lo)
+        # path compression until every node points at a root
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+
+def cluster_embeddings(emb: np.ndarray,
+                       threshold: float = 0.80,
+                       timestamps: Optional[np.ndarray] = None,
+                       time_window: Optional[float] = None,
+                       index_type: str = "auto") -> List[List[int]]:
+    """
+    Groups rows of `emb` into clusters: connected components of the graph whose edges are
+    pairs with cosine > threshold (and, if given, published within `time_window` seconds).
+    The result does not depend on input order; clusters are ordered by their smallest member.
+    """
+    n = len(emb)
+    if n == 0:
+        return []
+
+    src, dst = similar_pairs(emb, threshold, index_type=index_type)
+    if time_window is not None and timestamps is not None and len(src):
+        ts = np.asarray(timestamps, dtype="float64")
+        gap = np.abs(ts[src] - ts[dst])
+        # articles without a parseable date are not constrained by the window
+        keep = np.isnan(gap) | (gap <= time_window)
+        src, dst = src[keep], dst[keep]
+
+    roots = connected_components(n, src, dst)
+    order = np.argsort(roots, kind="stable")
+    boundaries = np.flatnonzero(np.diff(roots[order])) + 1
+    return [g.tolist() for g in np.split(order, boundaries)]
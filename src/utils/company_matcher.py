@@ -0,0 +1,101 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Set
+
+try:
+    from rapidfuzz import process, fuzz
+    _HAS_RAPIDFUZZ = True
+except Exception:
+    _HAS_RAPIDFUZZ = False
+
+_TOKEN_RE = re.compile(r"[a-z0-9&]+")
+_BLOCK_PREFIX = 4
+# block keys shared by more than this fraction of names ("limited", "india", "industries") do not block
+_STOP_FRACTION = 0.02
+
+
+def _normalize(name: str) -> str:
+    return " ".join((name or "").strip().split()).lower()
+
+def _block_keys(name_norm: str) -> Set[str]:
+    """Token prefixes, so "bank"/"banking" and most typos past the 4th character still collide."""
+    return {t[:_BLOCK_PREFIX] for t in _TOKEN_RE.findall(name_norm)}
+
+
+class CompanyMatcher:
+    """
+    Company name -> symbol resolver compiled once from company_to_symbol.json.
+    Exact and case-insensitive hits are hash lookups; otherwise only names sharing a
+    (non-stopword) token prefix with the query are fuzzy-scored. Resolutions are memoized.
+    """
+    def __init__(self, company_to_symbol: Dict[str, str], score_threshold: int = 80, cache_size: int = 65536):
+        self.company_to_symbol = company_to_symbol
+        self.score_threshold = score_threshold
+        self.names: List[str] = list(company_to_symbol)
+        self.names_norm: List[str] = [_normalize(n) for n in self.names]
+
+        self._exact: Dict[str, str] = {}
+        for name, name_norm in zip(self.names, self.names_norm):
+            # first key wins, like the dict-order scan it replaces
+            self._exact.setdefault(name_norm, company_to_symbol[name])
+
+        postings: Dict[str, List[int]] = {}
+        for i, name_norm in enumerate(self.names_norm):
+            for key in _block_keys(name_norm):
+                postings.setdefault(key, []).append(i)
+        stop_df = max(20, int(_STOP_FRACTION * len(self.names)))
+        self._postings = postings
+        self._stop_keys = {k for k, ids in postings.items() if len(ids) > stop_df}
+
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def candidates(self, name_norm: str) -> List[int]:
+        """Indices (in key order) of the names that share a block key with `name_norm`."""
+        keys = _block_keys(name_norm)
+        selective = keys - self._stop_keys
+        ids: Set[int] = set()
+        for key in (selective or keys):
+            ids.update(self._postings.get(key, ()))
+        return sorted(ids)
+
+    def exact(self, name: str) -> Optional[str]:
+        if name in self.company_to_symbol:
+            return self.company_to_symbol[name]
+        return self._exact.get(_normalize(name))
+
+    def _resolve(self, name: str) -> Optional[str]:
+        if not name:
+            return None
+        sym = self.exact(name)
+        if sym:
+            return sym
+
+        name_norm = _normalize(name)
+        ids = self.candidates(name_norm)
+        if not ids:
+            return None
+        if _HAS_RAPIDFUZZ:
+            best = process.extractOne(
+                name_norm, {i: self.names_norm[i] for i in ids},
+                scorer=fuzz.WRatio, score_cutoff=self.score_threshold
+            )
+            return self.company_to_symbol[self.names[best[2]]] if best else None
+        for i in ids:
+            cname = self.names_norm[i]
+            if name_norm in cname or cname in name_norm:
+                return self.company_to_symbol[self.names[i]]
+        return None
+
+    def cache_info(self):
+        return self.resolve.cache_info()
+
+
+_MATCHER: Dict[str, object] = {"source": None, "threshold": None, "matcher": None}
+
+def get_company_matcher(company_to_symbol: Dict[str, str], score_threshold: int = 80) -> CompanyMatcher:
+    """Matcher for this mapping, compiled on first use and reused while the same dict is passed."""
+    if _MATCHER["source"] is not company_to_symbol or _MATCHER["threshold"] != score_threshold:
+        _MATCHER["matcher"] = CompanyMatcher(company_to_symbol, score_threshold=score_threshold)
+        _MATCHER["source"] = company_to_symbol
+        _MATCHER["threshold"] = score_threshold
+    return _MATCHER["matcher"]
@@ -0,0 +1,83 @@
+import os, json, sqlite3, hashlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable
+
+ENTITY_CACHE_PATH = Path(os.getenv("ENTITY_CACHE_PATH", "data/entity_cache.sqlite"))
+ENTITY_CACHE_ENABLED = os.getenv("ENTITY_CACHE", "1").lower() not in ("0", "false", "no")
+_SQLITE_VARS = 900  # stay under SQLITE_MAX_VARIABLE_NUMBER on old builds
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+def _to_jsonable(obj):
+    """NER pipelines return numpy scalars; turn them into plain Python numbers."""
+    if isinstance(obj, dict):
+        return {k: _to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_jsonable(v) for v in obj]
+    if hasattr(obj, "item") and callable(obj.item):
+        return obj.item()
+    return obj
+
+
+class EntityCache:
+    """
+    Persistent (namespace, version, text hash) -> JSON cache for extraction results,
+    stored in a local SQLite file. `version` should change whenever the model, the
+    gazetteer or the extraction code changes, which makes old entries unreachable.
+    """
+    def __init__(self, path: Path = ENTITY_CACHE_PATH, enabled: bool = ENTITY_CACHE_ENABLED):
+        self.path = Path(path)
+        self.enabled = enabled
+        if self.enabled:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL;")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS entity_cache (
+                        namespace TEXT NOT NULL,
+                        version TEXT NOT NULL,
+                        text_hash TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        PRIMARY KEY (namespace, version, text_hash)
+                    );
+                    """
+                )
+
+    @contextmanager
+    def _connect(self):
+        # timeout: NER worker processes write to the same file
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, namespace: str, version: str, hashes: Iterable[str]) -> Dict[str, Any]:
+        hashes = list(dict.fromkeys(hashes))
+        if not self.enabled or not hashes:
+            return {}
+        found = {}
+        with self._connect() as conn:
+            for i in range(0, len(hashes), _SQLITE_VARS):
+                part = hashes[i:i+_SQLITE_VARS]
+                placeholders = ",".join("?" for _ in part)
+                rows = conn.execute(
+                    f"SELECT text_hash, value FROM entity_cache WHERE namespace = ? AND version = ? AND text_hash IN ({placeholders})",
+                    [namespace, version, *part],
+                ).fetchall()
+                found.update({h: json.loads(v) for h, v in rows})
+        return found
+
+    def put_many(self, namespace: str, version: str, items: Dict[str, Any]):
+        if not self.enabled or not items:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO entity_cache (namespace, version, text_hash, value) VALUES (?, ?, ?, ?)",
+                [(namespace, version, h, json.dumps(_to_jsonable(v))) for h, v in items.items()],
+            )
@@ -1,12 +1,18 @@
-import re, json, numpy as np
+import re, json, hashlib, numpy as np
 from pathlib import Path
 from typing import List, Dict
+from .gazetteer_matcher import GazetteerMatcher
 
 gazetteer_path = Path("assets/fin_gazetteers.json")
 
 with open(gazetteer_path, "r") as f:
     GAZ = json.load(f)
 
+# bump RULES_VERSION when match_rules/postprocess_entities change behaviour;
+# GAZ_VERSION keys cached rule results to both the code and the gazetteer contents
+RULES_VERSION = "2"
+GAZ_VERSION = RULES_VERSION + ":" + hashlib.sha256(gazetteer_path.read_bytes()).hexdigest()[:16]
+
 # print(GAZ)
 # print("Works fine!!")
 
@@ -18,6 +24,16 @@ KPI_TERMS = [x.lower() for x in GAZ["kpi_terms"]]
 COMPANIES_CUSTOM = [x.lower() for x in GAZ["companies_custom"]]
 PRODUCTS = [x.lower() for x in GAZ["products"]]
 
+# compiled once: one pass over the text finds every gazetteer category
+GAZ_MATCHER = GazetteerMatcher({
+    "indices": INDICES,
+    "sectors": SECTORS,
+    "regulators": REGULATORS,
+    "financial_terms": FIN_TERMS,
+    "companies_custom": COMPANIES_CUSTOM,
+    "products": PRODUCTS,
+})
+
 MONEY_REGEX = re.compile(r"(₹\s?\d+[\d,]*(?:\.\d+)?|\b\d+(\.\d+)?\s?(crore|lakh|million|billion))", re.I)
 PERCENT_REGEX = re.compile(r"(\b\d+(\.\d+)?\s?%)")
 KPI_REGEX = re.compile(r"\b(Q[1-4]\s?(results|earnings)|EBITDA|PAT|EPS|Revenue|Profit)\b", re.I)
@@ -35,36 +51,20 @@ def normalize(items):
     return out
 
 def longest_match_gazetteer(text: str, entity_list: List):
-    """Returns a list of matched phrases using longest-match-first logic."""
-    text_lower = text.lower()
-    matches = []
-    occupied = [False]*len(text_lower)
-    sorted_list = sorted(entity_list, key=lambda x: -len(x))
-
-    for entity in sorted_list:
-        e_low = entity.lower()
-        start_idx = text_lower.find(e_low)
-        while start_idx != -1:
-            end_idx = start_idx + len(e_low)
-            if not any(occupied[start_idx:end_idx]):
-                matches.append(entity)
-
-                for i in range(start_idx, end_idx):
-                    occupied[i] = True
-
-            start_idx = text_lower.find(e_low, start_idx + 1)
-    return list(set(matches))
+    """Returns a list of matched phrases using leftmost-longest, word-bounded matching."""
+    matcher = GazetteerMatcher({"entities": entity_list})
+    return matcher.match(text)["entities"]
 
 def match_rules(text):
-    tl = text.lower()
+    gaz = GAZ_MATCHER.match(text)
 
     return {
-        "indices": normalize(longest_match_gazetteer(text, INDICES)),
-        "sectors": normalize([s for s in SECTORS if s in tl]),
-        "regulators": normalize([r for r in REGULATORS if r in tl]),
-        "policies": normalize([t for t in FIN_TERMS if t in tl]),
-        "custom_companies": normalize([c for c in COMPANIES_CUSTOM if c in tl]),
-        "products": normalize([p for p in PRODUCTS if p in tl]),
+        "indices": normalize(gaz["indices"]),
+        "sectors": normalize(gaz["sectors"]),
+        "regulators": normalize(gaz["regulators"]),
+        "policies": normalize(gaz["financial_terms"]),
+        "custom_companies": normalize(gaz["companies_custom"]),
+        "products": normalize(gaz["products"]),
         "kpis": normalize([m.group(0) for m in KPI_REGEX.finditer(text)]),
         "money": normalize([m.group(0) for m in MONEY_REGEX.finditer(text)]),
         "percent": normalize([m.group(0) for m in PERCENT_REGEX.finditer(text)])
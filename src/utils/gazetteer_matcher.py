@@ -0,0 +1,118 @@
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class GazetteerMatcher:
+    """
+    Aho-Corasick automaton over every gazetteer phrase of every category.
+    Built once; `match` then finds all categories in a single linear pass over the
+    lower-cased text, keeping only matches on word boundaries and resolving overlaps
+    leftmost-longest within each category.
+    """
+    def __init__(self, gazetteer: Dict[str, Iterable[str]]):
+        self.categories = list(gazetteer)
+        self.patterns: List[str] = []
+        pattern_ids: Dict[str, int] = {}
+        # categories each (lower-cased) pattern belongs to
+        self.pattern_categories: List[List[str]] = []
+
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        own_out: Dict[int, List[int]] = {}
+        for category, phrases in gazetteer.items():
+            for phrase in phrases:
+                p = (phrase or "").strip().lower()
+                if not p:
+                    continue
+                pid = pattern_ids.get(p)
+                if pid is None:
+                    pid = pattern_ids[p] = len(self.patterns)
+                    self.patterns.append(p)
+                    self.pattern_categories.append([])
+                    own_out.setdefault(self._insert(p), []).append(pid)
+                if category not in self.pattern_categories[pid]:
+                    self.pattern_categories[pid].append(category)
+
+        for state, pids in own_out.items():
+            self._out[state] = tuple(pids)
+        self._build_failure_links()
+
+    def _insert(self, pattern: str) -> int:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        return state
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                # inherit matches that end here through the failure chain
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def find_all(self, text: str) -> List[Tuple[int, int, int]]:
+        """All word-bounded (start, end, pattern_id) occurrences in `text`."""
+        tl = (text or "").lower()
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        n = len(tl)
+        hits = []
+        state = 0
+        for i, ch in enumerate(tl):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = i + 1
+            if end < n and _is_word_char(tl[end]):
+                continue
+            for pid in out[state]:
+                start = end - len(patterns[pid])
+                if start > 0 and _is_word_char(tl[start - 1]):
+                    continue
+                hits.append((start, end, pid))
+        return hits
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """{category: [matched phrases]} with leftmost-longest, non-overlapping matches per category."""
+        per_category: Dict[str, List[Tuple[int, int, int]]] = {c: [] for c in self.categories}
+        for hit in self.find_all(text):
+            for category in self.pattern_categories[hit[2]]:
+                per_category[category].append(hit)
+
+        result = {}
+        for category, hits in per_category.items():
+            hits.sort(key=lambda h: (h[0], -(h[1] - h[0])))
+            chosen, seen, last_end = [], set(), -1
+            for start, end, pid in hits:
+                if start < last_end:
+                    continue
+                last_end = end
+                if pid not in seen:
+                    seen.add(pid)
+                    chosen.append(self.patterns[pid])
+            result[category] = chosen
+        return result
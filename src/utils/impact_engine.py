@@ -0,0 +1,216 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+GROUP_FLAGS = ("sector", "regulatory", "policy", "index")
+_ALL_SECTORS = "__all__"
+
+
+def _normalize_name(name: str) -> str:
+    if not name:
+        return ""
+    return " ".join(name.strip().split()).lower()
+
+
+class ImpactEngine:
+    """
+    Batch impact mapping over precomputed symbol-group bitsets.
+
+    Every symbol list a rule can expand to (a sector, "All", an index) is one row of a
+    boolean (groups x symbols) matrix. Regulators and policies resolve to lists of those
+    rows once, at build time. A story's flags for every symbol are then the OR of the
+    rows its sources touch, packed as one 4-bit code per symbol, so the cost of a story
+    no longer depends on how many symbols its sectors or policies cover. Working memory
+    is one byte per (story, symbol) of the batch; callers chunk large batches.
+
+    Output matches compute_impacts_for_entities, including the order of symbols and flags.
+    """
+    def __init__(self, company_to_symbol: Dict[str, str], symbol_to_sector: Dict[str, Dict],
+                 regulator_rules: Dict[str, Dict], policy_rules: Dict[str, Dict],
+                 sector_to_symbols: Dict[str, List[str]], index_to_symbols: Optional[Dict[str, List[str]]] = None,
+                 scores: Optional[Dict[str, float]] = None, priority_order: Sequence[str] = ()):
+        from .impact_mapping import SCORES, PRIORITY_ORDER
+        self.company_to_symbol = company_to_symbol or {}
+        self.regulator_rules = regulator_rules or {}
+        self.policy_rules = policy_rules or {}
+        self.scores = scores or SCORES
+        self.priority_order = list(priority_order or PRIORITY_ORDER)
+        symbol_to_sector = symbol_to_sector or {}
+        sector_to_symbols = sector_to_symbols or {}
+        index_to_symbols = index_to_symbols or {}
+
+        self.symbols: List[str] = []
+        self._sym_idx: Dict[str, int] = {}
+        for sym in list(symbol_to_sector) + [s for syms in sector_to_symbols.values() for s in syms] \
+                + [s for syms in index_to_symbols.values() for s in syms] + list(self.company_to_symbol.values()):
+            self._symbol_id(sym)
+
+        # groups: ordered symbol lists, plus the raw list length the summaries report
+        self._group_ids: Dict[Tuple[str, str], int] = {}
+        group_lists: List[List[int]] = []
+        self._group_sizes: List[int] = []
+
+        def add_group(kind: str, key: str, syms: List[str]):
+            self._group_ids[(kind, key)] = len(group_lists)
+            group_lists.append([self._sym_idx[s] for s in syms])
+            self._group_sizes.append(len(syms))
+
+        for key, syms in sector_to_symbols.items():
+            add_group("sector", key, syms)
+        add_group("sector", _ALL_SECTORS, list(symbol_to_sector))
+        for key, syms in index_to_symbols.items():
+            add_group("index", key, syms)
+
+        self._templates: Dict[Tuple[Tuple[str, ...], int], Tuple] = {}
+        n_groups, n_symbols = len(group_lists), len(self.symbols)
+        self.membership = np.zeros((n_groups, n_symbols), dtype=bool)
+        # position of each symbol in its group's list, which fixes the output order
+        self.position = np.full((n_groups, n_symbols), n_symbols, dtype=np.int64)
+        for g, members in enumerate(group_lists):
+            for pos, s in reversed(list(enumerate(members))):
+                self.membership[g, s] = True
+                self.position[g, s] = pos
+
+    def _symbol_id(self, sym: str) -> int:
+        idx = self._sym_idx.get(sym)
+        if idx is None:
+            idx = self._sym_idx[sym] = len(self.symbols)
+            self.symbols.append(sym)
+        return idx
+
+    def _sector_group(self, sector_key: str) -> Optional[int]:
+        g = self._group_ids.get(("sector", sector_key))
+        return g if g is not None and self._group_sizes[g] else None
+
+    def _story_sources(self, entities: Dict[str, Any]) -> Tuple[List[Tuple[str, int]], List[str]]:
+        """(flag, group) pairs in the order the rules touch them, plus the non-company summary parts."""
+        sources, summary = [], []
+
+        for sec in entities.get("sectors", []) or []:
+            g = self._sector_group(_normalize_name(sec))
+            if g is not None:
+                sources.append(("sector", g))
+                summary.append(f"Sector {sec} impacted ({self._group_sizes[g]} stocks).")
+
+        for reg in entities.get("regulators", []) or []:
+            rkey = _normalize_name(reg)
+            rule = self.regulator_rules.get(rkey) or self.regulator_rules.get(rkey.lower()) or self.regulator_rules.get(rkey.upper())
+            if rule:
+                sec_list = rule.get("sectors", [])
+                for sec in sec_list:
+                    g = self._sector_group(sec.lower())
+                    if g is not None:
+                        sources.append(("regulatory", g))
+                summary.append(f"Regulator {reg} triggers impact on sectors {sec_list}.")
+
+        for pol in entities.get("policies", []) or []:
+            pkey = _normalize_name(pol)
+            rule = self.policy_rules.get(pkey) or self.policy_rules.get(pkey.lower())
+            if rule:
+                sectors = rule.get("sectors", [])
+                for sec in sectors:
+                    g = self._sector_group(_ALL_SECTORS if sec == "All" else sec.lower())
+                    if g is not None:
+                        sources.append(("policy", g))
+                summary.append(f"Policy {pol} impacts sectors {sectors}.")
+
+        for idx in entities.get("indices", []) or []:
+            g = self._group_ids.get(("index", _normalize_name(idx)))
+            if g is not None and self._group_sizes[g]:
+                sources.append(("index", g))
+                summary.append(f"Index {idx} impacts {self._group_sizes[g]} stocks.")
+
+        return sources, summary
+
+    def _company_flags(self, entities: Dict[str, Any]) -> Tuple[Dict[int, List[str]], List[str]]:
+        from .impact_mapping import fuzzy_match_company
+        flags: Dict[int, List[str]] = {}
+        summary = []
+        for comp in entities.get("companies", []) or []:
+            if comp in self.company_to_symbol:
+                sym = self.company_to_symbol[comp]
+                new_flags = ["direct"]
+                summary.append(f"{comp} directly mentioned.")
+            else:
+                sym = fuzzy_match_company(comp, self.company_to_symbol)
+                if not sym:
+                    continue
+                new_flags = ["gazetteer", "direct"]
+                summary.append(f"{comp} matched via fuzzy lookup → {sym}.")
+            current = flags.setdefault(self._symbol_id(sym), [])
+            current.extend(f for f in new_flags if f not in current)
+        return flags, summary
+
+    def compute_batch(self, entities_list: List[Dict[str, Any]]) -> List[Tuple[List[Dict[str, Any]], str]]:
+        """(impacts, summary) for each entities dict, as compute_impacts_for_entities returns them."""
+        if not entities_list:
+            return []
+        per_story = [(self._company_flags(e), self._story_sources(e)) for e in entities_list]
+
+        # symbols first seen while resolving companies may be new; grow the matrices to match
+        n_symbols = len(self.symbols)
+        if n_symbols > self.membership.shape[1]:
+            extra = n_symbols - self.membership.shape[1]
+            self.membership = np.pad(self.membership, ((0, 0), (0, extra)))
+            self.position = np.pad(self.position, ((0, 0), (0, extra)), constant_values=n_symbols)
+
+        # flag combination of every (story, symbol) as a 4-bit code, in GROUP_FLAGS order
+        codes = np.zeros((len(entities_list), n_symbols), dtype=np.uint8)
+        bit_of = {flag: bit for bit, flag in enumerate(GROUP_FLAGS)}
+        for b, (_, (sources, _)) in enumerate(per_story):
+            by_flag: Dict[str, List[int]] = {}
+            for flag, g in sources:
+                by_flag.setdefault(flag, []).append(g)
+            for flag, groups in by_flag.items():
+                codes[b] |= self.membership[groups].any(axis=0).astype(np.uint8) << bit_of[flag]
+
+        out = []
+        for b, ((company_flags, company_summary), (sources, source_summary)) in enumerate(per_story):
+            order = list(company_flags)
+            if sources:
+                groups = np.array([g for _, g in sources], dtype=np.int64)
+                # first touch of each symbol: the earliest source containing it, then its list position
+                rank = np.where(
+                    self.membership[groups],
+                    np.arange(len(groups))[:, None] * (n_symbols + 1) + self.position[groups],
+                    np.iinfo(np.int64).max,
+                ).min(axis=0)
+                if order:
+                    rank[order] = -1
+                hit = np.flatnonzero(codes[b])
+                rest = hit[np.argsort(rank[hit], kind="stable")]
+                order += rest[rank[rest] >= 0].tolist()
+
+            results = []
+            for s, code in zip(order, codes[b, order].tolist()):
+                flags, primary, confidence = self._flag_template(tuple(company_flags.get(s, ())), code)
+                results.append({"symbol": self.symbols[s], "confidence": confidence, "type": primary, "flags": list(flags)})
+
+            if not results:
+                out.append(([], "No significant impact detected."))
+                continue
+            parts = company_summary + source_summary
+            out.append((results, " ".join(parts) if parts else "No significant impact detected."))
+        return out
+
+    def _flag_template(self, company_flags: Tuple[str, ...], code: int):
+        """(flags, primary type, confidence) of one flag combination; there are only a few dozen."""
+        key = (company_flags, code)
+        template = self._templates.get(key)
+        if template is None:
+            flags = company_flags + tuple(f for bit, f in enumerate(GROUP_FLAGS) if code >> bit & 1)
+            primary = next((t for t in self.priority_order if t in flags), "semantic")
+            template = self._templates[key] = (flags, primary, round(self.scores.get(primary, 0.4), 3))
+        return template
+
+
+_ENGINE: Dict[str, Any] = {"sources": None, "engine": None}
+
+def get_impact_engine(company_to_symbol, symbol_to_sector, regulator_rules, policy_rules,
+                      sector_to_symbols, index_to_symbols=None) -> ImpactEngine:
+    """Engine for these mappings, built on first use and reused while the same dicts are passed."""
+    sources = (company_to_symbol, symbol_to_sector, regulator_rules, policy_rules, sector_to_symbols, index_to_symbols)
+    cached = _ENGINE["sources"]
+    if cached is None or any(a is not b for a, b in zip(cached, sources)):
+        _ENGINE["engine"] = ImpactEngine(*sources)
+        _ENGINE["sources"] = sources
+    return _ENGINE["engine"]
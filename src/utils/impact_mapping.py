@@ -1,13 +1,10 @@
 import os, json
-from collections import defaultdict
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from pathlib import Path
 
-try:
-    from rapidfuzz import process, fuzz
-    _HAS_RAPIDFUZZ = True
-except Exception:
-    _HAS_RAPIDFUZZ = False
+from .company_matcher import get_company_matcher
+from .mapping_artifact import load_compiled_mappings
+from .impact_engine import get_impact_engine
 
 ASSETS_DIR = Path("assets")
 COMPANY_TO_SYMBOL_PATH = os.path.join(ASSETS_DIR, "company_to_symbol.json")
@@ -16,6 +13,7 @@ SECTOR_TO_SYMBOLS_PATH = os.path.join(ASSETS_DIR, "sector_to_symbols.json")
 REGULATOR_RULES_PATH = os.path.join(ASSETS_DIR, "regulator_impact_rules.json")
 POLICY_RULES_PATH = os.path.join(ASSETS_DIR, "policy_impact_rules.json")
 SYMBOL_TO_COMPANY_PATH = os.path.join(ASSETS_DIR, "symbol_to_company.json")
+SECTOR_ALIASES_PATH = os.path.join(ASSETS_DIR, "sector_aliases.json")
 # print("All paths are correct!")
 
 SCORES = {
@@ -37,51 +35,44 @@ def load_safe_json(path: str) -> Dict:
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
     
-def load_mapping():
-    """Loads All json mappings"""
-    company_to_symbol = load_safe_json(COMPANY_TO_SYMBOL_PATH)
-    symbol_to_sector = load_safe_json(SYMBOL_TO_SECTOR_PATH)
-    regulator_rules = load_safe_json(REGULATOR_RULES_PATH)
-    policy_rules = load_safe_json(POLICY_RULES_PATH)
-    sector_to_symbols = load_safe_json(SECTOR_TO_SYMBOLS_PATH)
-    symbol_to_company = load_safe_json(SYMBOL_TO_COMPANY_PATH)
+MAPPING_SOURCES = {
+    "company_to_symbol": COMPANY_TO_SYMBOL_PATH,
+    "symbol_to_sector": SYMBOL_TO_SECTOR_PATH,
+    "regulator_rules": REGULATOR_RULES_PATH,
+    "policy_rules": POLICY_RULES_PATH,
+    "sector_to_symbols": SECTOR_TO_SYMBOLS_PATH,
+    "symbol_to_company": SYMBOL_TO_COMPANY_PATH,
+    "sector_aliases": SECTOR_ALIASES_PATH,
+}
 
+def load_mapping_bundle() -> Dict[str, Any]:
+    """All mappings plus derived keys (e.g. company_aliases), served from the compiled artifact."""
+    return load_compiled_mappings(MAPPING_SOURCES)
 
-    return company_to_symbol, symbol_to_sector, regulator_rules, policy_rules, sector_to_symbols, symbol_to_company
+def load_mapping():
+    """Loads All json mappings"""
+    b = load_mapping_bundle()
+    return b["company_to_symbol"], b["symbol_to_sector"], b["regulator_rules"], b["policy_rules"], b["sector_to_symbols"], b["symbol_to_company"]
 
 def normalize_name(name: str) -> str:
     if not name:
         return ""
     return " ".join(name.strip().split()).lower()
 
-def fuzzy_match_company(name: str, company_to_symbol: Dict[str, str], top_k: int = 3, score_threshold: int = 80):
+def canonical_sector(name: str) -> Optional[str]:
+    """
+    The sector_to_symbols key a sector name refers to ("BANKING", "NBFC" and "Financial Services"
+    all give "financial services"), or None when neither the keys nor sector_aliases know it.
+    """
     if not name:
         return None
+    return load_mapping_bundle()["sector_keys"].get(normalize_name(name))
 
-    name_norm = normalize_name(name)
-
-    # direct exact lookup
-    if name in company_to_symbol:
-        return company_to_symbol[name]
-    if name_norm in company_to_symbol:
-        return company_to_symbol[name_norm]
-
-    # try exact case-insensitive keys
-    for cname, sym in company_to_symbol.items():
-        if cname.lower() == name_norm:
-            return sym
-
-    if _HAS_RAPIDFUZZ:
-        choices = list(company_to_symbol.keys())
-        best = process.extractOne(name_norm, choices, scorer=fuzz.WRatio)
-        if best and best[1] >= score_threshold:
-            return company_to_symbol.get(best[0])
-    else:
-        for cname, sym in company_to_symbol.items():
-            if name_norm in cname.lower() or cname.lower() in name_norm:
-                return sym
-
-    return None
+def fuzzy_match_company(name: str, company_to_symbol: Dict[str, str], top_k: int = 3, score_threshold: int = 80):
+    """Resolves a company name through the precompiled, memoized CompanyMatcher."""
+    if not name:
+        return None
+    return get_company_matcher(company_to_symbol, score_threshold).resolve(name)
 
 def compute_impacts_for_entities(entities: Dict[str, Any],
                                  company_to_symbol: Dict[str, str],
@@ -91,99 +82,28 @@ def compute_impacts_for_entities(entities: Dict[str, Any],
                                  sector_to_symbols: Dict[str, List[str]] = None,
                                  index_to_symbols: Dict[str, List[str]] = None,
                                  symbol_to_company: Dict[str, str] = None) -> List[Dict[str, Any]]:
-    company_to_symbol = company_to_symbol or {}
-    symbol_to_sector = symbol_to_sector or {}
-    regulator_rules = regulator_rules or {}
-    policy_rules = policy_rules or {}
-    sector_to_symbols = sector_to_symbols or {}
-    index_to_symbols = index_to_symbols or {}
-
-    impacts_flags = defaultdict(lambda: defaultdict(bool))
-    summary_parts = []
-
-    # ------------------------------------------------------
-    # 1) DIRECT COMPANIES
-    for comp in entities.get("companies", []) or []:
-        sym = None
-        if comp in company_to_symbol:
-            sym = company_to_symbol[comp]
-            impacts_flags[sym]["direct"] = True
-            summary_parts.append(f"{comp} directly mentioned.")
-        else:
-            sym = fuzzy_match_company(comp, company_to_symbol)
-            if sym:
-                impacts_flags[sym]["gazetteer"] = True
-                summary_parts.append(f"{comp} matched via fuzzy lookup → {sym}.")
-        if sym:
-            impacts_flags[sym]["direct"] = True
-
-    # ------------------------------------------------------
-    # 2) SECTOR IMPACTS
-    for sec in entities.get("sectors", []) or []:
-        key = normalize_name(sec)
-        syms = sector_to_symbols.get(key, [])
-        for s in syms:
-            impacts_flags[s]["sector"] = True
-        if syms:
-            summary_parts.append(f"Sector {sec} impacted ({len(syms)} stocks).")
-
-    # ------------------------------------------------------
-    # 3) REGULATOR IMPACTS
-    for reg in entities.get("regulators", []) or []:
-        rkey = normalize_name(reg)
-        rule = regulator_rules.get(rkey) or regulator_rules.get(rkey.lower()) or regulator_rules.get(rkey.upper())
-        if rule:
-            sec_list = rule.get("sectors", [])
-            conf = rule.get("confidence", SCORES["regulatory"])
-            for sec in sec_list:
-                syms = sector_to_symbols.get(sec.lower(), [])
-                for s in syms:
-                    impacts_flags[s]["regulatory"] = True
-            summary_parts.append(f"Regulator {reg} triggers impact on sectors {sec_list}.")
-
-    # ------------------------------------------------------
-    # 4) POLICY IMPACTS
-    for pol in entities.get("policies", []) or []:
-        pkey = normalize_name(pol)
-        rule = policy_rules.get(pkey) or policy_rules.get(pkey.lower())
-        if rule:
-            sectors = rule.get("sectors", [])
-            for sec in sectors:
-                if sec == "All":
-                    for s in symbol_to_sector.keys():
-                        impacts_flags[s]["policy"] = True
-                else:
-                    syms = sector_to_symbols.get(sec.lower(), [])
-                    for s in syms:
-                        impacts_flags[s]["policy"] = True
-            summary_parts.append(f"Policy {pol} impacts sectors {sectors}.")
-
-    for idx in entities.get("indices", []) or []:
-        idx_key = normalize_name(idx)
-        syms = index_to_symbols.get(idx_key, [])
-        for s in syms:
-            impacts_flags[s]["index"] = True
-        if syms:
-            summary_parts.append(f"Index {idx} impacts {len(syms)} stocks.")
-            
-    results = []
-    for sym, flags in impacts_flags.items():
-        primary = next((t for t in PRIORITY_ORDER if flags.get(t)), "semantic")
-        score = SCORES.get(primary, 0.4)
-
-        results.append({
-            "symbol": sym,
-            "confidence": round(score, 3),
-            "type": primary,
-            "flags": [k for k, v in flags.items() if v]
-        })
-
-    if not results:
-        summary = "No significant impact detected."
-        return [], summary
-
-    summary = " ".join(summary_parts) if summary_parts else "No significant impact detected."
-    return results, summary
+    """(impacts, summary) for one story; see compute_impacts_batch."""
+    return compute_impacts_batch(
+        [entities], company_to_symbol, symbol_to_sector, regulator_rules,
+        policy_rules, sector_to_symbols, index_to_symbols
+    )[0]
+
+def compute_impacts_batch(entities_list: List[Dict[str, Any]],
+                          company_to_symbol: Dict[str, str],
+                          symbol_to_sector: Dict[str, Dict],
+                          regulator_rules: Dict[str, Dict],
+                          policy_rules: Dict[str, Dict],
+                          sector_to_symbols: Dict[str, List[str]] = None,
+                          index_to_symbols: Dict[str, List[str]] = None) -> List[tuple]:
+    """
+    (impacts, summary) for each story's entities. Company mentions give direct/gazetteer
+    impacts; sectors, regulators, policies and indices expand to symbols through the
+    ImpactEngine's precomputed symbol-group matrices, all stories of the batch at once.
+    Each impact is {"symbol", "confidence", "type", "flags"}, with type the highest-priority flag.
+    """
+    engine = get_impact_engine(company_to_symbol, symbol_to_sector, regulator_rules,
+                               policy_rules, sector_to_symbols, index_to_symbols)
+    return engine.compute_batch(entities_list)
 
 
 def format_impacts_list(impacts: List[Dict[str, Any]], max_items: int = 20) -> List[Dict]:
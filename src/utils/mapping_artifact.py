@@ -0,0 +1,152 @@
+"""
+Compiles the impact-mapping JSON assets (plus derived lookup keys) into one pickle
+artifact, loaded back with a single unpickle instead of parsing every JSON file. The
+artifact records the mtime, size and sha256 of every source file and is rebuilt
+automatically when any of them changes.
+
+build on CLI using "python -m src.utils.mapping_artifact"
+"""
+import os, pickle, hashlib, tempfile, threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+MAPPING_ARTIFACT_PATH = Path(os.getenv("MAPPING_ARTIFACT_PATH", "data/compiled/mappings.pkl"))
+ARTIFACT_FORMAT = 2
+
+_LOCK = threading.Lock()
+# (source stamps, bundle) of the last artifact loaded in this process
+_LOADED: Dict[str, object] = {"stamps": None, "bundle": None}
+
+
+def _stat(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _sha256(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+def build_company_aliases(company_to_symbol: Dict[str, str]) -> Dict[str, str]:
+    """Lower-cased name, name without "limited"/"ltd" and its first two tokens -> symbol."""
+    aliases = {}
+    for full_name, symbol in company_to_symbol.items():
+        key = full_name.lower().strip()
+        aliases[key] = symbol
+        short = key.replace("limited", "").replace("ltd", "").strip()
+        aliases[short] = symbol
+        aliases[" ".join(short.split()[:2])] = symbol
+    return aliases
+
+def build_sector_keys(sector_to_symbols: Dict[str, list], sector_aliases: Dict[str, str]) -> Dict[str, str]:
+    """
+    Normalized sector name -> its sector_to_symbols key, for the keys themselves and every
+    alias (gazetteer and rule spellings) that names one. Aliases of unknown keys are skipped.
+    """
+    norm = lambda name: " ".join(name.lower().split())
+    keys = {norm(key): key for key in sector_to_symbols}
+    for alias, key in sector_aliases.items():
+        if key in sector_to_symbols:
+            keys[norm(alias)] = key
+    return keys
+
+def _compile(sources: Dict[str, str]) -> Dict:
+    from .impact_mapping import load_safe_json
+    mappings = {name: load_safe_json(path) for name, path in sources.items()}
+    return {
+        **mappings,
+        "company_aliases": build_company_aliases(mappings["company_to_symbol"]),
+        "sector_keys": build_sector_keys(mappings["sector_to_symbols"], mappings.get("sector_aliases", {})),
+    }
+
+def _write(payload: Dict, out_path: Path):
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=out_path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, out_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def compile_mappings(sources: Dict[str, str], out_path: Path = MAPPING_ARTIFACT_PATH) -> Dict:
+    """Parses every source JSON, derives the lookup keys and writes the artifact atomically."""
+    payload = {
+        "format": ARTIFACT_FORMAT,
+        "sources": {path: {"stat": _stat(path), "sha256": _sha256(path)} for path in sources.values()},
+        "bundle": _compile(sources),
+    }
+    _write(payload, out_path)
+    print(f"[Mapping Artifact] Compiled {len(sources)} mapping files into {out_path}.")
+    return payload
+
+def _read(path: Path) -> Optional[Dict]:
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+        return None
+    return payload if payload.get("format") == ARTIFACT_FORMAT else None
+
+def _check_sources(payload: Dict, sources: Dict[str, str]) -> Tuple[bool, bool]:
+    """(fresh, restamp): restamp when some file was touched (checkout, copy) but hashes the same."""
+    recorded = payload.get("sources", {})
+    if set(recorded) != set(sources.values()):
+        return False, False
+    restamp = False
+    for path, meta in recorded.items():
+        stat = _stat(path)
+        if stat is None and meta["stat"] is None:
+            continue
+        if stat is None or tuple(meta["stat"] or ()) != stat:
+            # touched but possibly unchanged: fall back to the content hash
+            if _sha256(path) != meta["sha256"]:
+                return False, False
+            meta["stat"] = stat
+            restamp = True
+    return True, restamp
+
+def load_compiled_mappings(sources: Dict[str, str], path: Path = MAPPING_ARTIFACT_PATH) -> Dict:
+    """
+    Mapping bundle for `sources` ({name: json path}). Within a process the bundle is
+    reused for as long as the source files' mtimes and sizes are unchanged, so repeat
+    calls cost one stat() per file. Callers share the returned dicts and must not mutate them.
+    """
+    stamps = tuple((p, _stat(p)) for p in sources.values())
+    if _LOADED["stamps"] == stamps:
+        return _LOADED["bundle"]
+
+    with _LOCK:
+        if _LOADED["stamps"] == stamps:
+            return _LOADED["bundle"]
+        payload = _read(Path(path))
+        fresh, restamp = _check_sources(payload, sources) if payload is not None else (False, False)
+        if fresh and restamp:
+            # record the new mtimes so later cold starts skip hashing these files again
+            try:
+                _write(payload, Path(path))
+            except OSError as e:
+                print(f"[Mapping Artifact] Could not restamp {path}: {e}")
+        if not fresh:
+            try:
+                payload = compile_mappings(sources, path)
+            except OSError as e:
+                # read-only deployments still get the mappings, just without the artifact
+                print(f"[Mapping Artifact] Could not write {path}: {e}")
+                payload = {"bundle": _compile(sources)}
+        _LOADED["bundle"] = payload["bundle"]
+        _LOADED["stamps"] = stamps
+    return _LOADED["bundle"]
+
+
+if __name__ == "__main__":
+    from .impact_mapping import MAPPING_SOURCES
+    compile_mappings(MAPPING_SOURCES)
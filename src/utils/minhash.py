@@ -0,0 +1,89 @@
+import re, zlib
+import numpy as np
+from typing import List, Set
+from .clustering import connected_components
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WS_RE = re.compile(r"\s+")
+
+
+def shingles(text: str, k: int = 5) -> Set[int]:
+    """crc32 hashes of the character k-grams of the whitespace/case-normalized text."""
+    t = _WS_RE.sub(" ", (text or "").lower()).strip()
+    if not t:
+        return set()
+    if len(t) <= k:
+        return {zlib.crc32(t.encode("utf-8"))}
+    return {zlib.crc32(t[i:i+k].encode("utf-8")) for i in range(len(t) - k + 1)}
+
+def minhash_signatures(shingle_sets: List[Set[int]], num_perm: int = 64, seed: int = 1) -> np.ndarray:
+    """
+    (n, num_perm) MinHash signatures using universal hashing (a*x + b) mod p.
+    Rows for empty shingle sets are left at the max hash value.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    sigs = np.full((len(shingle_sets), num_perm), _MAX_HASH, dtype=np.uint64)
+    for i, sh in enumerate(shingle_sets):
+        if not sh:
+            continue
+        x = np.fromiter(sh, dtype=np.uint64, count=len(sh))
+        # a < 2^32 and x < 2^32, so a*x + b stays inside uint64
+        hv = ((x[:, None] * a + b) % _MERSENNE_PRIME) & _MAX_HASH
+        sigs[i] = hv.min(axis=0)
+    return sigs
+
+def lexical_groups(texts: List[str], threshold: float = 0.90, num_perm: int = 64,
+                   bands: int = 8, k: int = 5) -> np.ndarray:
+    """
+    Groups exact and near-exact duplicate texts. Candidates come from LSH buckets
+    (`bands` bands of num_perm/bands rows) and are kept when their estimated Jaccard
+    similarity is >= threshold. Returns, for each text, the index of its group's
+    representative (the group's smallest index).
+    """
+    n = len(texts)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    rows = num_perm // bands
+    sets = [shingles(t, k) for t in texts]
+    sigs = minhash_signatures(sets, num_perm=num_perm)
+    has_text = np.array([bool(s) for s in sets])
+
+    src, dst = [], []
+
+    # identical signatures (exact reposts included) estimate Jaccard 1: link every copy to the
+    # first text with that signature and bucket only the distinct signatures, so a burst of
+    # syndicated copies costs one sort instead of a quadratic in-bucket comparison
+    textful = np.flatnonzero(has_text)
+    if not len(textful):
+        return np.arange(n, dtype=np.int64)
+    _, first, inverse = np.unique(sigs[textful], axis=0, return_index=True, return_inverse=True)
+    reps = textful[first]
+    copy_of = reps[inverse.ravel()]
+    is_copy = copy_of != textful
+    src.extend(copy_of[is_copy].tolist())
+    dst.extend(textful[is_copy].tolist())
+
+    for band in range(bands):
+        buckets = {}
+        block = sigs[:, band*rows:(band+1)*rows]
+        for i in reps:
+            buckets.setdefault(block[i].tobytes(), []).append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            # every pair of distinct signatures in the bucket: similarity is not transitive, so
+            # checking members only against the first one misses pairs where both differ from it
+            members = np.asarray(members, dtype=np.int64)
+            bucket_sigs = sigs[members]
+            for pos in range(len(members) - 1):
+                sim = np.mean(bucket_sigs[pos + 1:] == bucket_sigs[pos], axis=1)
+                matched = members[pos + 1:][sim >= threshold]
+                src.extend([members[pos]] * len(matched))
+                dst.extend(matched.tolist())
+
+    return connected_components(n, np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64))
@@ -1,10 +1,7 @@
-import os 
+import os, time, threading
 from pathlib import Path
-from transformers import (
-    AutoTokenizer,
-    AutoModelForTokenClassification,
-    pipeline
-)
+from typing import Any, Callable, Dict, Iterable, Optional
+
 
 def get_snapshot_folder(local_dir: str):
     """Find the actual model snapshot folder inside Huggingface cache."""
@@ -14,8 +11,50 @@ def get_snapshot_folder(local_dir: str):
         return None
     return snapshot_dirs[0]
 
-def load_local_or_download(model_name: str, local_dir: str, task: str = "ner"):
-    """Loads a HuggingFace model from local directory, if exists. Otherwise downloads and caches it."""
+# "fp32" is the stock model; "int8" applies PyTorch dynamic quantization to its Linear layers (CPU only)
+NER_BACKEND = os.getenv("NER_BACKEND", "fp32").lower()
+NER_BACKENDS = ("fp32", "int8")
+# intra-op threads for CPU inference; 0 leaves torch's default (one per core)
+NER_NUM_THREADS = int(os.getenv("NER_NUM_THREADS", "0"))
+
+def set_torch_threads(num_threads: int):
+    """Pins torch's intra-op thread count; a no-op for num_threads <= 0 or without torch."""
+    if num_threads <= 0:
+        return
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+    except Exception:
+        pass
+
+def quantize_dynamic_int8(model):
+    """
+    Int8 dynamic quantization of every nn.Linear (weights int8, activations quantized
+    per batch at runtime). For BERT these layers hold nearly all the FLOPs, so this is
+    where the CPU speedup comes from; embeddings and LayerNorm stay fp32.
+    """
+    import torch
+    engines = torch.backends.quantized.supported_engines
+    # fbgemm is the x86 kernel set, qnnpack the ARM one
+    for engine in ("fbgemm", "x86", "qnnpack"):
+        if engine in engines:
+            torch.backends.quantized.engine = engine
+            break
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def load_local_or_download(model_name: str, local_dir: str, task: str = "ner", backend: str = "fp32"):
+    """
+    Loads a HuggingFace model from local directory, if exists. Otherwise downloads and caches it.
+    backend="int8" returns the same pipeline over a dynamically quantized copy of the model.
+    """
+    if backend not in NER_BACKENDS:
+        raise ValueError(f"Unknown NER backend '{backend}', expected one of {NER_BACKENDS}")
+    from transformers import (
+        AutoTokenizer,
+        AutoModelForTokenClassification,
+        pipeline
+    )
     os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"  # Fix Windows symlink issue
 
     snapshot = get_snapshot_folder(local_dir)
@@ -31,9 +70,139 @@ def load_local_or_download(model_name: str, local_dir: str, task: str = "ner"):
         model = AutoModelForTokenClassification.from_pretrained(model_name, cache_dir=local_dir)
         print(f"[Model Loader] Model downloaded and cached at {local_dir}")
 
+    if backend == "int8":
+        model = quantize_dynamic_int8(model)
+        print(f"[Model Loader] Applied dynamic int8 quantization to {model_name}.")
+
     return pipeline(
         task,
         model=model,
         tokenizer=tokenizer,
-        aggregation_strategy="simple"
+        aggregation_strategy="simple",
+        device=-1 if backend == "int8" else None
     )
+
+
+# ==========================================
+# Shared Model Registry
+# ==========================================
+
+def _rss_bytes() -> int:
+    """Resident set size of this process (0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return 0
+
+def _param_bytes(obj: Any) -> int:
+    """Size of the torch parameters behind a model / pipeline, 0 if it has none."""
+    module = getattr(obj, "model", obj)
+    params = getattr(module, "parameters", None)
+    if not callable(params):
+        return 0
+    try:
+        return sum(p.numel() * p.element_size() for p in params())
+    except Exception:
+        return 0
+
+
+class ModelRegistry:
+    """
+    Process-wide registry that loads each model once, on first use, and hands the
+    same instance to every caller. Loading is serialized per key, so concurrent
+    first requests (e.g. warm-up racing a real query) still load only once.
+    """
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def register(self, key: str, factory: Callable[[], Any]):
+        """Registers a factory; re-registering an existing key keeps the first factory."""
+        with self._lock:
+            self._factories.setdefault(key, factory)
+            self._locks.setdefault(key, threading.Lock())
+
+    def get(self, key: str, factory: Optional[Callable[[], Any]] = None) -> Any:
+        if key in self._instances:
+            return self._instances[key]
+        if factory is not None:
+            self.register(key, factory)
+        if key not in self._factories:
+            raise KeyError(f"No model registered under '{key}'")
+
+        with self._locks[key]:
+            if key not in self._instances:
+                rss_before = _rss_bytes()
+                t0 = time.perf_counter()
+                instance = self._factories[key]()
+                load_seconds = time.perf_counter() - t0
+                memory = _param_bytes(instance) or max(0, _rss_bytes() - rss_before)
+                self._stats[key] = {
+                    "load_seconds": round(load_seconds, 3),
+                    "memory_mb": round(memory / (1024 * 1024), 1),
+                }
+                self._instances[key] = instance
+                print(f"[Model Registry] Loaded {key} in {load_seconds:.2f}s ({self._stats[key]['memory_mb']} MB).")
+        return self._instances[key]
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self._instances
+
+    def warm_up(self, keys: Optional[Iterable[str]] = None, background: bool = True) -> Optional[threading.Thread]:
+        """Loads the given (default: all registered) models, optionally on a daemon thread."""
+        keys = list(keys) if keys is not None else list(self._factories)
+
+        def _run():
+            for k in keys:
+                try:
+                    self.get(k)
+                except Exception as e:
+                    print(f"[Model Registry] Warm-up of {k} failed: {e}")
+
+        if not background:
+            _run()
+            return None
+        t = threading.Thread(target=_run, name="model-warmup", daemon=True)
+        t.start()
+        return t
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            k: {"loaded": k in self._instances, **self._stats.get(k, {})}
+            for k in self._factories
+        }
+
+
+MODELS = ModelRegistry()
+
+def _sentence_transformer_key(model_name: str) -> str:
+    # "all-MiniLM-L6-v2" and "sentence-transformers/all-MiniLM-L6-v2" are the same checkpoint
+    if "/" not in model_name and not os.path.exists(model_name):
+        model_name = f"sentence-transformers/{model_name}"
+    return f"sentence-transformer:{model_name}"
+
+def get_sentence_transformer(model_name: str):
+    """Shared SentenceTransformer instance for `model_name`."""
+    def _load():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    return MODELS.get(_sentence_transformer_key(model_name), _load)
+
+def get_ner_pipeline(model_name: str, local_dir: str, task: str = "ner",
+                     backend: Optional[str] = None, num_threads: Optional[int] = None):
+    """
+    Shared HuggingFace pipeline, loaded through load_local_or_download on first use.
+    `backend` defaults to NER_BACKEND and `num_threads` to NER_NUM_THREADS (applied
+    when the model is loaded); each backend is registered under its own key.
+    """
+    backend = (backend or NER_BACKEND).lower()
+    key = f"{task}:{model_name}" if backend == "fp32" else f"{task}:{model_name}:{backend}"
+
+    def _load():
+        set_torch_threads(NER_NUM_THREADS if num_threads is None else num_threads)
+        return load_local_or_download(model_name, local_dir, task=task, backend=backend)
+    return MODELS.get(key, _load)
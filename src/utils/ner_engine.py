@@ -0,0 +1,141 @@
+import os
+from typing import Dict, List, Tuple
+
+NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", "16"))
+# tokens shared by consecutive chunks, so entities on a boundary are seen whole at least once
+NER_CHUNK_OVERLAP = int(os.getenv("NER_CHUNK_OVERLAP", "64"))
+NER_MAX_TOKENS = int(os.getenv("NER_MAX_TOKENS", "512"))
+
+
+def _chunk_budget(tokenizer, max_tokens: int) -> int:
+    """Content tokens per chunk: the model window minus [CLS]/[SEP]."""
+    model_max = getattr(tokenizer, "model_max_length", max_tokens) or max_tokens
+    limit = min(max_tokens, model_max)
+    try:
+        limit -= tokenizer.num_special_tokens_to_add(pair=False)
+    except Exception:
+        limit -= 2
+    return max(8, limit)
+
+def _snap_to_word_start(word_ids, i: int, floor: int) -> int:
+    """Moves token index i back so it does not point into the middle of a word."""
+    while i > floor and word_ids[i] is not None and word_ids[i] == word_ids[i-1]:
+        i -= 1
+    return i
+
+def chunk_text(text: str, tokenizer=None, max_tokens: int = NER_MAX_TOKENS,
+               overlap: int = NER_CHUNK_OVERLAP) -> List[Tuple[int, str]]:
+    """
+    Splits a story into chunks that fit the model window; returns (char offset, chunk) pairs.
+    With a (fast) tokenizer, chunks are packed to the token budget, overlap by `overlap`
+    tokens and never split a word. Without one, falls back to fixed 2000-character chunks.
+    """
+    text = text or ""
+    if tokenizer is None:
+        if len(text) > 3000:
+            return [(i, text[i:i+2000]) for i in range(0, len(text), 2000)]
+        return [(0, text)]
+
+    budget = _chunk_budget(tokenizer, max_tokens)
+    enc = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, truncation=False, verbose=False)
+    offsets = enc["offset_mapping"]
+    n = len(offsets)
+    if n <= budget:
+        return [(0, text)]
+
+    word_ids = enc.word_ids() if callable(getattr(enc, "word_ids", None)) else [None] * n
+    overlap = min(overlap, budget // 2)
+    spans = []
+    start = 0
+    while start < n:
+        end = min(start + budget, n)
+        if end < n:
+            end = _snap_to_word_start(word_ids, end, start + 1)
+        c0, c1 = offsets[start][0], offsets[end-1][1]
+        spans.append((c0, text[c0:c1]))
+        if end >= n:
+            break
+        start = _snap_to_word_start(word_ids, max(end - overlap, start + 1), start + 1)
+    return spans
+
+def merge_overlapping_entities(entities: List[Dict]) -> List[Dict]:
+    """
+    Collapses entities found twice in the overlap between chunks: spans of the same
+    entity_group that overlap are merged into the longest (then highest-scoring) one.
+    """
+    with_span = [e for e in entities if e.get("start") is not None]
+    without_span = [e for e in entities if e.get("start") is None]
+    with_span.sort(key=lambda e: (e["start"], -e["end"]))
+
+    merged: List[Dict] = []
+    for e in with_span:
+        prev = merged[-1] if merged else None
+        if prev and prev.get("entity_group") == e.get("entity_group") and e["start"] < prev["end"]:
+            prev_key = (prev["end"] - prev["start"], prev.get("score", 0))
+            cur_key = (e["end"] - e["start"], e.get("score", 0))
+            if cur_key > prev_key:
+                merged[-1] = e
+            continue
+        merged.append(e)
+    return merged + without_span
+
+def _token_lengths(ner, chunks: List[str]) -> List[int]:
+    tokenizer = getattr(ner, "tokenizer", None)
+    if tokenizer is None:
+        return [len(c) for c in chunks]
+    return [len(ids) for ids in tokenizer(chunks, add_special_tokens=False)["input_ids"]]
+
+def _run_batch(ner, batch: List[str]) -> List[List[Dict]]:
+    try:
+        out = ner(batch, batch_size=len(batch))
+    except Exception as e:
+        print(f"[NER Engine] Batch failed ({e}); retrying chunk by chunk.")
+        out = []
+        for c in batch:
+            try:
+                out.append(ner(c))
+            except Exception as e:
+                print(f"[NER Agent] Chunk failed: {e}")
+                out.append([])
+    # a single-item list input can come back un-nested
+    if len(batch) == 1 and out and isinstance(out[0], dict):
+        out = [out]
+    return out
+
+def run_batched_ner(ner, texts: List[str], batch_size: int = NER_BATCH_SIZE) -> List[List[Dict]]:
+    """
+    Runs a HuggingFace NER pipeline over all token-window chunks of all `texts` at once.
+    Chunks are sorted by token length so each batch pads to a similar length, and
+    entities are scattered back to their text with start/end shifted to global offsets.
+    """
+    tokenizer = getattr(ner, "tokenizer", None)
+    chunks, owners = [], []
+    for t_idx, text in enumerate(texts):
+        for offset, chunk in chunk_text(text, tokenizer):
+            if chunk.strip():
+                chunks.append(chunk)
+                owners.append((t_idx, offset))
+
+    results: List[List[Dict]] = [[] for _ in texts]
+    if not chunks:
+        return results
+
+    lengths = _token_lengths(ner, chunks)
+    order = sorted(range(len(chunks)), key=lambda i: lengths[i])
+    per_chunk: List[List[Dict]] = [[] for _ in chunks]
+
+    for b in range(0, len(order), batch_size):
+        idxs = order[b:b+batch_size]
+        for i, ents in zip(idxs, _run_batch(ner, [chunks[i] for i in idxs])):
+            per_chunk[i] = ents or []
+
+    # chunks were appended in text order, so iterating them keeps entities in reading order
+    for i, ents in enumerate(per_chunk):
+        t_idx, offset = owners[i]
+        for e in ents:
+            e = dict(e)
+            if e.get("start") is not None:
+                e["start"] += offset
+                e["end"] += offset
+            results[t_idx].append(e)
+    return [merge_overlapping_entities(r) for r in results]
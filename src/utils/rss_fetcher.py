@@ -0,0 +1,92 @@
+import os, json, time
+import feedparser
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+from concurrent.futures import ThreadPoolExecutor
+
+FEED_STATE_PATH = Path(os.getenv("RSS_FEED_STATE", "data/feed_state.json"))
+FETCH_WORKERS = int(os.getenv("RSS_FETCH_WORKERS", "8"))
+FETCH_TIMEOUT = float(os.getenv("RSS_FETCH_TIMEOUT", "10"))
+USER_AGENT = "financial-news-intelligence/1.0 (+feedparser)"
+_READ_CHUNK = 64 * 1024
+
+
+def load_feed_state(path: Path = FEED_STATE_PATH) -> Dict[str, Dict]:
+    """Loads the persisted {feed_url: {"etag": ..., "modified": ...}} validators."""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[RSS Fetcher] Could not read feed state {path}: {e}")
+        return {}
+
+def save_feed_state(state: Dict[str, Dict], path: Path = FEED_STATE_PATH):
+    """Atomically writes the feed validators so a crash never leaves a half-written file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+def fetch_feed(url: str, etag: Optional[str] = None, modified: Optional[str] = None,
+               timeout: float = FETCH_TIMEOUT) -> Dict:
+    """
+    Fetches one feed with a conditional GET.
+    `timeout` bounds the whole request (connect + body), not just each socket read.
+    Returns {"url", "status", "entries", "etag", "modified", "error"}; a 304 comes back with no entries.
+    """
+    result = {"url": url, "status": None, "entries": [], "etag": etag, "modified": modified, "error": None}
+    headers = {"User-Agent": USER_AGENT}
+    if etag:
+        headers["If-None-Match"] = etag
+    if modified:
+        headers["If-Modified-Since"] = modified
+
+    deadline = time.monotonic() + timeout
+    try:
+        with urlopen(Request(url, headers=headers), timeout=timeout) as resp:
+            chunks = []
+            while True:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"feed exceeded {timeout}s")
+                # read1 returns after one socket read, so a feed that trickles bytes still hits the deadline
+                chunk = resp.read1(_READ_CHUNK)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            result["status"] = resp.status
+            resp_headers = {k.lower(): v for k, v in resp.headers.items()}
+    except HTTPError as e:
+        result["status"] = e.code
+        if e.code != 304:
+            result["error"] = f"HTTP {e.code}"
+        return result
+    except Exception as e:
+        result["error"] = str(e) or e.__class__.__name__
+        return result
+
+    parsed = feedparser.parse(b"".join(chunks), response_headers=resp_headers)
+    result["entries"] = parsed.entries
+    result["etag"] = resp_headers.get("etag")
+    result["modified"] = resp_headers.get("last-modified")
+    return result
+
+def fetch_feeds(feeds: List[str], feed_state: Optional[Dict[str, Dict]] = None,
+                max_workers: int = FETCH_WORKERS, timeout: float = FETCH_TIMEOUT) -> List[Dict]:
+    """Fetches all feeds on a bounded thread pool. Results are returned in the order of `feeds`."""
+    feed_state = feed_state or {}
+    if not feeds:
+        return []
+
+    def _one(url):
+        cached = feed_state.get(url, {})
+        return fetch_feed(url, etag=cached.get("etag"), modified=cached.get("modified"), timeout=timeout)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(feeds)))) as pool:
+        return list(pool.map(_one, feeds))
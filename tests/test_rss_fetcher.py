@@ -0,0 +1,140 @@
+"""
+rss_fetcher against a local http.server stand-in serving the fixture feeds in
+tests/fixtures/feeds: plain 200 parse, ETag / Last-Modified round trip (304, no parse)
+and a per-feed timeout that does not hold up the other feeds.
+
+run on CLI using "python -m pytest -q tests"
+"""
+import threading, time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from src.utils import rss_fetcher
+
+FIXTURES = Path(__file__).parent / "fixtures" / "feeds"
+LAST_MODIFIED = formatdate(1707373800, usegmt=True)
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """Serves /<name>.xml from FIXTURES with validators; /slow.xml dribbles its body for seconds."""
+    def do_GET(self):
+        if self.path == "/slow.xml":
+            return self._dribble()
+        path = FIXTURES / self.path.lstrip("/")
+        if not path.is_file():
+            self.send_error(404)
+            return
+        body = path.read_bytes()
+        etag = f'"{path.stem}-{len(body)}"'
+        if self.headers.get("If-None-Match") == etag or self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/rss+xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dribble(self):
+        # each chunk arrives well inside the socket timeout, so only the whole-request deadline can stop it
+        body = (FIXTURES / "markets.xml").read_bytes()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/rss+xml")
+        self.end_headers()
+        try:
+            for i in range(0, len(body), 16):
+                self.wfile.write(body[i:i+16])
+                self.wfile.flush()
+                time.sleep(0.1)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def feed_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FeedHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def parse_calls(monkeypatch):
+    calls = []
+    parse = rss_fetcher.feedparser.parse
+    def counting_parse(*args, **kwargs):
+        calls.append(args)
+        return parse(*args, **kwargs)
+    monkeypatch.setattr(rss_fetcher.feedparser, "parse", counting_parse)
+    return calls
+
+
+def test_fetch_parses_200(feed_server):
+    result = rss_fetcher.fetch_feed(f"{feed_server}/markets.xml")
+
+    assert result["status"] == 200
+    assert result["error"] is None
+    assert [e.title for e in result["entries"]] == [
+        "RBI keeps repo rate unchanged at 6.5%",
+        "HDFC Bank shares rise after quarterly results",
+    ]
+    assert result["etag"]
+    assert result["modified"] == LAST_MODIFIED
+
+
+def test_validators_round_trip_to_304_without_parsing(feed_server, parse_calls, tmp_path):
+    url = f"{feed_server}/companies.xml"
+    first = rss_fetcher.fetch_feeds([url])[0]
+    assert first["status"] == 200 and len(first["entries"]) == 1
+    assert len(parse_calls) == 1
+
+    # validators survive a save / load of the feed state
+    state_path = tmp_path / "feed_state.json"
+    rss_fetcher.save_feed_state({url: {"etag": first["etag"], "modified": first["modified"]}}, state_path)
+    state = rss_fetcher.load_feed_state(state_path)
+
+    second = rss_fetcher.fetch_feeds([url], feed_state=state)[0]
+    assert second["status"] == 304
+    assert second["error"] is None
+    assert second["entries"] == []
+    assert second["etag"] == first["etag"]
+    assert len(parse_calls) == 1
+
+    # Last-Modified alone is enough
+    third = rss_fetcher.fetch_feed(url, modified=first["modified"])
+    assert third["status"] == 304
+    assert len(parse_calls) == 1
+
+
+def test_slow_feed_times_out_without_blocking_others(feed_server):
+    feeds = [f"{feed_server}/slow.xml", f"{feed_server}/markets.xml", f"{feed_server}/companies.xml"]
+
+    t0 = time.monotonic()
+    results = rss_fetcher.fetch_feeds(feeds, max_workers=3, timeout=0.5)
+    elapsed = time.monotonic() - t0
+
+    slow, markets, companies = results
+    assert slow["error"] and not slow["entries"]
+    assert markets["status"] == 200 and len(markets["entries"]) == 2
+    assert companies["status"] == 200 and len(companies["entries"]) == 1
+    # the slow body takes several seconds to send; the deadline cuts it off
+    assert elapsed < 2.0
+
+
+def test_missing_feed_reports_error(feed_server):
+    result = rss_fetcher.fetch_feed(f"{feed_server}/missing.xml")
+    assert result["status"] == 404
+    assert result["error"] == "HTTP 404"
+    assert result["entries"] == []